@@ -1,6 +1,6 @@
 import os
-import google.generativeai as genai
 from utils.data_retrieval import get_weather_data, get_soil_data, get_mandi_prices
+from farmerbuddy_llm.llm_client import GeminiBackend, LLMClient  # timeouts, retries, concurrency limit
 from utils.prompts import get_main_prompt
 
 # --- Gemini API Configuration ---
@@ -10,8 +10,7 @@ model = None
 # Configure Gemini API
 if GEMINI_API_KEY:
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')  # Updated to newer model
+        model = LLMClient(GeminiBackend('gemini-1.5-flash', GEMINI_API_KEY))  # Updated to newer model
         print("--- Gemini API configured successfully! ---")
     except Exception as e:
         print(f"Error configuring Gemini API: {e}")
@@ -68,8 +67,10 @@ def process_user_message(user_message, chat_history):
             }
         ]
         
-        response = model.generate_content(
+        # Not cached: the prompt carries live weather/price data and the chat history
+        response_text = model.generate(
             full_prompt,
+            cache=False,
             safety_settings=safety_settings,
             generation_config={
                 "temperature": 0.7,
@@ -79,8 +80,8 @@ def process_user_message(user_message, chat_history):
             }
         )
         
-        if response.text:
-            bot_response = response.text
+        if response_text:
+            bot_response = response_text
         else:
             bot_response = "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
 
@@ -4,18 +4,36 @@ import json
 import time
 import re
 import uuid
-import sqlite3
 import hashlib
-from datetime import datetime
-from flask import Flask, render_template, request, send_from_directory, flash, redirect, url_for, jsonify
+import threading
+from flask import (Flask, render_template, request, send_from_directory, flash, redirect, url_for, jsonify,
+                   has_request_context, Response, stream_with_context, send_file)
 from werkzeug.utils import secure_filename
 from docx import Document
-import google.generativeai as genai
-import pytesseract
-import fitz  # PyMuPDF
-from PIL import Image
 from flask_cors import CORS
 
+from app.services.batch import BATCH_FILL_WORKERS, iter_completed, parse_batch_targets, stream_zip
+from app.services.chunking import chunk_metadata, chunk_text, iter_structured_chunks
+from app.services.docx_templates import TemplateCache
+from app.services.extraction import iter_pdf_pages, pdf_pages, pdf_result
+from app.services.extraction_cache import ExtractionCache
+from app.services.field_extractors import extract_fields, find_aadhaar
+from app.services.field_schema_cache import FieldSchemaCache
+from app.services.file_store import GENERATED_TTL_HOURS, UPLOAD_TTL_HOURS, FileStore
+from app.services.jobs import JobQueue
+from app.services.ocr_pool import OCREngine
+from app.services.label_index import LabelIndex
+from farmerbuddy_llm.llm_client import GeminiBackend, LLMClient
+from app.services.pdf_render import PdfRenderer
+from app.services.profile_store import ProfileStore, canonical_field, collect_profile_fields
+from app.services.retrieval import load_embedder, select_chunks
+from app.services.search import rank_user_chunks, search_documents
+from app.services.uploads import read_upload, release_uploads
+from app.services.db import (
+    init_db, init_app as init_db_app, get_pool, claim_user, save_document_records,
+    save_document_records_stream, get_documents_by_user, find_user_by_aadhaar_hash,
+)
+
 
 
 # -------------------------
@@ -25,26 +43,52 @@ UPLOAD_FOLDER = 'uploads'
 GENERATED_FOLDER = 'generated_forms'
 TEMPLATE_FOLDER = 'application_templates'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'docx'}
-DB_PATH = 'data.db'
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '0')) or None  # None -> one worker per CPU core
+OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', '60'))  # seconds allowed per uploaded file
+# Streamed PDFs whose text exceeds this are not kept for the extraction cache (bounds ingest memory)
+PDF_TEXT_CACHE_MAX_BYTES = int(os.getenv('PDF_TEXT_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+EXTRACTION_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH', 'extraction_cache.db')
+EXTRACTION_CACHE_MAX_MB = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '256'))
+RAG_TOP_K = int(os.getenv('RAG_TOP_K', '3'))  # chunks retrieved per required field
+RAG_TOKEN_BUDGET = int(os.getenv('RAG_TOKEN_BUDGET', '3000'))  # max document tokens sent to Gemini
+RAG_EMBEDDING_MODEL = os.getenv('RAG_EMBEDDING_MODEL', '')  # optional sentence-transformers model name
+RAG_EMBEDDING_CACHE_SIZE = int(os.getenv('RAG_EMBEDDING_CACHE_SIZE', '10000'))  # chunk/label vectors kept in memory
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # background workers for async auto-fill jobs
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['GENERATED_FOLDER'] = GENERATED_FOLDER
 app.config['TEMPLATE_FOLDER'] = TEMPLATE_FOLDER
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your_super_secret_key')  # change for production
+init_db_app(app)  # one pooled DB connection per request
 
 # Gemini config (optional)
 GEMINI_API_KEY = ""
 modelname= "gemini-2.0-flash"
+llm = None  # shared LLMClient: timeouts, retries, concurrency limit, response cache, metrics
 if GEMINI_API_KEY:
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel(modelname)
+        llm = LLMClient(GeminiBackend(modelname, GEMINI_API_KEY))
     except Exception as e:
         print(f"Error configuring Gemini API: {e}")
 else:
     print("GEMINI_API_KEY not set — RAG features will be unavailable.")
 
+ocr_engine = OCREngine(max_workers=OCR_WORKERS, timeout=OCR_TIMEOUT)
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_PATH, max_bytes=EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
+# Bump whenever the field-analysis prompt below changes so cached schemas are re-derived
+FIELD_PROMPT_VERSION = "1"
+field_schema_cache = FieldSchemaCache(FIELD_PROMPT_VERSION)
+docx_templates = TemplateCache()  # parsed templates with precomputed fill slots
+pdf_renderer = PdfRenderer()  # filled DOCX -> PDF; results are kept in generated_store
+# Content-addressed storage: uploads no longer overwrite each other, identical outputs are stored once
+upload_store = FileStore(UPLOAD_FOLDER, 'upload', ttl_hours=UPLOAD_TTL_HOURS)
+generated_store = FileStore(GENERATED_FOLDER, 'generated', ttl_hours=GENERATED_TTL_HOURS)
+rag_embedder = load_embedder(RAG_EMBEDDING_MODEL, RAG_EMBEDDING_CACHE_SIZE) if RAG_EMBEDDING_MODEL else None
+job_queue = JobQueue(max_workers=JOB_WORKERS)
+label_index = LabelIndex()
+profile_store = ProfileStore(label_index=label_index)
+
 # -------------------------
 # Example schemes
 # -------------------------
@@ -98,80 +142,6 @@ SCHEMES = {
     }
 }
 
-# -------------------------
-# DB helpers
-# -------------------------
-def get_db_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_db_conn()
-    cur = conn.cursor()
-    # users table stores internal uuid and optional hashed aadhaar
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        user_id TEXT PRIMARY KEY,
-        aadhaar_hash TEXT,
-        created_at TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS documents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT,
-        filename TEXT,
-        scheme_id TEXT,
-        doc_type TEXT,
-        text TEXT,
-        metadata TEXT,
-        chunk_index INTEGER,
-        created_at TEXT
-    )
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_user ON documents(user_id)")
-    conn.commit()
-    conn.close()
-
-def save_user_if_new(user_id, aadhaar_hash=None):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
-    if not cur.fetchone():
-        cur.execute("INSERT INTO users (user_id, aadhaar_hash, created_at) VALUES (?, ?, ?)",
-                    (user_id, aadhaar_hash, datetime.utcnow().isoformat()))
-        conn.commit()
-    else:
-        # If user exists but aadhaar_hash provided and not present, update it
-        if aadhaar_hash:
-            cur.execute("SELECT aadhaar_hash FROM users WHERE user_id = ?", (user_id,))
-            current = cur.fetchone()
-            # If existing record has no aadhaar_hash, set it
-            if current and not current['aadhaar_hash']:
-                cur.execute("UPDATE users SET aadhaar_hash = ? WHERE user_id = ?", (aadhaar_hash, user_id))
-                conn.commit()
-    conn.close()
-
-def save_document_record(user_id, filename, scheme_id, text, doc_type=None, metadata=None, chunk_index=-1):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    meta_json = json.dumps(metadata or {})
-    cur.execute("""
-        INSERT INTO documents (user_id, filename, scheme_id, doc_type, text, metadata, chunk_index, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (user_id, filename, scheme_id, doc_type or '', text, meta_json, chunk_index, datetime.utcnow().isoformat()))
-    conn.commit()
-    conn.close()
-
-def get_documents_by_user(user_id):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM documents WHERE user_id = ? ORDER BY created_at ASC", (user_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
-
 # -------------------------
 # Utilities & OCR helpers
 # -------------------------
@@ -185,94 +155,96 @@ def generate_field_name_from_label(label):
     return name
 
 def find_aadhaar_in_text(text):
-    """Returns first 12-digit sequence if found (naive)."""
-    m = re.search(r'\b(\d{12})\b', text)
-    return m.group(1) if m else None
+    """Returns the first Verhoeff-valid Aadhaar number (digits only) if found."""
+    return find_aadhaar(text)
 
-def chunk_text_simple(text, words_per_chunk=400):
-    words = text.split()
-    if not words:
-        return []
-    chunks = []
-    for i in range(0, len(words), words_per_chunk):
-        chunks.append(" ".join(words[i:i+words_per_chunk]))
-    return chunks
-
-def ocr_image_with_confidence(pil_image, lang='eng'):
+def extract_texts(uploads):
     """
-    Returns dict: {'text': str, 'avg_confidence': float, 'words': [...], 'confs': [...]}
+    Extract text from several uploads (read_upload results), consulting the extraction cache first.
+    Only cache misses are sent to the OCR pool; results keep the input order.
     """
-    try:
-        img = pil_image.convert('RGB')
-        data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
-        words = []
-        confs = []
-        for i, w in enumerate(data.get('text', [])):
-            if w and w.strip():
-                words.append(w)
-                try:
-                    conf = float(data['conf'][i])
-                except Exception:
-                    conf = 0.0
-                confs.append(conf)
-        full_text = " ".join(words)
-        avg_conf = float(sum(confs) / len(confs)) if confs else 0.0
-        return {'text': full_text, 'avg_confidence': avg_conf, 'words': words, 'confs': confs}
-    except Exception as e:
-        print("ocr_image_with_confidence error:", e)
-        return {'text': '', 'avg_confidence': 0.0, 'words': [], 'confs': []}
+    results = [None] * len(uploads)
+    keys = [None] * len(uploads)
+    misses = []
+    for i, upload in enumerate(uploads):
+        try:
+            keys[i] = extraction_cache.key_for_digest(upload.sha256)
+            results[i] = extraction_cache.get(keys[i])
+        except Exception as e:
+            print(f"Extraction cache lookup failed for {upload.filename}: {e}")
+        if results[i] is None:
+            misses.append(i)
+
+    fresh = ocr_engine.extract_many([uploads[i].extract_source for i in misses])
+    for i, res in zip(misses, fresh):
+        results[i] = res
+        # Don't persist failures, partial PDF reads or empty reads; they may succeed on retry
+        if keys[i] and not res.get('error') and res.get('complete', True) and (res.get('text') or '').strip():
+            try:
+                extraction_cache.put(keys[i], res)
+            except Exception as e:
+                print(f"Extraction cache write failed for {uploads[i].filename}: {e}")
+    return results
 
-def extract_text_from_file(filepath):
+def ingest_pdf_streaming(user_id, filename, upload, scheme_id):
     """
-    Returns a dict:
-      {
-        'text': '...',           # extracted text (string)
-        'source': 'pdf|image|docx',
-        'avg_conf': float_or_None
-      }
+    Extract, chunk and store a PDF page by page, so large bundles are never held
+    in memory whole, updating the user's profile from each chunk. Page texts
+    come from the extraction cache when this PDF was read before; otherwise,
+    if every page was read (no OCR failure, no page/byte cap) and the text is
+    under PDF_TEXT_CACHE_MAX_BYTES, they are cached afterwards, so a
+    re-uploaded scanned bundle is not OCR'd again.
+    Returns (chunks_written, first Aadhaar-like number found).
     """
-    text = ""
-    source = None
-    avg_conf = None
+    found = {'aadhaar': None}
+    profile_updates = {}
+    key, cached_pages = None, None
     try:
-        ext = filepath.rsplit('.', 1)[1].lower()
-        if ext == 'pdf':
-            source = 'pdf'
-            with fitz.open(filepath) as doc:
-                pages_text = []
-                for page in doc:
-                    pages_text.append(page.get_text())
-                text = "\n\n".join(pages_text)
-        elif ext in ('png', 'jpg', 'jpeg'):
-            source = 'image'
-            img = Image.open(filepath)
-            ocr_res = ocr_image_with_confidence(img)
-            text = ocr_res['text']
-            avg_conf = ocr_res['avg_confidence']
-        elif ext == 'docx':
-            source = 'docx'
-            doc = Document(filepath)
-            parts = []
-            for para in doc.paragraphs:
-                parts.append(para.text)
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = "\t".join(cell.text for cell in row.cells)
-                    parts.append(row_text)
-            text = "\n".join(parts)
-        else:
-            # fallback: try pytesseract on file as image
-            try:
-                img = Image.open(filepath)
-                ocr_res = ocr_image_with_confidence(img)
-                text = ocr_res['text']
-                avg_conf = ocr_res['avg_confidence']
-                source = 'image'
-            except Exception:
-                text = ""
+        key = extraction_cache.key_for_digest(upload.sha256)
+        cached = extraction_cache.get(key)
+        cached_pages = pdf_pages(cached) if cached else None
     except Exception as e:
-        print(f"Error extracting text from {filepath}: {e}")
-    return {'text': text or "", 'source': source or "unknown", 'avg_conf': avg_conf}
+        print(f"Extraction cache lookup failed for {filename}: {e}")
+    report = {}
+    # Page texts only (no page images) for the cache; dropped once they outgrow the bound
+    seen = {'pages': [] if key and cached_pages is None else None, 'bytes': 0}
+
+    def pages():
+        # Scanned pages are rasterised and OCR'd on the OCR pool while text pages stream through
+        source = cached_pages if cached_pages is not None else iter_pdf_pages(
+            upload.path or filename, ocr_submit=ocr_engine.submit, ocr_timeout=OCR_TIMEOUT, data=upload.data,
+            report=report)
+        for page_text in source:
+            if not found['aadhaar']:
+                found['aadhaar'] = find_aadhaar_in_text(page_text)
+            if seen['pages'] is not None:
+                seen['bytes'] += len(page_text.encode('utf-8'))
+                if seen['bytes'] > PDF_TEXT_CACHE_MAX_BYTES:
+                    seen['pages'] = None
+                else:
+                    seen['pages'].append(page_text)
+            yield page_text
+
+    def records():
+        for idx, chunk in enumerate(iter_structured_chunks(pages())):
+            collect_profile_fields(chunk['text'], f"{filename}#{idx}", profile_updates)
+            yield {'filename': filename, 'scheme_id': scheme_id, 'text': chunk['text'], 'doc_type': 'pdf',
+                   'metadata': chunk_metadata(chunk, ocr_conf=0, orig_filename=filename), 'chunk_index': idx}
+
+    written = save_document_records_stream(user_id, records())
+    if not written:
+        save_document_records(user_id, [{'filename': filename, 'scheme_id': scheme_id, 'text': "", 'doc_type': 'pdf',
+                                         'metadata': {'ocr_conf': 0}, 'chunk_index': -1}], create_user=False)
+    if profile_updates:
+        profile_store.update(user_id, profile_updates)
+    # Same rule as extract_texts: failed, capped and empty reads may succeed on retry, so they aren't cached
+    kept = seen['pages']
+    if kept is not None and report.get('complete') and any(p.strip() for p in kept):
+        try:
+            extraction_cache.put(key, pdf_result(kept))
+        except Exception as e:
+            print(f"Extraction cache write failed for {filename}: {e}")
+    return written, found['aadhaar']
 
 # -------------------------
 # Aadhaar hashing + lookup
@@ -287,6 +259,15 @@ def hash_aadhaar(aadhaar: str) -> str:
     cleaned = re.sub(r'\D', '', aadhaar).strip()
     return hashlib.sha256((cleaned + salt).encode('utf-8')).hexdigest()
 
+def _hash_aadhaar_or_none(aadhaar):
+    """hash_aadhaar, but None when no number was found or AADHAAR_SALT is not set."""
+    if not aadhaar:
+        return None
+    try:
+        return hash_aadhaar(aadhaar)
+    except EnvironmentError:
+        return None
+
 def find_user_by_aadhaar(aadhaar: str):
     """
     Returns user_id if an existing user has the same aadhaar hash, else None.
@@ -295,20 +276,42 @@ def find_user_by_aadhaar(aadhaar: str):
         h = hash_aadhaar(aadhaar)
     except EnvironmentError:
         return None
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT user_id FROM users WHERE aadhaar_hash = ?", (h,))
-    row = cur.fetchone()
-    conn.close()
-    return row['user_id'] if row else None
+    return find_user_by_aadhaar_hash(h)
 
 # -------------------------
 # AI / RAG helpers (Gemini prompts, same as before)
 # -------------------------
+# Response schema for form-field analysis (Gemini structured output)
+FORM_FIELDS_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'field_id': {'type': 'STRING'},
+            'field_name': {'type': 'STRING'},
+            'label': {'type': 'STRING'},
+            'field_type': {'type': 'STRING'},
+            'priority': {'type': 'INTEGER'},
+        },
+        'required': ['field_id', 'field_name', 'label'],
+    },
+}
+
 def analyze_form_fields_with_rag(template_path):
-    """Analyze DOCX to get candidate fields and ask model to consolidate & output JSON list."""
-    if not model:
-        flash("AI Model is not configured. Please set the GEMINI_API_KEY.", "danger")
+    """Analyze DOCX to get candidate fields and ask model to consolidate & output JSON list.
+    Results are cached per template content hash, so each template is analyzed once."""
+    try:
+        cache_key = field_schema_cache.key_for(template_path)
+        cached = field_schema_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        print(f"Field schema cache lookup failed for {template_path}: {e}")
+        cache_key = None
+
+    if not llm:
+        if has_request_context():
+            flash("AI Model is not configured. Please set the GEMINI_API_KEY.", "danger")
         return []
 
     try:
@@ -353,30 +356,41 @@ Your tasks are to:
 Return ONLY a valid JSON array of objects, where each object represents a unique field.
 Example format:
 [
-  {
+  {{
     "field_id": "table_0_row_1_cell_1",
     "field_name": "applicant_name",
     "label": "Applicant Name",
     "field_type": "text",
     "priority": 10
-  }
+  }}
 ]
 JSON Output:
 """
-        response = model.generate_content(prompt)
-        json_string = response.text.strip().replace('```json', '').replace('```', '')
-        enhanced_fields = json.loads(json_string)
+        parsed, complete = llm.generate_json(prompt, schema=FORM_FIELDS_SCHEMA, with_status=True)
+        # A reply cut off mid-array still yields every field object that arrived whole, but only for this
+        # request: caching it would leave the template short of fields until FIELD_PROMPT_VERSION changes
+        enhanced_fields = [f for f in (parsed if isinstance(parsed, list) else [])
+                           if isinstance(f, dict) and f.get('field_id') and f.get('field_name')]
+        if not complete:
+            print(f"Field analysis reply for {os.path.basename(template_path)} was truncated; not caching it")
+        elif cache_key and enhanced_fields:
+            field_schema_cache.put(cache_key, enhanced_fields, template_name=os.path.basename(template_path))
         return enhanced_fields
     except Exception as e:
         print(f"Error analyzing form fields with RAG: {e}")
-        flash(f"AI could not analyze the form. Error: {e}", "warning")
+        if has_request_context():
+            flash(f"AI could not analyze the form. Error: {e}", "warning")
         return []
 
-def get_structured_data_with_rag(documents_text, required_fields):
-    """Use Gemini to extract values for required fields from the combined document text."""
-    if not model or not documents_text:
-        return {}
+def warm_field_schema_cache():
+    """Analyze every scheme template up front so scheme fills never wait on field discovery."""
+    for scheme_id, scheme in SCHEMES.items():
+        template_path = os.path.join(app.config['TEMPLATE_FOLDER'], scheme['template_file'])
+        if os.path.exists(template_path):
+            fields = analyze_form_fields_with_rag(template_path)
+            print(f"Field schema for {scheme_id}: {len(fields)} fields")
 
+def _extraction_prompt(documents_text, required_fields):
     fields_json = json.dumps([{"field_name": f["field_name"], "label": f["label"]} for f in required_fields], indent=2)
     prompt = f"""
 You are an AI assistant specialized in extracting data from Indian KYC and land documents.
@@ -398,52 +412,51 @@ Based on the **Required Fields** list below, extract the corresponding informati
 
 JSON Output:
 """
+    return prompt
+
+def get_structured_data_with_rag(documents_text, required_fields):
+    """Use Gemini to extract values for required fields from the combined document text.
+    Keys missing from a partial reply are re-asked for on their own, not with the full field list."""
+    if not llm or not documents_text:
+        return {}
+
     try:
-        response = model.generate_content(prompt)
-        json_string = response.text.strip().replace('```json', '').replace('```', '')
-        return json.loads(json_string)
+        return llm.generate_json(
+            _extraction_prompt(documents_text, required_fields),
+            required_keys=[f["field_name"] for f in required_fields],
+            reask=lambda missing: _extraction_prompt(
+                documents_text, [f for f in required_fields if f["field_name"] in missing]))
     except Exception as e:
         print(f"Error calling Gemini API or parsing JSON: {e}")
         return {}
 
-def fill_form_template_precise(template_path, form_data, output_name):
-    """Fill the DOCX template based on field_id placements."""
+def fill_form_template_precise(template_path, form_data, output_name, as_pdf=False):
+    """Fill the DOCX template based on field_id placements (compiled once per template content).
+    With as_pdf the filled form is converted to PDF; if conversion fails the DOCX is returned instead.
+    Returns the stored file's name; an identical earlier fill under the same output_name is returned
+    without redoing the work (the name is part of the key, so another user's file is never handed out)."""
     try:
-        doc = Document(template_path)
-        filled_any = False
-        for field_id, value in form_data.items():
-            if not value:
-                continue
-            try:
-                parts = field_id.split('_')
-                if field_id.startswith('table_'):
-                    table_idx, row_idx, cell_idx = int(parts[1]), int(parts[3]), int(parts[5])
-                    if table_idx < len(doc.tables) and row_idx < len(doc.tables[table_idx].rows) and cell_idx < len(doc.tables[table_idx].rows[row_idx].cells):
-                        target_cell = doc.tables[table_idx].rows[row_idx].cells[cell_idx]
-                        target_cell.text = value
-                        filled_any = True
-                elif field_id.startswith('para_'):
-                    para_idx = int(parts[1])
-                    if para_idx < len(doc.paragraphs):
-                        para = doc.paragraphs[para_idx]
-                        if ':' in para.text:
-                            para.text = para.text.split(':')[0] + ': ' + value
-                        else:
-                            para.text = value
-                        filled_any = True
-            except (ValueError, IndexError) as e:
-                print(f"Could not parse or find position for field_id {field_id}: {e}")
-                continue
-
-        if not filled_any:
+        compiled = docx_templates.get(template_path)
+        ext = '.pdf' if as_pdf else '.docx'
+        fill_key = f"{compiled.fill_key(form_data)}:{output_name}{ext}"
+        existing = generated_store.find(fill_key)
+        if existing:
+            return existing['name']
+
+        filled_docx, filled_count = compiled.fill(form_data)
+        if not filled_count:
             print("Warning: No fields were filled in the document.")
             return None
-
-        timestamp = str(int(time.time()))
-        output_filename = f"{output_name}-filled-{timestamp}.docx"
-        output_path = os.path.join(app.config['GENERATED_FOLDER'], output_filename)
-        doc.save(output_path)
-        return output_filename
+        output, source_key = filled_docx, fill_key
+        if as_pdf:
+            try:
+                output = pdf_renderer.render(filled_docx)
+            except Exception as e:
+                print(f"PDF conversion failed, returning DOCX: {e}")
+                # Not recorded as this fill's result, so the next request tries PDF again
+                ext, source_key = '.docx', None
+        stored = generated_store.put(output, f"{output_name}-filled{ext}", source_key=source_key)
+        return stored['name']
     except Exception as e:
         print(f"Error filling form template: {e}")
         return None
@@ -457,6 +470,8 @@ def ingest_documents():
     Ingest uploaded docs for a user. Returns JSON with user_id UUID.
     If client sends user_id it will be used; otherwise a new UUID is generated.
     If an Aadhaar-like number is found in the text it is hashed and stored (not the raw Aadhaar).
+    Without a user_id, documents whose hash already belongs to a user go to (are merged into) that user;
+    an explicit user_id is never merged away -- a hash owned by someone else is reported as a warning.
     """
     scheme_id = request.form.get('scheme')
     provided_user_id = request.form.get('user_id', '').strip() or None
@@ -472,15 +487,20 @@ def ingest_documents():
     per_file_texts = []  # list of (filename, extracted_text, avg_conf, source)
     inferred_aadhaar = None
 
-    # Save files & extract text
+    # Read files into memory (large ones spool to a temp file), then extract text from all non-PDF files in parallel
+    uploads = []
     for file in files:
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
             saved_filenames.append(filename)
+            uploads.append(read_upload(file.stream, filename))
+
+    try:
+        # PDFs are streamed page by page straight into the DB further down
+        pdf_files = [(fn, u) for fn, u in zip(saved_filenames, uploads) if fn.lower().endswith('.pdf')]
+        other_files = [(fn, u) for fn, u in zip(saved_filenames, uploads) if not fn.lower().endswith('.pdf')]
 
-            res = extract_text_from_file(filepath)
+        for (filename, _), res in zip(other_files, extract_texts([u for _, u in other_files])):
             text = res.get('text', '') or ''
             avg_conf = res.get('avg_conf', None)
             source = res.get('source', None)
@@ -491,41 +511,65 @@ def ingest_documents():
                 if a:
                     inferred_aadhaar = a
 
-    # Determine user_id (client-provided preferred, else new UUID)
-    user_id = provided_user_id or str(uuid.uuid4())
+        # Determine user_id: client-provided (never merged away), else the existing owner of this Aadhaar, else a new
+        # UUID. The number found may be a spouse's or co-owner's, so an explicit user_id only reports the conflict.
+        user_id = provided_user_id or str(uuid.uuid4())
+        aadhaar_conflict = False
+
+        def resolve_owner(aadhaar):
+            nonlocal user_id, aadhaar_conflict
+            aadhaar_hash = _hash_aadhaar_or_none(aadhaar)
+            if not aadhaar_hash:
+                return
+            owner = claim_user(user_id, aadhaar_hash, merge=not provided_user_id)
+            if provided_user_id and owner != user_id:
+                print(f"Aadhaar in documents for user {user_id} belongs to another user; not merging")
+                aadhaar_conflict = True
+            elif not provided_user_id:
+                user_id = owner
+
+        resolve_owner(inferred_aadhaar)
+
+        # Save the user and every non-PDF chunk in a single transaction
+        records = []
+        for filename, text, avg_conf, source in per_file_texts:
+            if not text.strip():
+                records.append({'filename': filename, 'scheme_id': scheme_id, 'text': "", 'doc_type': source,
+                                'metadata': {'ocr_conf': avg_conf or 0}, 'chunk_index': -1})
+                continue
 
-    # Hash detected aadhaar if present
-    aadhaar_hash = None
-    if inferred_aadhaar:
-        try:
-            aadhaar_hash = hash_aadhaar(inferred_aadhaar)
-        except EnvironmentError:
-            # AADHAAR_SALT not set; aadhaar_hash stays None
-            aadhaar_hash = None
-
-    # Save user (or update if exists)
-    save_user_if_new(user_id, aadhaar_hash=aadhaar_hash)
-
-    # Save documents into DB. Chunk text and store metadata.
-    for filename, text, avg_conf, source in per_file_texts:
-        if not text.strip():
-            save_document_record(user_id, filename, scheme_id, "", doc_type=source, metadata={'ocr_conf': avg_conf or 0}, chunk_index=-1)
-            continue
-
-        chunks = chunk_text_simple(text, words_per_chunk=400)
-        if not chunks:
-            save_document_record(user_id, filename, scheme_id, text, doc_type=source, metadata={'ocr_conf': avg_conf or 0}, chunk_index=-1)
-            continue
-
-        for idx, chunk in enumerate(chunks):
-            meta = {'ocr_conf': avg_conf or 0, 'orig_filename': filename}
-            save_document_record(user_id, filename, scheme_id, chunk, doc_type=source, metadata=meta, chunk_index=idx)
-
-    return jsonify({
+            chunks = chunk_text(text)
+            if not chunks:
+                records.append({'filename': filename, 'scheme_id': scheme_id, 'text': text, 'doc_type': source,
+                                'metadata': {'ocr_conf': avg_conf or 0}, 'chunk_index': -1})
+                continue
+
+            for idx, chunk in enumerate(chunks):
+                meta = chunk_metadata(chunk, ocr_conf=avg_conf or 0, orig_filename=filename)
+                records.append({'filename': filename, 'scheme_id': scheme_id, 'text': chunk['text'], 'doc_type': source,
+                                'metadata': meta, 'chunk_index': idx})
+        save_document_records(user_id, records)
+        profile_store.ingest_chunks(user_id, records)
+
+        # Stream PDFs; an Aadhaar number found only inside a PDF still resolves (or merges into) its owner
+        for filename, upload in pdf_files:
+            _, pdf_aadhaar = ingest_pdf_streaming(user_id, filename, upload, scheme_id)
+            if pdf_aadhaar and not inferred_aadhaar:
+                inferred_aadhaar = pdf_aadhaar
+                resolve_owner(pdf_aadhaar)
+    finally:
+        # Originals are only kept for reference: store them off the request path
+        release_uploads(uploads, upload_store)
+
+    response = {
         'message': 'Documents ingested successfully.',
         'user_id': user_id,
         'files_saved': saved_filenames
-    }), 200
+    }
+    if aadhaar_conflict:
+        response['warning'] = ('An Aadhaar number in these documents belongs to another user; '
+                               'the documents were kept under this user_id.')
+    return jsonify(response), 200
 
 @app.route('/auto_fill_user', methods=['POST'])
 def auto_fill_user():
@@ -559,34 +603,81 @@ def auto_fill_user():
 
     # uploaded form file (optional) for ad-hoc pdf/docx
     form_file = request.files.get('form_file')
+    template_path = None
+    if form_file:
+        # save uploaded form file to uploads and use it as template
+        template_path = upload_store.save_upload(form_file.stream, form_file.filename)['path']
+
+    params = {
+        'user_id': user_id,
+        'aadhaar': aadhaar_input,
+        'scheme': scheme_id,
+        'output_type': output_type,
+        'fields': fields_payload,
+        'template_path': template_path,
+        'wants_html': 'text/html' in request.headers.get('Accept', ''),
+    }
+
+    # Async mode: queue the work and let the client poll /jobs/<job_id>
+    async_flag = str(data.get('async') or request.form.get('async') or request.args.get('async') or '')
+    if async_flag.lower() in ('1', 'true', 'yes'):
+        params['wants_html'] = False
+        callback_url = (data.get('callback_url') or request.form.get('callback_url') or '').strip() or None
+        try:
+            job_id = job_queue.submit('auto_fill', {'params': params, 'base_url': request.host_url},
+                                      callback_url=callback_url)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for('get_job', job_id=job_id, _external=True)
+        }), 202
+
+    result, status = run_auto_fill(params)
+    if isinstance(result, str):
+        return result, status
+    return jsonify(result), status
+
+def run_auto_fill(params):
+    """
+    Core of /auto_fill_user, independent of the HTTP request so it can also run as a job.
+    Returns (response, status): response is a JSON-able dict, or rendered HTML when
+    params['wants_html'] is set and output_type is 'html'.
+    """
+    user_id = params.get('user_id') or ''
+    aadhaar_input = params.get('aadhaar') or ''
+    scheme_id = params.get('scheme') or ''
+    output_type = params.get('output_type') or 'pdf'
+    fields_payload = params.get('fields')
+    template_path = params.get('template_path')
+    template_fields = params.get('template_fields')  # already-analysed template fields (batch fills)
+    wants_html = params.get('wants_html', False)
 
     # Validate identification
     if not user_id and not aadhaar_input:
-        return jsonify({"success": False, "error": "Provide user_id or aadhaar"}), 400
+        return {"success": False, "error": "Provide user_id or aadhaar"}, 400
 
     if not user_id and aadhaar_input:
         found = find_user_by_aadhaar(aadhaar_input)
         if not found:
-            return jsonify({"success": False, "error": "No user found for provided Aadhaar"}), 404
+            return {"success": False, "error": "No user found for provided Aadhaar"}, 404
         user_id = found
 
-    # Load user's stored docs
-    docs = get_documents_by_user(user_id)
-    if not docs:
-        return jsonify({"success": False, "error": "No documents found for this user_id"}), 404
-    combined_text = "\n\n".join([d['text'] for d in docs if d.get('text')])
-    if not combined_text.strip():
-        return jsonify({"success": False, "error": "Stored documents contain no usable text"}), 400
-
-    # Determine template_path if needed (pdf flow)
-    template_path = None
-    if form_file:
-        # save uploaded form file temporarily to uploads and use it as template
-        fname = secure_filename(form_file.filename)
-        fp = os.path.join(app.config['UPLOAD_FOLDER'], fname)
-        form_file.save(fp)
-        template_path = fp
-    elif scheme_id:
+    # The precomputed profile answers most fields; raw chunks are only loaded when it can't
+    docs = None
+    profile = profile_store.get(user_id)
+    if profile is None:
+        # Users ingested before profiles existed: build theirs once from the stored chunks
+        docs = get_documents_by_user(user_id)
+        if not docs:
+            return {"success": False, "error": "No documents found for this user_id"}, 404
+        profile_store.ingest_chunks(user_id, docs)
+        profile = profile_store.get(user_id)
+
+    # Determine template_path if needed (pdf flow); an uploaded form_file takes precedence
+    if not template_path and scheme_id:
         scheme_info = SCHEMES.get(scheme_id)
         if scheme_info:
             template_path = os.path.join(app.config['TEMPLATE_FOLDER'], scheme_info['template_file'])
@@ -596,29 +687,75 @@ def auto_fill_user():
     # Build required_fields list (for RAG)
     # Priority: client-provided fields_payload -> if not present, template-derived fields (if template_path)
     required_fields = []
-    field_client_map = {}  # maps client form_field_id -> desired field_name (to map returned values)
+    field_client_map = {}  # maps field_name -> client form_field_ids (to map returned values)
     if fields_payload and isinstance(fields_payload, list):
         # Client fields expected: [{"field_id":"f1","label":"Full name","field_type":"text"}, ...]
         for f in fields_payload:
             label = f.get('label') or f.get('name') or f.get('field_id') or ''
-            field_name = generate_field_name_from_label(label)
-            required_fields.append({"field_name": field_name, "label": label})
+            # Labels that resolve to a canonical profile field share one key ("Applicant Name",
+            # "Name of Farmer" and "किसान का नाम" are all 'name'), so each is looked up / asked once
+            resolved = label_index.resolve(label, user_id=user_id)
+            field_name = resolved[0] if resolved else generate_field_name_from_label(label)
+            if field_name not in field_client_map:
+                field = {"field_name": field_name, "label": label}
+                if resolved:
+                    field["canonical"] = field_name
+                required_fields.append(field)
             # map back later using client id
-            field_client_map[field_name] = f.get('field_id') or label
+            field_client_map.setdefault(field_name, []).append(f.get('field_id') or label)
     else:
         # No client-provided fields: try to derive from template
         if template_path:
-            required_fields = analyze_form_fields_with_rag(template_path)
+            required_fields = template_fields or analyze_form_fields_with_rag(template_path)
             # analyze_form_fields_with_rag returns objects with field_name and field_id (doc positions).
             # For mapping back to client targets, we'll use the returned 'field_name' and keep doc field_ids as keys.
         else:
             # if neither client fields nor template available, can't proceed
-            return jsonify({"success": False, "error": "No form fields provided and no template available to analyze."}), 400
+            return {"success": False, "error": "No form fields provided and no template available to analyze."}, 400
+
+    # Retrieve only the chunks relevant to the required fields, then call RAG
+    def fts_ranker(queries, k):
+        # select_chunks drops empty chunks, so map ids onto its filtered list
+        position = {d['id']: i for i, d in enumerate(d for d in docs if (d.get('text') or '').strip())}
+        return [[position[i] for i in ids if i in position] for ids in rank_user_chunks(user_id, queries, k)]
+
+    profile_hits = profile_store.lookup(profile, required_fields)
+    remaining = [f for f in required_fields if f.get('field_name') not in profile_hits]
+    rule_hits = {}
+    llm_fields = []
+    context_chunks = []
+    extracted_data = {}
+    if remaining:
+        if docs is None:
+            docs = get_documents_by_user(user_id)
+        if not docs:
+            return {"success": False, "error": "No documents found for this user_id"}, 404
+        if not any((d.get('text') or '').strip() for d in docs):
+            return {"success": False, "error": "Stored documents contain no usable text"}, 400
+        # Fixed-format fields (Aadhaar, PAN, IFSC, ...) are read deterministically; only the rest go to Gemini
+        rule_hits = extract_fields("\n\n".join(d.get('text') or '' for d in docs), remaining)
+        llm_fields = [f for f in remaining if f.get('field_name') not in rule_hits]
+    if llm_fields:
+        context_chunks = select_chunks(docs, llm_fields, top_k=RAG_TOP_K, token_budget=RAG_TOKEN_BUDGET,
+                                       embedder=rag_embedder, lexical=fts_ranker)
+        combined_text = "\n\n".join(d['text'] for d in context_chunks)
+        extracted_data = get_structured_data_with_rag(combined_text, llm_fields)
+        if extracted_data is None:
+            return {"success": False, "error": "AI failed to extract structured data"}, 500
+        if isinstance(extracted_data, dict):
+            try:
+                profile_store.learn(user_id, llm_fields, extracted_data)
+            except Exception as e:
+                print(f"Could not update profile for {user_id}: {e}")
 
-    # Call RAG to extract structured data
-    extracted_data = get_structured_data_with_rag(combined_text, required_fields)
-    if extracted_data is None:
-        return jsonify({"success": False, "error": "AI failed to extract structured data"}), 500
+    def field_result(fname):
+        if fname in profile_hits:
+            hit = profile_hits[fname]
+            return {"value": hit['value'], "confidence": hit['confidence'], "source": "profile"}
+        if fname in rule_hits:
+            return {"value": rule_hits[fname]['value'], "confidence": rule_hits[fname]['confidence'], "source": "rules"}
+        value = extracted_data.get(fname, "") if isinstance(extracted_data, dict) else ""
+        return {"value": str(value), "confidence": None, "source": "rag"}
 
     # Map RAG extracted data back to the output mapping expected by client or by template
     mapped_fields = {}
@@ -626,25 +763,22 @@ def auto_fill_user():
     if fields_payload and isinstance(fields_payload, list):
         for rf in required_fields:
             fname = rf.get('field_name')
-            client_fid = field_client_map.get(fname) or fname
-            value = extracted_data.get(fname, "") if isinstance(extracted_data, dict) else ""
-            mapped_fields[client_fid] = {"value": str(value), "confidence": None, "source": "rag"}
+            for client_fid in field_client_map.get(fname) or [fname]:
+                mapped_fields[client_fid] = field_result(fname)
     else:
         # No client fields; we derived required_fields from template (which has 'field_id' positions)
         # required_fields likely look like: [{ "field_id":"para_3", "field_name":"applicant_name", ... }, ...]
         # If analyze returned these richer objects, use field['field_id'] as key to map to extracted_data[field_name]
         for f in required_fields:
             field_id = f.get('field_id') or f.get('field_name')
-            fname = f.get('field_name')
-            value = extracted_data.get(fname, "") if isinstance(extracted_data, dict) else ""
-            mapped_fields[field_id] = {"value": str(value), "confidence": None, "source": "rag"}
+            mapped_fields[field_id] = field_result(f.get('field_name'))
 
     # Now branch for output_type
     try:
         if output_type == 'pdf':
             # Must have a template_path
             if not template_path:
-                return jsonify({"success": False, "error": "No template provided for PDF flow (provide scheme or upload form_file)."}), 400
+                return {"success": False, "error": "No template provided for PDF flow (provide scheme or upload form_file)."}, 400
 
             # fill_form_template_precise expects mapping doc_field_id -> value
             # If we used client fields, we don't have doc_field_ids; attempt to map using field_name -> doc field id if available
@@ -652,62 +786,168 @@ def auto_fill_user():
             if fields_payload and isinstance(fields_payload, list) and template_path:
                 # attempt to use analyze_form_fields_with_rag(template_path) to map field_names -> doc field_id
                 tpl_fields = analyze_form_fields_with_rag(template_path)
-                name_to_id = {f.get('field_name'): f.get('field_id') for f in tpl_fields if f.get('field_name') and f.get('field_id')}
-                for fname, client_fid in field_client_map.items():
+                name_to_id = {}
+                for f in tpl_fields:
+                    if f.get('field_name') and f.get('field_id'):
+                        name_to_id[f['field_name']] = f['field_id']
+                        name_to_id.setdefault(canonical_field(f, label_index, user_id), f['field_id'])
+                for fname, client_fids in field_client_map.items():
                     doc_id = name_to_id.get(fname)
-                    if doc_id and mapped_fields.get(client_fid):
-                        form_fill_map[doc_id] = mapped_fields[client_fid]['value']
+                    if doc_id and mapped_fields.get(client_fids[0]):
+                        form_fill_map[doc_id] = mapped_fields[client_fids[0]]['value']
             else:
                 # template-derived mapping stored already in mapped_fields keyed by doc field ids
                 form_fill_map = {k: v['value'] for k, v in mapped_fields.items()}
 
             if not form_fill_map:
-                return jsonify({"success": False, "error": "Could not map extracted values to template fields for PDF fill."}), 400
+                return {"success": False, "error": "Could not map extracted values to template fields for PDF fill."}, 400
 
-            filled_filename = fill_form_template_precise(template_path, form_fill_map, (scheme_id or "form") + "_" + user_id)
+            filled_filename = fill_form_template_precise(template_path, form_fill_map, (scheme_id or "form") + "_" + user_id,
+                                                         as_pdf=True)
             if filled_filename:
                 download_url = url_for('download_page', filename=filled_filename, _external=True)
-                return jsonify({"success": True, "mode":"pdf", "user_id": user_id, "filled_form": download_url})
+                return {"success": True, "mode":"pdf", "user_id": user_id, "filled_form": download_url,
+                        "format": os.path.splitext(filled_filename)[1].lstrip('.')}, 200
             else:
-                return jsonify({"success": False, "error": "Failed to fill template file."}), 500
+                return {"success": False, "error": "Failed to fill template file."}, 500
 
         elif output_type == 'html':
             # If browser client: render HTML with mapped fields; else return JSON + html_preview
-            accept = request.headers.get('Accept','')
             # Prepare fields for template (key -> value)
             html_fields = {k: v['value'] for k,v in mapped_fields.items()}
 
             # If client gave client-style field ids, these keys map directly to form inputs on page
-            if 'text/html' in accept:
+            if wants_html:
                 # Render the actual HTML form for browser interaction
-                return render_template('filled_form.html', fields=html_fields, user_id=user_id, scheme_id=scheme_id)
+                return render_template('filled_form.html', fields=html_fields, user_id=user_id, scheme_id=scheme_id), 200
             else:
                 # Return JSON, include a small html preview so clients can show a quick UI preview
                 html_preview = render_template('filled_form.html', fields=html_fields, user_id=user_id, scheme_id=scheme_id)
-                return jsonify({
+                return {
                     "success": True,
                     "mode": "html",
                     "user_id": user_id,
                     "scheme": scheme_id,
                     "fields": html_fields,
                     "html_preview": html_preview  # full html (can be large) - client can choose to display
-                })
+                }, 200
 
         elif output_type == 'json':
-            return jsonify({
+            return {
                 "success": True,
                 "mode": "json",
                 "user_id": user_id,
                 "scheme": scheme_id,
                 "mapped_fields": mapped_fields,
-                "diagnostics": {"doc_count": len(docs)}
-            })
+                "diagnostics": {"doc_count": len(docs or []), "chunks_sent": len(context_chunks),
+                                "profile_filled": len(profile_hits), "rule_filled": len(rule_hits),
+                                "llm_fields": len(llm_fields)}
+            }, 200
 
         else:
-            return jsonify({"success": False, "error": "Invalid output_type"}), 400
+            return {"success": False, "error": "Invalid output_type"}, 400
 
     except Exception as e:
-        return jsonify({"success": False, "error": f"Unexpected error: {str(e)}"}), 500
+        return {"success": False, "error": f"Unexpected error: {str(e)}"}, 500
+
+def _auto_fill_job(payload):
+    """Job handler: run an auto-fill outside the request that queued it."""
+    with app.test_request_context(base_url=payload.get('base_url')):
+        result, _status = run_auto_fill(payload['params'])
+    return result
+
+job_queue.register('auto_fill', _auto_fill_job)
+
+def _batch_targets(data):
+    """Users to fill for, from a user_ids list (JSON or comma-separated form field) and/or an uploaded CSV."""
+    user_ids = data.get('user_ids') if 'user_ids' in data else request.form.get('user_ids')
+    users_csv = request.files.get('users_csv')
+    return parse_batch_targets(user_ids, users_csv.read() if users_csv else None)
+
+@app.route('/batch_fill', methods=['POST'])
+def batch_fill():
+    """
+    Fill a scheme's form for many users in one call and stream back a ZIP.
+    Accepts JSON {"scheme": "...", "user_ids": [...]} or form-data with scheme and
+    user_ids (comma separated) and/or users_csv (a user_id or aadhaar column).
+    The template is analysed once; users are processed in parallel and each
+    filled DOCX is added to the streamed archive as soon as it is ready.
+    manifest.json, written last, lists the file or the error for every user.
+    """
+    data = request.get_json(silent=True) or {}
+    scheme_id = (data.get('scheme') or request.form.get('scheme') or '').strip()
+    scheme_info = SCHEMES.get(scheme_id)
+    if not scheme_info:
+        return jsonify({"success": False, "error": "Unknown or missing scheme"}), 400
+    template_path = os.path.join(app.config['TEMPLATE_FOLDER'], scheme_info['template_file'])
+    if not os.path.exists(template_path):
+        return jsonify({"success": False, "error": "Template not found for scheme"}), 404
+    try:
+        targets = _batch_targets(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if not targets:
+        return jsonify({"success": False, "error": "Provide user_ids or a users_csv file"}), 400
+
+    template_fields = analyze_form_fields_with_rag(template_path)
+    if not template_fields:
+        return jsonify({"success": False, "error": "Could not analyze the template's fields"}), 500
+    compiled = docx_templates.get(template_path)
+
+    def fill_one(target):
+        with app.app_context():
+            result, _status = run_auto_fill(dict(target, scheme=scheme_id, output_type='json',
+                                                 template_path=template_path, template_fields=template_fields))
+        if not result.get('success'):
+            return result.get('user_id'), None, result.get('error')
+        values = {field_id: v['value'] for field_id, v in result['mapped_fields'].items() if v['value']}
+        docx_bytes, filled = compiled.fill(values)
+        if not filled:
+            return result['user_id'], None, "No fields could be filled"
+        return result['user_id'], docx_bytes, None
+
+    def entries():
+        manifest = []
+        for target, outcome, error in iter_completed(fill_one, targets, max_workers=BATCH_FILL_WORKERS):
+            # Never echo a raw Aadhaar number back
+            who = {'user_id': target['user_id']} if target.get('user_id') else \
+                {'aadhaar_last4': target.get('aadhaar', '')[-4:]}
+            user_id, docx_bytes, failure = outcome if outcome else (None, None, f"Unexpected error: {error}")
+            if user_id:
+                who['user_id'] = user_id
+            if docx_bytes is None:
+                manifest.append(dict(who, success=False, error=failure))
+                continue
+            name = secure_filename(f"{scheme_id}_{user_id}.docx")
+            manifest.append(dict(who, success=True, file=name))
+            yield name, docx_bytes
+        yield 'manifest.json', json.dumps({'scheme': scheme_id, 'results': manifest}, indent=2).encode('utf-8')
+
+    archive_name = f"{scheme_id}-batch-{int(time.time())}.zip"
+    return Response(stream_with_context(stream_zip(entries())), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{archive_name}"'})
+
+@app.route('/confirm_fill', methods=['POST'])
+def confirm_fill():
+    """
+    The user accepted (possibly edited) a fill: teach the label index which
+    canonical field each label meant and store the confirmed values.
+    Body: {"user_id": "...", "fields": [{"label": "...", "value": "...", "canonical": "optional"}]}
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = (data.get('user_id') or '').strip()
+    fields = data.get('fields')
+    if not user_id or not isinstance(fields, list):
+        return jsonify({'success': False, 'error': 'Provide user_id and a fields list'}), 400
+    learned = profile_store.confirm(user_id, [f for f in fields if isinstance(f, dict)])
+    return jsonify({'success': True, 'learned': learned}), 200
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify(job)
 
 # -------------------------
 # Existing routes: front-end helpers
@@ -718,7 +958,7 @@ def index():
 
 @app.route('/manual', methods=['GET', 'POST'])
 def manual_fill():
-    if not model:
+    if not llm:
         flash("AI Model is not configured due to missing API key. Please contact the administrator.", "danger")
         return redirect(url_for('index'))
 
@@ -733,9 +973,8 @@ def manual_fill():
                 return redirect(request.url)
 
             try:
-                form_filename = secure_filename(form_file.filename)
-                form_path = os.path.join(app.config['UPLOAD_FOLDER'], form_filename)
-                form_file.save(form_path)
+                stored_form = upload_store.save_upload(form_file.stream, form_file.filename)
+                form_filename, form_path = stored_form['name'], stored_form['path']
 
                 required_fields = analyze_form_fields_with_rag(form_path)
                 if not required_fields:
@@ -744,16 +983,18 @@ def manual_fill():
 
                 extracted_data = {}
                 if support_docs and any(f.filename for f in support_docs):
-                    combined_text = ""
-                    for doc in support_docs:
-                        if doc and allowed_file(doc.filename):
-                            doc_filename = secure_filename(doc.filename)
-                            filepath = os.path.join(app.config['UPLOAD_FOLDER'], doc_filename)
-                            doc.save(filepath)
-                            combined_text += extract_text_from_file(filepath)['text'] + "\n\n"
-                    
+                    doc_uploads = [read_upload(doc.stream, secure_filename(doc.filename))
+                                   for doc in support_docs if doc and allowed_file(doc.filename)]
+                    try:
+                        combined_text = "".join(res['text'] + "\n\n" for res in extract_texts(doc_uploads))
+                    finally:
+                        release_uploads(doc_uploads, upload_store)
+
                     if combined_text.strip():
-                        extracted_data = get_structured_data_with_rag(combined_text, required_fields)
+                        extracted_data = {k: v['value'] for k, v in extract_fields(combined_text, required_fields).items()}
+                        llm_fields = [f for f in required_fields if f['field_name'] not in extracted_data]
+                        if llm_fields:
+                            extracted_data.update(get_structured_data_with_rag(combined_text, llm_fields) or {})
 
                 if extracted_data:
                     for field in required_fields:
@@ -770,9 +1011,9 @@ def manual_fill():
         
         elif step == '2':
             form_filename = request.form.get('form_filename')
-            form_path = os.path.join(app.config['UPLOAD_FOLDER'], form_filename)
+            form_path = upload_store.path(form_filename) if form_filename else None
 
-            if not form_filename or not os.path.exists(form_path):
+            if not form_path:
                 flash('Form template not found. Please start over.', 'danger')
                 return redirect(url_for('manual_fill'))
             
@@ -795,18 +1036,64 @@ def get_scheme_info(scheme_id):
         return jsonify(scheme)
     return jsonify({'error': 'Scheme not found'}), 404
 
+@app.route('/search')
+def search():
+    """Full-text search over ingested chunks: ?q=...&user_id=...&scheme_id=...&limit=..."""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Missing query parameter q'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    results = search_documents(query, user_id=request.args.get('user_id'),
+                               scheme_id=request.args.get('scheme_id'), limit=limit)
+    return jsonify({'success': True, 'query': query, 'results': results})
+
+@app.route('/llm_stats')
+def llm_stats():
+    return jsonify(llm.metrics() if llm else {'backend': None})
+
+@app.route('/db_stats')
+def db_stats():
+    return jsonify({'main': get_pool().stats(), 'extraction_cache': get_pool(EXTRACTION_CACHE_PATH).stats()})
+
 @app.route('/download_page/<filename>')
 def download_page(filename):
     return render_template('download.html', filename=filename)
 
 @app.route('/generated/<filename>')
 def download_form(filename):
-    return send_from_directory(app.config['GENERATED_FOLDER'], filename, as_attachment=True)
+    # Stored names embed the content hash, so the hash is a strong ETag; conditional=True answers
+    # If-None-Match with 304 and serves Range requests as 206 partial content
+    stored = generated_store.get(filename)
+    if stored:
+        return send_file(stored['path'], as_attachment=True, download_name=filename, etag=stored['sha256'],
+                         conditional=True, max_age=int(GENERATED_TTL_HOURS * 3600))
+    # Forms generated before the store existed
+    return send_from_directory(app.config['GENERATED_FOLDER'], filename, as_attachment=True, conditional=True)
 
 # -------------------------
 # Startup
 # -------------------------
-if __name__ == '__main__':
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_background_services():
+    """
+    Start this process's background work exactly once: OCR workers, interrupted
+    jobs, storage GC and the template/PDF warmers. Hooked to the first request,
+    so every gunicorn worker runs it after the fork; `python app.py` also runs it
+    up front, except in the debug reloader's watcher process, which never serves.
+    """
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+
     # Create necessary folders on startup
     for folder in [UPLOAD_FOLDER, GENERATED_FOLDER, TEMPLATE_FOLDER]:
         os.makedirs(folder, exist_ok=True)
@@ -814,5 +1101,29 @@ if __name__ == '__main__':
     # Init DB
     init_db()
 
-    app.run(debug=True)
+    # Pick up async jobs interrupted by a restart
+    job_queue.resume_pending()
+
+    # Expire old uploads and generated forms in the background
+    upload_store.start_gc()
+    generated_store.start_gc()
+
+    # Start OCR workers and load their Tesseract engines before the first upload
+    threading.Thread(target=lambda: print(f"OCR backends ready: {ocr_engine.warm()}"), daemon=True).start()
+
+    # Discover scheme template fields in the background
+    threading.Thread(target=warm_field_schema_cache, daemon=True).start()
+
+    # Start the DOCX -> PDF converters (LibreOffice profiles take seconds to create)
+    threading.Thread(target=lambda: print(f"PDF converter ready: {pdf_renderer.warm()}"), daemon=True).start()
+
+app.before_request(start_background_services)
+
+if __name__ == '__main__':
+    debug = True
+    # With the reloader this block runs twice; only the child (WERKZEUG_RUN_MAIN) serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+
+    app.run(debug=debug)
     CORS(app, supports_credentials=True)
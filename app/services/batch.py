@@ -0,0 +1,104 @@
+"""Helpers for batch form generation: bounded parallel work and a streamed ZIP.
+
+A field officer filling forms for a whole village sends one request; each
+farmer's form is produced by a worker pool and written into a ZIP archive that
+is streamed to the client as soon as that form is ready, so neither the
+archive nor all the forms have to be held in memory at once.
+"""
+
+import csv
+import io
+import itertools
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+BATCH_FILL_WORKERS = int(os.getenv('BATCH_FILL_WORKERS', '4'))
+BATCH_MAX_TARGETS = int(os.getenv('BATCH_MAX_TARGETS', '500'))
+
+
+class ZipStream(io.RawIOBase):
+    """Write-only, non-seekable sink for ``zipfile``; ``drain`` hands out what was written so far."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``(name, data)`` entries piece by piece, one entry at a time."""
+    sink = ZipStream()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Central directory, written on close
+    yield sink.drain()
+
+
+def iter_completed(fn: Callable[[Any], Any], items: Iterable[Any],
+                   max_workers: int = BATCH_FILL_WORKERS) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """Run ``fn`` over ``items`` on at most ``max_workers`` threads; yield (item, result, error) as each finishes."""
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='batch-fill') as pool:
+        futures = {pool.submit(fn, item): item for item in items}
+        try:
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], (None if error else future.result()), error
+        finally:
+            # Client went away: don't start the forms nobody will receive
+            for future in futures:
+                future.cancel()
+
+
+def parse_batch_targets(user_ids: Any = None, users_csv: Optional[bytes] = None,
+                        max_targets: int = BATCH_MAX_TARGETS) -> List[Dict[str, str]]:
+    """
+    Users to fill for, as [{'user_id'} or {'aadhaar'}], from ``user_ids`` (a list,
+    or a comma-separated string) and/or the bytes of a CSV with a user_id or
+    aadhaar column (or one user_id per line). Raises ValueError for other
+    ``user_ids`` types, a CSV that is not UTF-8, or more than ``max_targets`` users.
+    """
+    if isinstance(user_ids, str):
+        user_ids = user_ids.split(',')
+    elif user_ids is None:
+        user_ids = []
+    elif not isinstance(user_ids, list) or not all(isinstance(u, (str, int)) for u in user_ids):
+        raise ValueError("user_ids must be a list of ids or a comma-separated string")
+    targets = [{'user_id': str(u).strip()} for u in user_ids if str(u).strip()]
+    if users_csv:
+        try:
+            text = users_csv.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError("users_csv must be a UTF-8 encoded CSV file")
+        rows: Iterator[List[str]] = csv.reader(io.StringIO(text))
+        first = next(rows, [])
+        header = [h.strip().lower() for h in first]
+        if not ('user_id' in header or 'aadhaar' in header):
+            header = ['user_id']  # no header row: one user_id per line
+            rows = itertools.chain([first], rows)
+        for row in rows:
+            target = {key: row[i].strip() for i, key in enumerate(header)
+                      if key in ('user_id', 'aadhaar') and i < len(row) and row[i].strip()}
+            if target:
+                targets.append(target)
+            if len(targets) > max_targets:
+                break
+    if len(targets) > max_targets:
+        raise ValueError(f"At most {max_targets} users can be filled in one batch")
+    return targets
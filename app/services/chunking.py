@@ -0,0 +1,132 @@
+"""Splitting extracted document text into chunks for storage and retrieval.
+
+Chunks follow the document's structure: text is cut only at line boundaries
+(a PDF text line, a DOCX paragraph or a tab-joined table row), preferably at a
+paragraph or page break, so a field such as "Account No: 1234 5678" never
+straddles two chunks. Each chunk targets a token budget, repeats a little of
+the previous chunk as overlap, and records where it came from (page range and
+character offsets into the extracted text) for precise retrieval and citation.
+"""
+
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .retrieval import estimate_tokens
+
+CHUNK_TOKENS = int(os.getenv('CHUNK_TOKENS', '256'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+
+# Separator ``extract_text_from_file`` puts between PDF pages; offsets assume it
+PAGE_SEPARATOR = "\n\n"
+
+Block = Dict[str, Any]
+Chunk = Dict[str, Any]
+
+
+def _split_long_line(text: str, start: int, max_tokens: int) -> Iterator[Block]:
+    """Break a single over-budget line into word windows, keeping offsets."""
+    max_chars = max_tokens * 4
+    pos = 0
+    while pos < len(text):
+        end = min(len(text), pos + max_chars)
+        if end < len(text):
+            space = text.rfind(' ', pos + 1, end)
+            if space > pos:
+                end = space
+        piece = text[pos:end].strip()
+        if piece:
+            offset = start + pos + (len(text[pos:end]) - len(text[pos:end].lstrip()))
+            yield {'text': piece, 'start': offset, 'end': offset + len(piece)}
+        pos = end
+
+
+def _blocks(text: str, page: Optional[int], base: int, max_tokens: int) -> Iterator[Block]:
+    """Non-empty lines of ``text`` with offsets; ``brk`` marks a paragraph/page break before it."""
+    brk = True
+    pos = 0
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            brk = True
+        else:
+            start = base + pos + (len(line) - len(line.lstrip()))
+            pieces = [{'text': stripped, 'start': start, 'end': start + len(stripped)}]
+            if estimate_tokens(stripped) > max_tokens:
+                pieces = list(_split_long_line(line, base + pos, max_tokens))
+            for piece in pieces:
+                piece.update({'page': page, 'brk': brk, 'tokens': estimate_tokens(piece['text'])})
+                yield piece
+                brk = False
+        pos += len(line) + 1
+
+
+def _make_chunk(blocks: List[Block]) -> Chunk:
+    parts = []
+    for i, b in enumerate(blocks):
+        if i:
+            parts.append("\n\n" if b['brk'] else "\n")
+        parts.append(b['text'])
+    chunk = {'text': "".join(parts), 'char_start': blocks[0]['start'], 'char_end': blocks[-1]['end']}
+    pages = [b['page'] for b in blocks if b['page'] is not None]
+    if pages:
+        chunk['page_start'], chunk['page_end'] = pages[0], pages[-1]
+    return chunk
+
+
+def iter_structured_chunks(pages: Iterable[str], max_tokens: int = CHUNK_TOKENS,
+                           overlap_tokens: int = CHUNK_OVERLAP_TOKENS, paged: bool = True) -> Iterator[Chunk]:
+    """
+    Chunk a stream of page texts (e.g. ``iter_pdf_pages``) incrementally.
+
+    Yields dicts with 'text', 'char_start', 'char_end' (offsets into the pages
+    joined by ``PAGE_SEPARATOR``) and, when ``paged``, 1-based 'page_start' /
+    'page_end'. Only about one chunk's worth of text is held in memory.
+    """
+    current: List[Block] = []
+    base = 0
+
+    def cut_point() -> int:
+        """Latest paragraph/page break that leaves the chunk at least half full, else the end."""
+        cut, seen = len(current), 0
+        for i, b in enumerate(current):
+            if i and b['brk'] and seen >= max_tokens // 2:
+                cut = i
+            seen += b['tokens']
+        return cut
+
+    def overlap(emitted: List[Block], room: int) -> List[Block]:
+        """Trailing lines of the emitted chunk to repeat (never its first line)."""
+        tail: List[Block] = []
+        budget = min(overlap_tokens, room)
+        for b in reversed(emitted[1:]):
+            if b['tokens'] > budget:
+                break
+            tail.insert(0, b)
+            budget -= b['tokens']
+        return tail
+
+    for page_no, text in enumerate(pages, start=1):
+        for block in _blocks(text, page_no if paged else None, base, max_tokens):
+            used = sum(b['tokens'] for b in current)
+            if current and used + block['tokens'] > max_tokens:
+                cut = cut_point()
+                emitted, rest = current[:cut], current[cut:]
+                yield _make_chunk(emitted)
+                room = max_tokens - block['tokens'] - sum(b['tokens'] for b in rest)
+                current = overlap(emitted, room) + rest
+            current.append(block)
+        base += len(text) + len(PAGE_SEPARATOR)
+    if current:
+        yield _make_chunk(current)
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Chunk]:
+    """Chunk one extracted (unpaged) text; offsets refer to ``text``."""
+    return list(iter_structured_chunks([text], max_tokens, overlap_tokens, paged=False))
+
+
+def chunk_metadata(chunk: Chunk, **extra: Any) -> Dict[str, Any]:
+    """``documents.metadata`` JSON for a chunk: its location plus ``extra`` fields."""
+    meta = {k: chunk[k] for k in ('page_start', 'page_end', 'char_start', 'char_end') if k in chunk}
+    meta.update(extra)
+    return meta
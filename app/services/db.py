@@ -0,0 +1,417 @@
+"""SQLite persistence for users and ingested document chunks."""
+
+import json
+import os
+from itertools import islice
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from flask import g, has_app_context
+
+DB_PATH = os.getenv('DB_PATH', 'data.db')
+
+# WAL lets readers proceed while an ingest is writing, and synchronous=NORMAL
+# only fsyncs at checkpoints instead of on every commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # ~16MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+STATEMENT_CACHE_SIZE = 256
+
+
+def get_db_conn(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Open a new, fully configured connection (prefer ``db_connection()``)."""
+    conn = sqlite3.connect(db_path or DB_PATH, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections for one database file.
+
+    ``max_idle`` bounds how many connections are kept open between uses;
+    acquiring never blocks, extra connections are simply closed on release.
+    Each connection keeps its own prepared-statement cache, so reusing
+    connections also reuses compiled statements.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = POOL_SIZE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+        self._in_use = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = get_db_conn(self.db_path)
+            reused = False
+        with self._lock:
+            self._in_use += 1
+            if reused:
+                self._reused += 1
+            else:
+                self._created += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._in_use -= 1
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'db_path': self.db_path,
+                'idle': self._idle.qsize(),
+                'in_use': self._in_use,
+                'max_idle': self.max_idle,
+                'created': self._created,
+                'reused': self._reused,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    path = db_path or DB_PATH
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+
+@contextmanager
+def db_connection(db_path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled connection. Inside a Flask app context the connection for
+    the main database is held on ``flask.g`` for the rest of the request, so
+    every helper called while serving it shares one connection.
+    """
+    path = db_path or DB_PATH
+    if has_app_context() and path == DB_PATH:
+        if 'db_conn' not in g:
+            g.db_conn = get_pool(path).acquire()
+        yield g.db_conn
+        return
+    with get_pool(path).connection() as conn:
+        yield conn
+
+
+def release_request_connection(exc: Optional[BaseException] = None) -> None:
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        get_pool(DB_PATH).release(conn)
+
+
+def init_app(app) -> None:
+    """Return the request-scoped connection to the pool at teardown."""
+    app.teardown_appcontext(release_request_connection)
+
+
+def init_db(db_path: Optional[str] = None) -> None:
+    with db_connection(db_path) as conn:
+        _create_schema(conn)
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+    # users table stores internal uuid and optional hashed aadhaar
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        aadhaar_hash TEXT,
+        created_at TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        filename TEXT,
+        scheme_id TEXT,
+        doc_type TEXT,
+        text TEXT,
+        metadata TEXT,
+        chunk_index INTEGER,
+        created_at TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_user ON documents(user_id)")
+    # Canonical field -> {value, confidence, source} per user, maintained by ProfileStore
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id TEXT PRIMARY KEY,
+        version INTEGER,
+        fields TEXT,
+        updated_at TEXT
+    )
+    """)
+    _create_search_index(cur)
+    conn.commit()
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_users_aadhaar_hash'").fetchone():
+        with conn:
+            _merge_duplicate_users(conn.cursor())
+            # One user per Aadhaar; NULLs (no Aadhaar seen yet) are not considered equal
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_aadhaar_hash ON users(aadhaar_hash)")
+
+
+def _create_search_index(cur: sqlite3.Cursor) -> None:
+    """
+    FTS5 index over ``documents.text`` (external content, so text is not stored
+    twice), kept in sync by triggers. Rows that existed before the index are
+    backfilled in one 'rebuild' pass the first time it is created.
+    """
+    exists = cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'").fetchone()
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+        text, filename, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts(rowid, text, filename) VALUES (new.id, new.text, new.filename);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, text, filename) VALUES ('delete', old.id, old.text, old.filename);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE OF text, filename ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, text, filename) VALUES ('delete', old.id, old.text, old.filename);
+        INSERT INTO documents_fts(rowid, text, filename) VALUES (new.id, new.text, new.filename);
+    END
+    """)
+    if not exists:
+        cur.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+
+
+def rebuild_search_index(db_path: Optional[str] = None) -> int:
+    """Re-index every document (e.g. after restoring an old data.db). Returns the row count."""
+    with db_connection(db_path) as conn, conn:
+        conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+        return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def _merge_users(cur: sqlite3.Cursor, keep_user_id: str, merged_user_ids: List[str]) -> None:
+    """Move the documents of ``merged_user_ids`` to ``keep_user_id`` and drop those users."""
+    for user_id in merged_user_ids:
+        if user_id == keep_user_id:
+            continue
+        cur.execute("UPDATE documents SET user_id = ? WHERE user_id = ?", (keep_user_id, user_id))
+        _merge_profiles(cur, keep_user_id, user_id)
+        cur.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+
+def merge_profile_fields(fields: Dict[str, Any], updates: Dict[str, Any]) -> bool:
+    """
+    Fold ``updates`` into ``fields`` in place. Returns True if anything changed.
+    A value is only replaced by a strictly more confident one, so the first
+    "Name:" line ingested is not overwritten by a nominee's on a later document;
+    a user's confirmation is the exception and always supersedes an earlier one.
+    """
+    changed = False
+    for name, entry in updates.items():
+        current = fields.get(name)
+        if current is not None:
+            if entry['value'] == current['value'] and entry['confidence'] == current['confidence']:
+                continue
+            superseded = entry['confidence'] > current['confidence'] or (
+                entry['confidence'] == current['confidence'] and entry.get('source') == 'confirmed')
+            if not superseded:
+                continue
+        fields[name] = entry
+        changed = True
+    return changed
+
+
+def _merge_profiles(cur: sqlite3.Cursor, keep_user_id: str, merged_user_id: str) -> None:
+    merged = cur.execute("SELECT fields FROM user_profiles WHERE user_id = ?", (merged_user_id,)).fetchone()
+    if not merged:
+        return
+    kept = cur.execute("SELECT version, fields FROM user_profiles WHERE user_id = ?", (keep_user_id,)).fetchone()
+    fields = json.loads(kept[1]) if kept else {}
+    merge_profile_fields(fields, json.loads(merged[0]))
+    cur.execute("INSERT OR REPLACE INTO user_profiles (user_id, version, fields, updated_at) VALUES (?, ?, ?, ?)",
+                (keep_user_id, (kept[0] if kept else 0) + 1, json.dumps(fields), datetime.utcnow().isoformat()))
+    cur.execute("DELETE FROM user_profiles WHERE user_id = ?", (merged_user_id,))
+
+
+def _merge_duplicate_users(cur: sqlite3.Cursor) -> int:
+    """
+    Migration run before the unique Aadhaar index is created: users sharing an
+    aadhaar_hash are merged into the earliest-created one. Returns users removed.
+    """
+    cur.execute("UPDATE users SET aadhaar_hash = NULL WHERE aadhaar_hash = ''")
+    removed = 0
+    dupes = cur.execute("SELECT aadhaar_hash FROM users WHERE aadhaar_hash IS NOT NULL "
+                        "GROUP BY aadhaar_hash HAVING COUNT(*) > 1").fetchall()
+    for (aadhaar_hash,) in dupes:
+        user_ids = [r[0] for r in cur.execute(
+            "SELECT user_id FROM users WHERE aadhaar_hash = ? ORDER BY created_at, user_id", (aadhaar_hash,))]
+        _merge_users(cur, user_ids[0], user_ids[1:])
+        removed += len(user_ids) - 1
+    if removed:
+        print(f"Merged {removed} duplicate users sharing an Aadhaar hash")
+    return removed
+
+
+def _upsert_user(cur: sqlite3.Cursor, user_id: str, aadhaar_hash: Optional[str]) -> None:
+    cur.execute("INSERT OR IGNORE INTO users (user_id, aadhaar_hash, created_at) VALUES (?, NULL, ?)",
+                (user_id, datetime.utcnow().isoformat()))
+    if aadhaar_hash:
+        # If user exists but has no aadhaar_hash yet, set it (unless another user already owns it)
+        cur.execute("""
+            UPDATE users SET aadhaar_hash = ? WHERE user_id = ? AND (aadhaar_hash IS NULL OR aadhaar_hash = '')
+            AND NOT EXISTS (SELECT 1 FROM users WHERE aadhaar_hash = ?)
+        """, (aadhaar_hash, user_id, aadhaar_hash))
+
+
+def claim_user(user_id: str, aadhaar_hash: str, merge: bool = True, db_path: Optional[str] = None) -> str:
+    """
+    Resolve which user documents carrying ``aadhaar_hash`` belong to. If nobody
+    owns the hash yet, ``user_id`` is created (if needed) and takes it. If
+    another user owns it, that user is returned and any documents already
+    stored under ``user_id`` are merged into it -- unless ``user_id`` is tied
+    to a different Aadhaar, in which case it is kept as is.
+
+    With ``merge=False`` (the caller named ``user_id`` explicitly) nothing is
+    ever merged: ``user_id`` is created if needed and the hash's owner is
+    returned, so a result other than ``user_id`` signals a conflict.
+    """
+    with db_connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")  # take the write lock before the lookup, so two ingests can't both claim
+        try:
+            cur = conn.cursor()
+            row = cur.execute("SELECT user_id FROM users WHERE aadhaar_hash = ?", (aadhaar_hash,)).fetchone()
+            own = cur.execute("SELECT aadhaar_hash FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if row and not merge:
+                owner = row[0]
+                _upsert_user(cur, user_id, None)
+            elif row and own and own[0] and own[0] != aadhaar_hash:
+                owner = user_id
+            elif row:
+                owner = row[0]
+                _merge_users(cur, owner, [user_id])
+            else:
+                owner = user_id
+                _upsert_user(cur, user_id, aadhaar_hash)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return owner
+
+
+def save_user_if_new(user_id: str, aadhaar_hash: Optional[str] = None, db_path: Optional[str] = None) -> None:
+    with db_connection(db_path) as conn, conn:
+        _upsert_user(conn.cursor(), user_id, aadhaar_hash)
+
+
+def _document_row(user_id: str, record: Dict[str, Any], created_at: str) -> tuple:
+    return (
+        user_id,
+        record.get('filename'),
+        record.get('scheme_id'),
+        record.get('doc_type') or '',
+        record.get('text', ''),
+        json.dumps(record.get('metadata') or {}),
+        record.get('chunk_index', -1),
+        created_at,
+    )
+
+
+def save_document_record(user_id, filename, scheme_id, text, doc_type=None, metadata=None, chunk_index=-1, db_path=None):
+    save_document_records(user_id, [{
+        'filename': filename, 'scheme_id': scheme_id, 'text': text,
+        'doc_type': doc_type, 'metadata': metadata, 'chunk_index': chunk_index,
+    }], create_user=False, db_path=db_path)
+
+
+def save_document_records(user_id: str, records: Iterable[Dict[str, Any]], aadhaar_hash: Optional[str] = None,
+                          create_user: bool = True, db_path: Optional[str] = None) -> int:
+    """
+    Write a user (when ``create_user``) and all of their document chunks in a
+    single transaction. Each record is a dict with keys filename, scheme_id,
+    text, doc_type, metadata and chunk_index. Returns the number of rows written.
+    """
+    created_at = datetime.utcnow().isoformat()
+    rows = [_document_row(user_id, r, created_at) for r in records]
+    with db_connection(db_path) as conn, conn:
+        cur = conn.cursor()
+        if create_user:
+            _upsert_user(cur, user_id, aadhaar_hash)
+        cur.executemany("""
+            INSERT INTO documents (user_id, filename, scheme_id, doc_type, text, metadata, chunk_index, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    return len(rows)
+
+
+def save_document_records_stream(user_id: str, records: Iterable[Dict[str, Any]], batch_size: int = 64,
+                                 db_path: Optional[str] = None) -> int:
+    """
+    Write chunk records as they are produced, committing every ``batch_size``
+    rows, so a long document never has to be fully materialised. The user row
+    is not touched. Returns the number of rows written.
+    """
+    written = 0
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return written
+        written += save_document_records(user_id, batch, create_user=False, db_path=db_path)
+
+
+def get_documents_by_user(user_id: str, db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    with db_connection(db_path) as conn:
+        rows = conn.execute("SELECT * FROM documents WHERE user_id = ? ORDER BY created_at ASC, id ASC",
+                            (user_id,)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def find_user_by_aadhaar_hash(aadhaar_hash: str, db_path: Optional[str] = None) -> Optional[str]:
+    with db_connection(db_path) as conn:
+        row = conn.execute("SELECT user_id FROM users WHERE aadhaar_hash = ?", (aadhaar_hash,)).fetchone()
+    return row['user_id'] if row else None
@@ -0,0 +1,158 @@
+"""Compiled DOCX templates for fast, repeated form filling.
+
+Filling a template used to re-open and re-parse the DOCX for every fill and
+then locate each slot through python-docx's ``tables[t].rows[r].cells[c]``,
+which walks the XML again for every field. A ``CompiledTemplate`` parses the
+template once, resolves every fillable slot (each table cell and each body
+paragraph, addressed by the same ``field_id`` strings the field analysis
+produces) to a child-index path in the document XML, and keeps the pristine
+tree. A fill deep-copies that tree, follows the paths and writes the values,
+then appends the new ``word/document.xml`` to the template's other parts,
+which are compressed once at compile time.
+"""
+
+import copy
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from docx import Document
+from docx.table import _Cell
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from .extraction_cache import file_sha256
+
+DOCX_TEMPLATE_CACHE_SIZE = int(os.getenv('DOCX_TEMPLATE_CACHE_SIZE', '32'))
+
+# Slot kinds
+CELL = 'cell'
+PARAGRAPH = 'para'
+
+Slot = Tuple[str, Tuple[int, ...]]
+
+
+def _path_to(element, root) -> Tuple[int, ...]:
+    """Child indices leading from ``root`` down to ``element``."""
+    path: List[int] = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def _follow(root, path: Tuple[int, ...]):
+    element = root
+    for i in path:
+        element = element[i]
+    return element
+
+
+class CompiledTemplate:
+    def __init__(self, template_path: str, digest: Optional[str] = None):
+        self.template_path = template_path
+        with open(template_path, 'rb') as f:
+            package = f.read()
+        self.digest = digest or file_sha256(template_path)
+        doc = Document(io.BytesIO(package))
+        self._part_name = doc.part.partname.lstrip('/')
+        self._root = doc.element
+        # Every other package part (styles, media, headers) never changes: compress it once
+        base = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(package)) as src, zipfile.ZipFile(base, 'w') as dst:
+            for item in src.infolist():
+                if item.filename != self._part_name:
+                    dst.writestr(item, src.read(item), compress_type=item.compress_type)
+                else:
+                    self._part_info = item
+        self._base = base.getvalue()
+        self.slots: Dict[str, Slot] = {}
+        for t, table in enumerate(doc.tables):
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    self.slots[f"table_{t}_row_{r}_cell_{c}"] = (CELL, _path_to(cell._tc, self._root))
+        for p, para in enumerate(doc.paragraphs):
+            self.slots[f"para_{p}"] = (PARAGRAPH, _path_to(para._p, self._root))
+
+    def fill_key(self, form_data: Dict[str, str]) -> str:
+        """Identifies a fill's output: the template content plus the values written into it."""
+        values = {k: v for k, v in form_data.items() if v and k in self.slots}
+        data_hash = hashlib.sha256(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"{self.digest[:24]}-{data_hash[:24]}"
+
+    def fill(self, form_data: Dict[str, str]) -> Tuple[bytes, int]:
+        """DOCX bytes with ``form_data`` (field_id -> value) written in, and the number of slots filled."""
+        root = copy.deepcopy(self._root)
+        filled = 0
+        for field_id, value in form_data.items():
+            if not value:
+                continue
+            slot = self.slots.get(field_id)
+            if slot is None:
+                print(f"Could not parse or find position for field_id {field_id}")
+                continue
+            kind, path = slot
+            element = _follow(root, path)
+            if kind == CELL:
+                _Cell(element, None).text = value
+            else:
+                para = Paragraph(element, None)
+                if ':' in para.text:
+                    para.text = para.text.split(':')[0] + ': ' + value
+                else:
+                    para.text = value
+            filled += 1
+        return self._package_with(root), filled
+
+    def _package_with(self, root) -> bytes:
+        xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+        out = io.BytesIO(self._base)
+        # The template's own timestamp keeps output bytes identical for identical fills
+        info = zipfile.ZipInfo(self._part_name, date_time=self._part_info.date_time)
+        with zipfile.ZipFile(out, 'a') as dst:
+            dst.writestr(info, xml, compress_type=zipfile.ZIP_DEFLATED)
+        return out.getvalue()
+
+
+class TemplateCache:
+    """LRU of compiled templates keyed by content hash (re-hashed only when the file changes)."""
+
+    def __init__(self, max_entries: int = DOCX_TEMPLATE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._compiled: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+        self._digests: Dict[str, Tuple[int, int, str]] = {}  # path -> (mtime_ns, size, sha256)
+        self._lock = threading.Lock()
+
+    def _digest(self, template_path: str) -> str:
+        st = os.stat(template_path)
+        with self._lock:
+            known = self._digests.get(template_path)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size):
+            return known[2]
+        digest = file_sha256(template_path)
+        with self._lock:
+            self._digests[template_path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def get(self, template_path: str) -> CompiledTemplate:
+        digest = self._digest(template_path)
+        with self._lock:
+            compiled = self._compiled.get(digest)
+            if compiled is not None:
+                self._compiled.move_to_end(digest)
+                return compiled
+        compiled = CompiledTemplate(template_path, digest)
+        with self._lock:
+            self._compiled[digest] = compiled
+            while len(self._compiled) > self.max_entries:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._compiled)
@@ -0,0 +1,258 @@
+"""Text extraction for uploaded documents (PDF, images via OCR, DOCX).
+
+These functions live outside ``app.py`` so they can be shipped to OCR worker
+processes by reference. Documents are read from a path or, when ``data`` is
+given, straight from memory (``filepath`` then only names the document).
+"""
+
+import io
+import os
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+import fitz  # PyMuPDF
+from docx import Document
+from PIL import Image
+
+from .chunking import PAGE_SEPARATOR
+from .ocr_backends import get_ocr_backend
+from .ocr_languages import OCR_LANG, resolve_language
+from .preprocessing import OCR_PREPROCESS, preprocess_for_ocr
+
+# Optional caps on how much of a PDF is read (0 / unset = no limit)
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '0')) or None
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', '0')) or None
+# Scanned PDFs: pages with less extractable text than this are rasterised and OCR'd
+PDF_OCR_DPI = int(os.getenv('PDF_OCR_DPI', '200'))
+PDF_OCR_MIN_CHARS = int(os.getenv('PDF_OCR_MIN_CHARS', '20'))
+
+OcrSubmit = Callable[..., Future]
+
+
+def ocr_image_with_confidence(pil_image, lang=OCR_LANG, preprocess=OCR_PREPROCESS):
+    """
+    Returns dict: {'text': str, 'avg_confidence': float, 'words': [...], 'confs': [...], 'lang': str}
+    With ``preprocess`` the image is downscaled, cropped, deskewed and binarised first.
+    With lang='auto' the script is detected (OSD) and only the matching language packs are used.
+    """
+    try:
+        img = preprocess_for_ocr(pil_image) if preprocess else pil_image.convert('RGB')
+        img, lang, script = resolve_language(img, lang)
+        lines = get_ocr_backend().recognize_lines(img, lang=lang)
+        # Keep Tesseract's line and paragraph breaks: the chunker only cuts between lines
+        full_text = "\n".join(" ".join(line_words) for line_words, _ in lines)
+        words = [w for line_words, _ in lines for w in line_words]
+        confs = [c for _, line_confs in lines for c in line_confs]
+        avg_conf = float(sum(confs) / len(confs)) if confs else 0.0
+        return {'text': full_text, 'avg_confidence': avg_conf, 'words': words, 'confs': confs,
+                'lang': lang, 'script': script}
+    except Exception as e:
+        print("ocr_image_with_confidence error:", e)
+        return {'text': '', 'avg_confidence': 0.0, 'words': [], 'confs': [], 'error': str(e)}
+
+
+def pixmap_to_image(pix):
+    """Wrap a PyMuPDF pixmap's samples as a PIL image without encoding to PNG."""
+    mode = {1: 'L', 3: 'RGB', 4: 'RGBA'}.get(pix.n, 'RGB')
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+def _open_pdf(filepath: str, data: Optional[bytes] = None):
+    return fitz.open(stream=data, filetype='pdf') if data is not None else fitz.open(filepath)
+
+
+def _ocr_page(page, dpi: int) -> str:
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    res = ocr_image_with_confidence(pixmap_to_image(pix))
+    if res.get('error'):
+        raise RuntimeError(res['error'])
+    return res['text']
+
+
+def _single_page_pdf(doc, page_no: int) -> bytes:
+    """One page of ``doc`` as a PDF of its own, so a worker isn't sent the whole document."""
+    with fitz.open() as single:
+        single.insert_pdf(doc, from_page=page_no, to_page=page_no)
+        return single.tobytes()
+
+
+def ocr_pdf_page(filepath: str, page_no: int, dpi: int = PDF_OCR_DPI, data: Optional[bytes] = None) -> str:
+    """
+    Rasterise one PDF page in memory and OCR it. Safe to run in a worker
+    process; errors are raised so the caller can tell a failed page from a blank one.
+    """
+    with _open_pdf(filepath, data) as doc:
+        return _ocr_page(doc[page_no], dpi)
+
+
+def iter_pdf_pages(filepath: str, max_pages: Optional[int] = PDF_MAX_PAGES,
+                   max_bytes: Optional[int] = PDF_MAX_BYTES, ocr_submit: Optional[OcrSubmit] = None,
+                   ocr_timeout: Optional[float] = None, ocr_lookahead: int = 8,
+                   data: Optional[bytes] = None, report: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Yield the text of a PDF one page at a time, stopping early once
+    ``max_pages`` pages or ``max_bytes`` bytes of UTF-8 text have been produced.
+
+    Pages without a text layer (scanned) are rasterised and OCR'd. When
+    ``ocr_submit`` (an executor-style ``submit``) is given, up to
+    ``ocr_lookahead`` such pages are OCR'd in parallel while pages are still
+    yielded in order; otherwise they are OCR'd inline. With ``data`` the PDF
+    is read from memory.
+
+    A page whose OCR fails or times out is yielded as "". If ``report`` is
+    given, ``report['complete']`` is set to False when that happened or a cap
+    (or a read error) stopped the document early, so partial text isn't cached.
+    """
+    pending: Deque[Union[str, Future]] = deque()
+    report = report if report is not None else {}
+    report['complete'] = True
+
+    def resolve(item: Union[str, Future]) -> str:
+        if isinstance(item, str):
+            return item
+        try:
+            return item.result(timeout=ocr_timeout)
+        except Exception as e:
+            print(f"Page OCR failed for {filepath}: {e}")
+            report['complete'] = False
+            return ""
+
+    def drain(limit: int) -> Iterator[str]:
+        while len(pending) > limit or (pending and isinstance(pending[0], str)):
+            yield resolve(pending.popleft())
+
+    remaining = max_bytes
+
+    def clip(text: str):
+        """Apply the byte cap; returns (text, stop)."""
+        nonlocal remaining
+        if remaining is None:
+            return text, False
+        encoded = text.encode('utf-8')
+        if len(encoded) > remaining:
+            report['complete'] = False
+            return encoded[:remaining].decode('utf-8', errors='ignore'), True
+        remaining -= len(encoded)
+        return text, False
+
+    try:
+        with _open_pdf(filepath, data) as doc:
+            for page_no, page in enumerate(doc):
+                if max_pages is not None and page_no >= max_pages:
+                    report['complete'] = False
+                    break
+                page_text = page.get_text()
+                if len(page_text.strip()) < PDF_OCR_MIN_CHARS:
+                    if ocr_submit is None:
+                        try:
+                            page_text = _ocr_page(page, PDF_OCR_DPI)
+                        except Exception as e:
+                            print(f"Error OCR-ing page {page_no} of {filepath}: {e}")
+                            report['complete'] = False
+                            page_text = ""
+                    elif data is not None:
+                        pending.append(ocr_submit(ocr_pdf_page, filepath, 0, PDF_OCR_DPI,
+                                                  _single_page_pdf(doc, page_no)))
+                        page_text = None
+                    else:
+                        pending.append(ocr_submit(ocr_pdf_page, filepath, page_no))
+                        page_text = None
+                if page_text is not None:
+                    pending.append(page_text)
+                for text in drain(ocr_lookahead):
+                    text, stop = clip(text)
+                    yield text
+                    if stop:
+                        return
+            for text in drain(0):
+                text, stop = clip(text)
+                yield text
+                if stop:
+                    return
+    except Exception as e:
+        print(f"Error reading PDF pages from {filepath}: {e}")
+        report['complete'] = False
+    finally:
+        for item in pending:
+            if isinstance(item, Future):
+                item.cancel()
+
+
+def pdf_result(pages: List[str], complete: bool = True) -> Dict[str, Any]:
+    """
+    The ``extract_text_from_file`` result for a PDF's page texts; ``page_starts``
+    keeps the pages recoverable. Partial reads are marked ``'complete': False``.
+    """
+    starts, pos = [], 0
+    for page in pages:
+        starts.append(pos)
+        pos += len(page) + len(PAGE_SEPARATOR)
+    result = {'text': PAGE_SEPARATOR.join(pages), 'source': 'pdf', 'avg_conf': None, 'page_starts': starts}
+    if not complete:
+        result['complete'] = False
+    return result
+
+
+def pdf_pages(result: Dict[str, Any]) -> Optional[List[str]]:
+    """Page texts of a (cached) PDF result, or None if it predates ``page_starts``."""
+    starts = result.get('page_starts')
+    if starts is None or result.get('source') != 'pdf':
+        return None
+    text = result.get('text') or ''
+    ends = [s - len(PAGE_SEPARATOR) for s in starts[1:]] + [len(text)]
+    return [text[s:e] for s, e in zip(starts, ends)]
+
+
+def extract_text_from_file(filepath: str, data: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Extract text from ``filepath``, or from ``data`` (the file's bytes) when given.
+    Returns a dict:
+      {
+        'text': '...',           # extracted text (string)
+        'source': 'pdf|image|docx',
+        'avg_conf': float_or_None,
+        'page_starts': [...],    # PDFs only: offset of each page in 'text'
+        'complete': False        # PDFs only, and only when OCR failed or a cap cut the read short
+      }
+    """
+    text = ""
+    source = None
+    avg_conf = None
+    target = io.BytesIO(data) if data is not None else filepath
+    try:
+        ext = filepath.rsplit('.', 1)[1].lower()
+        if ext == 'pdf':
+            report: Dict[str, Any] = {}
+            pages = list(iter_pdf_pages(filepath, data=data, report=report))
+            return pdf_result(pages, complete=report['complete'])
+        elif ext in ('png', 'jpg', 'jpeg'):
+            source = 'image'
+            img = Image.open(target)
+            ocr_res = ocr_image_with_confidence(img)
+            text = ocr_res['text']
+            avg_conf = ocr_res['avg_confidence']
+        elif ext == 'docx':
+            source = 'docx'
+            doc = Document(target)
+            parts = []
+            for para in doc.paragraphs:
+                parts.append(para.text)
+            for table in doc.tables:
+                for row in table.rows:
+                    row_text = "\t".join(cell.text for cell in row.cells)
+                    parts.append(row_text)
+            text = "\n".join(parts)
+        else:
+            # fallback: try pytesseract on file as image
+            try:
+                img = Image.open(target)
+                ocr_res = ocr_image_with_confidence(img)
+                text = ocr_res['text']
+                avg_conf = ocr_res['avg_confidence']
+                source = 'image'
+            except Exception:
+                text = ""
+    except Exception as e:
+        print(f"Error extracting text from {filepath}: {e}")
+    return {'text': text or "", 'source': source or "unknown", 'avg_conf': avg_conf}
@@ -0,0 +1,108 @@
+"""Content-addressed cache of extraction results, stored in SQLite.
+
+Entries are keyed by the SHA-256 of the uploaded file's bytes plus the OCR
+language and engine version, so a re-uploaded scan is never OCR'd twice and
+upgrading Tesseract (or the extractor) naturally invalidates old results.
+The cache is bounded by total payload size and evicts least recently used
+entries first.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from .db import db_connection
+from .ocr_backends import get_ocr_backend
+from .ocr_languages import OCR_LANG
+
+# Bump when extraction output changes for the same input bytes.
+EXTRACTOR_VERSION = "6"
+
+_engine_version: Optional[str] = None
+
+
+def get_engine_version() -> str:
+    """Return the OCR backend and Tesseract version (cached), or 'unknown'."""
+    global _engine_version
+    if _engine_version is None:
+        backend = get_ocr_backend()
+        try:
+            _engine_version = f"{backend.name}-{backend.version()}"
+        except Exception:
+            _engine_version = f"{backend.name}-unknown"
+    return _engine_version
+
+
+def file_sha256(filepath: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Size-bounded LRU cache of ``extract_text_from_file`` results."""
+
+    def __init__(self, db_path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._init_db()
+
+    def _init_db(self) -> None:
+        with db_connection(self.db_path) as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            cache_key TEXT PRIMARY KEY,
+            result TEXT,
+            size INTEGER,
+            last_access REAL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_access ON extraction_cache(last_access)")
+        conn.commit()
+
+    def key_for(self, filepath: str, lang: str = OCR_LANG) -> str:
+        return self.key_for_digest(file_sha256(filepath), lang)
+
+    def key_for_digest(self, sha256: str, lang: str = OCR_LANG) -> str:
+        """Cache key from a content hash already computed (e.g. while reading an upload)."""
+        return f"{sha256}:{lang}:{get_engine_version()}:{EXTRACTOR_VERSION}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with db_connection(self.db_path) as conn, conn:
+            row = conn.execute("SELECT result FROM extraction_cache WHERE cache_key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            conn.execute("UPDATE extraction_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+        return json.loads(row['result'])
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        payload = json.dumps(result)
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (cache_key, result, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload.encode('utf-8')), time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for row in conn.execute("SELECT cache_key, size FROM extraction_cache ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            stale.append((row['cache_key'],))
+            total -= row['size']
+        conn.executemany("DELETE FROM extraction_cache WHERE cache_key = ?", stale)
+
+    def stats(self) -> Dict[str, int]:
+        with db_connection(self.db_path) as conn:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()
+        return {'entries': row[0], 'bytes': row[1], 'max_bytes': self.max_bytes}
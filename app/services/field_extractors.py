@@ -0,0 +1,235 @@
+"""Deterministic extractors for fixed-format form fields.
+
+Aadhaar, PAN, IFSC, mobile, date of birth, PIN code and bank account numbers
+follow fixed formats (Aadhaar even carries a Verhoeff checksum), so they can be
+read from document text with compiled patterns and validators instead of an
+LLM call. ``extract_fields`` fills the fields it can with a confidence score;
+only the rest need to be sent to Gemini.
+"""
+
+import os
+import re
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Pattern, Tuple
+
+RULE_MIN_CONFIDENCE = float(os.getenv('RULE_MIN_CONFIDENCE', '0.8'))
+
+# How far before a match (in characters) a label such as "IFSC:" may appear
+_LABEL_WINDOW = 40
+
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 0, 6, 7, 8, 9, 5], [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7], [4, 0, 1, 2, 3, 9, 5, 6, 7, 8], [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2], [7, 6, 5, 9, 8, 2, 1, 0, 4, 3], [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 5, 7, 6, 2, 8, 3, 0, 9, 4], [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7], [9, 4, 5, 3, 1, 2, 6, 8, 7, 0], [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5], [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def verhoeff_valid(number: str) -> bool:
+    """True if ``number`` (digits only) passes the Verhoeff check used by Aadhaar."""
+    if not number.isdigit():
+        return False
+    c = 0
+    for i, digit in enumerate(reversed(number)):
+        c = _VERHOEFF_D[c][_VERHOEFF_P[i % 8][int(digit)]]
+    return c == 0
+
+
+def _digits(s: str) -> str:
+    return re.sub(r"\D", "", s)
+
+
+def _aadhaar(m: re.Match) -> Optional[Tuple[str, float]]:
+    number = _digits(m.group(0))
+    # Aadhaar numbers never start with 0 or 1
+    if number[0] in '01' or not verhoeff_valid(number):
+        return None
+    return number, 0.99
+
+
+# 4th PAN character is the holder type (P = person, C = company, H = HUF, ...)
+_PAN_HOLDER_TYPES = set("ABCFGHJLPT")
+
+
+def _pan(m: re.Match) -> Optional[Tuple[str, float]]:
+    pan = m.group(0).upper()
+    return (pan, 0.95) if pan[3] in _PAN_HOLDER_TYPES else None
+
+
+def _ifsc(m: re.Match) -> Optional[Tuple[str, float]]:
+    return m.group(0).upper(), 0.95
+
+
+def _mobile(m: re.Match) -> Optional[Tuple[str, float]]:
+    # Any 10-digit number starting with 6-9 fits, so only a "Mobile:" label makes it trustworthy
+    return _digits(m.group('number')), 0.6
+
+
+def _pincode(m: re.Match) -> Optional[Tuple[str, float]]:
+    return _digits(m.group(0)), 0.6
+
+
+def _account(m: re.Match) -> Optional[Tuple[str, float]]:
+    return m.group(0), 0.5
+
+
+def _dob(m: re.Match) -> Optional[Tuple[str, float]]:
+    day, month, year = int(m.group('d')), int(m.group('m')), int(m.group('y'))
+    try:
+        value = date(year, month, day)
+    except ValueError:
+        return None
+    if not 1900 <= year <= date.today().year:
+        return None
+    return value.isoformat(), 0.6
+
+
+def _label_pattern(labels: str) -> Pattern:
+    return re.compile(r"\b(?:%s)\W{0,6}(?:\w+\W{1,3}){0,3}$" % labels, re.IGNORECASE)
+
+
+class Extractor:
+    """A compiled pattern + validator for one kind of field."""
+
+    def __init__(self, kind: str, pattern: str, validate: Callable[[re.Match], Optional[Tuple[str, float]]],
+                 field_keywords: List[str], text_labels: str, flags: int = 0, veto_labels: Optional[str] = None):
+        self.kind = kind
+        self.pattern: Pattern = re.compile(pattern, flags)
+        self.validate = validate
+        self.field_keywords = field_keywords
+        # Label in the document text right before a value ("IFSC Code:", "DOB") raises confidence
+        self.text_label: Pattern = _label_pattern(text_labels)
+        # Label of another kind right before a value ("A/c No: 7012345678") rules it out,
+        # unless the value's own label is nearer ("A/c No: 0123 Mob: 9876543210")
+        self.veto_label: Optional[Pattern] = _label_pattern(veto_labels) if veto_labels else None
+        self._own_word: Pattern = re.compile(r"\b(?:%s)\b" % text_labels, re.IGNORECASE)
+        self._veto_word: Optional[Pattern] = (re.compile(r"\b(?:%s)\b" % veto_labels, re.IGNORECASE)
+                                              if veto_labels else None)
+
+    def _vetoed(self, before: str) -> bool:
+        if self.veto_label is None or not self.veto_label.search(before):
+            return False
+        last_own = max((m.start() for m in self._own_word.finditer(before)), default=-1)
+        last_veto = max((m.start() for m in self._veto_word.finditer(before)), default=len(before))
+        return last_veto > last_own
+
+    def candidates(self, text: str) -> Iterator[Tuple[str, float]]:
+        for m in self.pattern.finditer(text):
+            result = self.validate(m)
+            if not result:
+                continue
+            value, confidence = result
+            before = text[max(0, m.start() - _LABEL_WINDOW):m.start()]
+            if self._vetoed(before):
+                continue
+            if self.text_label.search(before):
+                confidence = min(0.99, confidence + 0.3)
+            yield value, confidence
+
+
+EXTRACTORS: List[Extractor] = [
+    Extractor('aadhaar', r"(?<!\d)\d{4}[ -]?\d{4}[ -]?\d{4}(?!\d)", _aadhaar,
+              ['aadhaar', 'aadhar', 'adhaar', 'uid', 'uidai'], r"aadhaa?r|aadhar|uid|vid"),
+    Extractor('pan', r"\b[A-Z]{5}\d{4}[A-Z]\b", _pan,
+              ['pan'], r"pan|permanent\s+account"),
+    Extractor('ifsc', r"\b[A-Z]{4}0[A-Z0-9]{6}\b", _ifsc,
+              ['ifsc'], r"ifsc|ifs\s+code"),
+    Extractor('mobile', r"(?<![\d+])(?:(?:\+|00)?91[ -]?|0)?(?P<number>[6-9]\d{4} ?\d{5})(?!\d)", _mobile,
+              ['mobile', 'phone', 'contact', 'cell', 'whatsapp'], r"mobile|mob|phone|ph|contact|cell",
+              veto_labels=r"a/?c|account|acct"),
+    Extractor('dob', r"\b(?P<d>\d{1,2})[/.-](?P<m>\d{1,2})[/.-](?P<y>\d{4})\b", _dob,
+              ['dob', 'birth'], r"dob|d\.o\.b|date\s+of\s+birth|birth"),
+    Extractor('pincode', r"(?<!\d)[1-9]\d{2} ?\d{3}(?!\d)", _pincode,
+              ['pin', 'pincode', 'postal', 'zip'], r"pin|pincode|pin\s+code|postal"),
+    Extractor('account_number', r"(?<!\d)\d{9,18}(?!\d)", _account,
+              ['account', 'acct', 'ac'], r"a/?c|account|acct"),
+]
+
+# Field labels that mention a kind but ask for something else ("Name as per Aadhaar", "Account type")
+_FIELD_EXCLUDE = {'name', 'address', 'holder', 'type', 'branch', 'copy', 'photo', 'father', 'mother',
+                  'spouse', 'enrolment', 'enrollment', 'place', 'nominee', 'co', 'joint', 'guardian', 'husband',
+                  'wife', 'witness'}
+
+
+def _field_tokens(field: Dict[str, Any]) -> List[str]:
+    text = " ".join(filter(None, [field.get('label') or '', field.get('field_name') or '']))
+    return re.findall(r"[a-z0-9]+", text.lower().replace('_', ' '))
+
+
+# Words that turn the kind next to them into a qualifier of the field rather than what it asks for:
+# "Date of birth as per Aadhaar", "Mobile number linked with Aadhaar", "Aadhaar seeded bank account"
+_QUALIFIER_BEFORE = {'per', 'with', 'to', 'in', 'on', 'under', 'from'}
+_QUALIFIER_AFTER = {'seeded', 'linked', 'based', 'registered', 'verified'}
+
+
+def _is_qualifier(tokens: List[str], keywords: List[str]) -> bool:
+    """True if every mention of ``keywords`` in ``tokens`` only qualifies another noun."""
+    positions = [i for i, t in enumerate(tokens) if t in keywords]
+    return all((i > 0 and tokens[i - 1] in _QUALIFIER_BEFORE) or
+               (i + 1 < len(tokens) and tokens[i + 1] in _QUALIFIER_AFTER) for i in positions)
+
+
+def extractor_for_field(field: Dict[str, Any]) -> Optional[Extractor]:
+    """
+    The extractor whose kind a form field asks for, if any. When a label names
+    several kinds, the one it is about (its head noun) wins over kinds that
+    merely qualify it; if that is still ambiguous, no extractor is used.
+    """
+    tokens = _field_tokens(field)
+    if not tokens or _FIELD_EXCLUDE.intersection(tokens):
+        return None
+    matched = [e for e in EXTRACTORS if any(k in tokens for k in e.field_keywords)]
+    if len(matched) > 1:
+        matched = [e for e in matched if not _is_qualifier(tokens, e.field_keywords)]
+    return matched[0] if len(matched) == 1 else None
+
+
+def extract_all(text: str) -> Dict[str, Tuple[str, float]]:
+    """Best (value, confidence) found in ``text`` for every extractor kind."""
+    found: Dict[str, Tuple[str, float]] = {}
+    # Values matched by a stricter format earlier in EXTRACTORS (an Aadhaar or a
+    # mobile number is not also an account number) are not offered to later ones
+    taken: set = set()
+    for extractor in EXTRACTORS:
+        matched = set()
+        for value, confidence in extractor.candidates(text or ""):
+            if value in taken:
+                continue
+            matched.add(value)
+            if extractor.kind not in found or confidence > found[extractor.kind][1]:
+                found[extractor.kind] = (value, confidence)
+        taken |= matched
+    return found
+
+
+def extract_fields(text: str, required_fields: List[Dict[str, Any]],
+                   min_confidence: float = RULE_MIN_CONFIDENCE) -> Dict[str, Dict[str, Any]]:
+    """
+    Fill the fixed-format fields of ``required_fields`` from ``text``.
+    Returns {field_name: {'value', 'confidence', 'kind'}} for fields resolved
+    with at least ``min_confidence``; the remaining fields are left to the LLM.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    if not text:
+        return results
+    found = extract_all(text)
+    for f in required_fields:
+        extractor = extractor_for_field(f) if f.get('field_name') else None
+        if extractor is None or extractor.kind not in found:
+            continue
+        value, confidence = found[extractor.kind]
+        if confidence >= min_confidence:
+            results[f['field_name']] = {'value': value, 'confidence': round(confidence, 2), 'kind': extractor.kind}
+    return results
+
+
+def find_aadhaar(text: str) -> Optional[str]:
+    """First checksum-valid Aadhaar number in ``text`` (12 digits, spaces removed)."""
+    for value, _ in EXTRACTORS[0].candidates(text or ""):
+        return value
+    return None
@@ -0,0 +1,62 @@
+"""Persistent cache of analysed form-field schemas, keyed by template content.
+
+Field discovery for a DOCX template costs a Gemini round-trip, but its result
+only depends on the template bytes and the prompt used, so it is stored once
+per (template SHA-256, prompt version) and served from memory afterwards.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .db import db_connection
+from .extraction_cache import file_sha256
+
+
+class FieldSchemaCache:
+    def __init__(self, prompt_version: str, db_path: Optional[str] = None):
+        self.prompt_version = prompt_version
+        self.db_path = db_path
+        self._memory: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        with db_connection(self.db_path) as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS field_schema_cache (
+            cache_key TEXT PRIMARY KEY,
+            template_name TEXT,
+            fields TEXT,
+            created_at TEXT
+        )
+        """)
+        conn.commit()
+
+    def key_for(self, template_path: str) -> str:
+        return f"{file_sha256(template_path)}:{self.prompt_version}"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a fresh copy of the cached fields (callers may mutate them)."""
+        with self._lock:
+            payload = self._memory.get(key)
+        if payload is None:
+            with db_connection(self.db_path) as conn:
+                row = conn.execute("SELECT fields FROM field_schema_cache WHERE cache_key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            payload = row['fields']
+            with self._lock:
+                self._memory[key] = payload
+        return json.loads(payload)
+
+    def put(self, key: str, fields: List[Dict[str, Any]], template_name: str = '') -> None:
+        payload = json.dumps(fields)
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO field_schema_cache (cache_key, template_name, fields, created_at) VALUES (?, ?, ?, ?)",
+                (key, template_name, payload, datetime.utcnow().isoformat()))
+        with self._lock:
+            self._memory[key] = payload
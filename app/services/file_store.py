@@ -0,0 +1,217 @@
+"""Content-addressed storage for uploaded documents and generated forms.
+
+Files are kept once per content hash under ``<root>/blobs/ab/<sha256><ext>``
+and exposed under stable names (``<stem>-<sha256[:12]><ext>``) recorded in the
+``stored_files`` table, so re-uploading a document or regenerating an
+identical form reuses the existing blob and two files with the same original
+filename no longer overwrite each other. Generated files can also be found by
+the key of the input that produced them, which lets a repeated fill skip the
+work entirely. ``gc`` drops entries unused for longer than the TTL, trims the
+least recently used ones past a size cap and removes unreferenced blobs; it
+runs periodically on a background thread.
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+from werkzeug.utils import secure_filename
+
+from .db import db_connection
+
+STORAGE_GC_INTERVAL = int(os.getenv('STORAGE_GC_INTERVAL', '3600'))  # seconds
+GENERATED_TTL_HOURS = float(os.getenv('GENERATED_TTL_HOURS', '72'))
+UPLOAD_TTL_HOURS = float(os.getenv('UPLOAD_TTL_HOURS', '24'))
+STORAGE_MAX_MB = int(os.getenv('STORAGE_MAX_MB', '1024'))  # per store
+
+# Blobs younger than this are never swept as unreferenced (their row may not be written yet)
+_ORPHAN_GRACE_SECONDS = 300
+_READ_BLOCK = 1 << 20
+
+StoredFile = Dict[str, Any]
+
+
+def _iter_file(fileobj: BinaryIO) -> Iterator[bytes]:
+    return iter(lambda: fileobj.read(_READ_BLOCK), b'')
+
+
+class FileStore:
+    def __init__(self, root: str, kind: str, db_path: Optional[str] = None, ttl_hours: float = GENERATED_TTL_HOURS,
+                 max_bytes: int = STORAGE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.kind = kind
+        self.db_path = db_path
+        self.ttl_hours = ttl_hours
+        self.max_bytes = max_bytes
+        self._gc_thread: Optional[threading.Thread] = None
+        with db_connection(self.db_path) as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS stored_files (
+            kind TEXT,
+            name TEXT,
+            sha256 TEXT,
+            size INTEGER,
+            original_name TEXT,
+            source_key TEXT,
+            created_at TEXT,
+            last_access TEXT,
+            PRIMARY KEY (kind, name)
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stored_files_source ON stored_files (kind, source_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stored_files_access ON stored_files (kind, last_access)")
+        conn.commit()
+
+    def blob_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256 + ext)
+
+    def _write_blob(self, chunks: Iterable[bytes], ext: str):
+        """Stream ``chunks`` to a temp file while hashing, then move it to its content address."""
+        tmp_dir = os.path.join(self.root, 'blobs', 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            sha256 = digest.hexdigest()
+            path = self.blob_path(sha256, ext)
+            if os.path.exists(path):
+                os.remove(tmp)
+                os.utime(path)  # keep a re-used blob out of the orphan sweep's grace window
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return sha256, size, path
+
+    def _put_chunks(self, chunks: Iterable[bytes], filename: str, source_key: Optional[str]) -> StoredFile:
+        stem, ext = os.path.splitext(secure_filename(filename) or 'file')
+        ext = ext.lower()
+        sha256, size, path = self._write_blob(chunks, ext)
+        name = f"{stem or 'file'}-{sha256[:12]}{ext}"
+        now = datetime.utcnow().isoformat()
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute("""
+                INSERT INTO stored_files (kind, name, sha256, size, original_name, source_key, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(kind, name) DO UPDATE SET last_access = excluded.last_access,
+                    source_key = COALESCE(excluded.source_key, stored_files.source_key)
+            """, (self.kind, name, sha256, size, filename, source_key, now, now))
+        return {'name': name, 'path': path, 'sha256': sha256, 'size': size, 'original_name': filename}
+
+    def put(self, data: bytes, filename: str, source_key: Optional[str] = None) -> StoredFile:
+        """Store ``data`` under a name derived from ``filename`` and its hash; ``source_key`` identifies the input."""
+        return self._put_chunks([data], filename, source_key)
+
+    def save_upload(self, fileobj: BinaryIO, filename: str) -> StoredFile:
+        """Stream an uploaded file (e.g. a werkzeug ``FileStorage.stream``) into the store."""
+        return self._put_chunks(_iter_file(fileobj), filename, None)
+
+    def _touch(self, name: str) -> None:
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute("UPDATE stored_files SET last_access = ? WHERE kind = ? AND name = ?",
+                         (datetime.utcnow().isoformat(), self.kind, name))
+
+    def _row_to_file(self, row: sqlite3.Row) -> Optional[StoredFile]:
+        path = self.blob_path(row['sha256'], os.path.splitext(row['name'])[1])
+        if not os.path.exists(path):
+            return None
+        self._touch(row['name'])
+        return {'name': row['name'], 'path': path, 'sha256': row['sha256'], 'size': row['size'],
+                'original_name': row['original_name']}
+
+    def get(self, name: str) -> Optional[StoredFile]:
+        with db_connection(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM stored_files WHERE kind = ? AND name = ?", (self.kind, name)).fetchone()
+        return self._row_to_file(row) if row else None
+
+    def find(self, source_key: str) -> Optional[StoredFile]:
+        """The most recent file produced from ``source_key``, if it is still stored."""
+        with db_connection(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM stored_files WHERE kind = ? AND source_key = ? "
+                               "ORDER BY last_access DESC LIMIT 1", (self.kind, source_key)).fetchone()
+        return self._row_to_file(row) if row else None
+
+    def path(self, name: str) -> Optional[str]:
+        stored = self.get(name)
+        return stored['path'] if stored else None
+
+    def gc(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Expire entries past the TTL, trim to the size cap, delete unreferenced blobs."""
+        now = now or datetime.utcnow()
+        removed_entries = 0
+        with db_connection(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cutoff = (now - timedelta(hours=self.ttl_hours)).isoformat()
+                removed_entries += conn.execute("DELETE FROM stored_files WHERE kind = ? AND last_access < ?",
+                                                (self.kind, cutoff)).rowcount
+                # Size cap over distinct blobs, least recently used first
+                blobs = conn.execute("""
+                    SELECT sha256, MAX(size) AS size, MAX(last_access) AS used FROM stored_files
+                    WHERE kind = ? GROUP BY sha256 ORDER BY used
+                """, (self.kind,)).fetchall()
+                total = sum(b['size'] for b in blobs)
+                for b in blobs:
+                    if total <= self.max_bytes:
+                        break
+                    removed_entries += conn.execute("DELETE FROM stored_files WHERE kind = ? AND sha256 = ?",
+                                                    (self.kind, b['sha256'])).rowcount
+                    total -= b['size']
+                rows = conn.execute("SELECT name, sha256 FROM stored_files WHERE kind = ?", (self.kind,)).fetchall()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        referenced = {r['sha256'] + os.path.splitext(r['name'])[1] for r in rows}
+
+        removed_blobs = freed = 0
+        grace = time.time() - _ORPHAN_GRACE_SECONDS
+        blob_root = os.path.join(self.root, 'blobs')
+        for dirpath, _dirs, files in os.walk(blob_root):
+            for fname in files:
+                path = os.path.join(dirpath, fname)
+                try:
+                    st = os.stat(path)
+                    if fname in referenced or st.st_mtime > grace:
+                        continue
+                    os.remove(path)
+                except OSError:
+                    continue
+                removed_blobs += 1
+                freed += st.st_size
+        return {'removed_entries': removed_entries, 'removed_blobs': removed_blobs, 'bytes_freed': freed}
+
+    def start_gc(self, interval: int = STORAGE_GC_INTERVAL) -> None:
+        """Run ``gc`` every ``interval`` seconds on a daemon thread."""
+        if self._gc_thread is not None or interval <= 0:
+            return
+
+        def loop():
+            while True:
+                try:
+                    stats = self.gc()
+                    if stats['removed_entries'] or stats['removed_blobs']:
+                        print(f"Storage GC ({self.kind}): {stats}")
+                except Exception as e:
+                    print(f"Storage GC ({self.kind}) failed: {e}")
+                time.sleep(interval)
+
+        self._gc_thread = threading.Thread(target=loop, name=f"{self.kind}-gc", daemon=True)
+        self._gc_thread.start()
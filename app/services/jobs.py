@@ -0,0 +1,194 @@
+"""Background job queue backed by a SQLite ``jobs`` table.
+
+Long-running work (e.g. an auto-fill with several Gemini calls) is recorded as
+a job row and executed by a small thread pool; clients poll the job by id or
+receive a webhook when it finishes. Handlers return the same response dicts
+the HTTP endpoints do: a result with ``"success": False`` marks the job failed.
+
+Webhooks carry only ``{"job_id", "status"}``, signed with HMAC-SHA256 of the
+body under ``WEBHOOK_SECRET``; the receiver fetches the result from
+``/jobs/<job_id>``. Callback URLs must be https, must not resolve to a
+private, loopback or link-local address and, when ``WEBHOOK_ALLOWED_HOSTS``
+is set, must name one of those hosts.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from .db import db_connection
+
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_ALLOWED_HOSTS = frozenset(h.strip().lower() for h in os.getenv('WEBHOOK_ALLOWED_HOSTS', '').split(',')
+                                  if h.strip())
+SIGNATURE_HEADER = 'X-FarmerBuddy-Signature'
+# A job still marked running after this long belongs to a process that died
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '900'))
+
+JobHandler = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+def _public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    return ip.is_global and not ip.is_multicast
+
+
+def validate_callback_url(url: str, allowed_hosts: FrozenSet[str] = WEBHOOK_ALLOWED_HOSTS) -> str:
+    """Return ``url`` if a webhook may be sent to it, else raise ValueError."""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if parts.scheme != 'https' or not host:
+        raise ValueError("callback_url must be an https URL")
+    if parts.username or parts.password:
+        raise ValueError("callback_url must not carry credentials")
+    if allowed_hosts and host not in allowed_hosts:
+        raise ValueError(f"callback_url host '{host}' is not allowed")
+    try:
+        infos = socket.getaddrinfo(host, parts.port or 443, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"callback_url host '{host}' does not resolve: {e}")
+    if not infos or not all(_public_address(info[4][0]) for info in infos):
+        raise ValueError(f"callback_url host '{host}' resolves to a non-public address")
+    return url
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+class JobQueue:
+    def __init__(self, db_path: Optional[str] = None, max_workers: int = 2, webhook_timeout: float = 10.0,
+                 webhook_secret: str = WEBHOOK_SECRET, allowed_hosts: FrozenSet[str] = WEBHOOK_ALLOWED_HOSTS):
+        self.db_path = db_path
+        self.webhook_timeout = webhook_timeout
+        self.webhook_secret = webhook_secret
+        self.allowed_hosts = allowed_hosts
+        self._handlers: Dict[str, JobHandler] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        with db_connection(self.db_path) as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT,
+            status TEXT,
+            payload TEXT,
+            result TEXT,
+            error TEXT,
+            callback_url TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        conn.commit()
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, payload: Dict[str, Any], callback_url: Optional[str] = None) -> str:
+        """Queue a job; raises ValueError for an unknown kind or a callback_url webhooks can't be sent to."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if callback_url:
+            if not self.webhook_secret:
+                raise ValueError("callback_url is not supported: WEBHOOK_SECRET is not set")
+            validate_callback_url(callback_url, self.allowed_hosts)
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute("""
+                INSERT INTO jobs (job_id, kind, status, payload, callback_url, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, QUEUED, json.dumps(payload), callback_url, now, now))
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with db_connection(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def resume_pending(self, stale_after: float = JOB_STALE_SECONDS) -> int:
+        """
+        Re-enqueue jobs left queued by a previous process, and running ones not
+        updated for ``stale_after`` seconds (their process died). Several
+        processes may do this at once: each job is claimed by exactly one.
+        """
+        cutoff = (datetime.utcnow() - timedelta(seconds=stale_after)).isoformat()
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute("UPDATE jobs SET status = ? WHERE status = ? AND updated_at < ?", (QUEUED, RUNNING, cutoff))
+            rows = conn.execute("SELECT job_id FROM jobs WHERE status = ?", (QUEUED,)).fetchall()
+        for row in rows:
+            self._executor.submit(self._run, row['job_id'])
+        return len(rows)
+
+    def _claim(self, job_id: str) -> bool:
+        """Atomically move a queued job to running; False if another worker got it first."""
+        with db_connection(self.db_path) as conn, conn:
+            return conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                                (RUNNING, datetime.utcnow().isoformat(), job_id, QUEUED)).rowcount == 1
+
+    def _update(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> None:
+        with db_connection(self.db_path) as conn, conn:
+            conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                         (status, json.dumps(result) if result is not None else None, error,
+                          datetime.utcnow().isoformat(), job_id))
+
+    def _run(self, job_id: str) -> None:
+        if not self._claim(job_id):
+            return
+        with db_connection(self.db_path) as conn:
+            row = conn.execute("SELECT kind, payload, callback_url FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        try:
+            result = self._handlers[row['kind']](json.loads(row['payload']))
+            if isinstance(result, dict) and result.get('success') is False:
+                self._update(job_id, FAILED, result=result, error=result.get('error'))
+            else:
+                self._update(job_id, DONE, result=result)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, FAILED, error=str(e))
+        if row['callback_url']:
+            self._notify(row['callback_url'], job_id)
+
+    def _notify(self, callback_url: str, job_id: str) -> None:
+        job = self.get(job_id)
+        body = json.dumps({'job_id': job_id, 'status': job['status'] if job else None}).encode('utf-8')
+        try:
+            # Checked again at send time: the host may resolve differently than at submit
+            validate_callback_url(callback_url, self.allowed_hosts)
+            requests.post(callback_url, data=body, timeout=self.webhook_timeout, allow_redirects=False,
+                          headers={'Content-Type': 'application/json',
+                                   SIGNATURE_HEADER: sign_payload(body, self.webhook_secret)})
+        except Exception as e:
+            print(f"Webhook for job {job_id} to {callback_url} failed: {e}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
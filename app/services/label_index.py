@@ -0,0 +1,255 @@
+"""Resolve free-form form labels to canonical profile fields.
+
+Web forms label the same field in many ways ("Applicant Name", "Name of
+Farmer", "किसान का नाम"). Labels are normalised (Unicode NFKC, lower case,
+filler words dropped, tokens sorted) and matched against known English and
+Hindi labels, first exactly and then by character-trigram similarity. A fuzzy
+match must not add content words the known labels of that field never use
+("Branch address" is not an address field). A mapping a user confirms applies
+to that user's later fills straight away, and to everyone once enough distinct
+users have confirmed it; learned labels never redefine the built-in ones.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from .db import db_connection
+
+LABEL_MATCH_THRESHOLD = float(os.getenv('LABEL_MATCH_THRESHOLD', '0.65'))
+# Distinct users who must confirm a label -> field mapping before it is used for everyone
+LABEL_SHARE_MIN_USERS = int(os.getenv('LABEL_SHARE_MIN_USERS', '3'))
+
+# Canonical field -> labels known to ask for it (English and Hindi)
+SEED_LABELS: Dict[str, List[str]] = {
+    'name': ['name', 'applicant name', 'full name', 'name of farmer', 'farmer name', 'beneficiary name',
+             'candidate name', 'नाम', 'आवेदक का नाम', 'किसान का नाम', 'लाभार्थी का नाम'],
+    'father_name': ["father's name", 'father name', 'father/husband name', 'guardian name', 'father/spouse name',
+                    'पिता का नाम', 'पिता/पति का नाम'],
+    'address': ['address', 'permanent address', 'residential address', 'correspondence address', 'full address',
+                'पता', 'स्थायी पता'],
+    'gender': ['gender', 'sex', 'लिंग'],
+    'village': ['village', 'village name', 'village/town', 'गाँव', 'गांव', 'ग्राम'],
+    'district': ['district', 'जिला', 'ज़िला'],
+    'state': ['state', 'राज्य'],
+    'bank_name': ['bank name', 'name of bank', 'bank', 'बैंक का नाम'],
+    'aadhaar': ['aadhaar number', 'aadhar no', 'aadhaar', 'uid number', 'आधार संख्या', 'आधार नंबर'],
+    'pan': ['pan', 'pan number', 'pan card number', 'पैन नंबर'],
+    'ifsc': ['ifsc', 'ifsc code', 'ifsc code of bank', 'आईएफएससी कोड'],
+    'mobile': ['mobile number', 'mobile no', 'phone number', 'contact number', 'मोबाइल नंबर', 'मोबाइल संख्या'],
+    'dob': ['date of birth', 'dob', 'birth date', 'जन्म तिथि', 'जन्म की तारीख'],
+    'pincode': ['pin code', 'pincode', 'postal code', 'पिन कोड'],
+    'account_number': ['bank account number', 'account number', 'a/c no', 'खाता संख्या', 'बैंक खाता संख्या'],
+}
+
+# Filler words that carry no meaning in a label
+_STOPWORDS = {'the', 'of', 'your', 'enter', 'please', 's', 'in', 'as', 'per',
+              'का', 'की', 'के', 'में', 'कृपया', 'दर्ज', 'करें'}
+_NON_WORD = re.compile(r"[^\wऀ-ॿ]+")
+# Words naming *whose* value a field asks for (and "name" itself); a fuzzy match must
+# agree on them, so "Mother's Name" or "Name as per Aadhaar" never resolve to the
+# applicant's name or Aadhaar number
+_MARKER_WORDS = {'father', 'mother', 'husband', 'wife', 'spouse', 'guardian', 'nominee', 'holder', 'witness',
+                 'co', 'joint', 'name', 'पिता', 'माता', 'पति', 'पत्नी', 'नामांकित', 'नाम'}
+# Words any label may add without changing what it asks for ("Aadhar Card No", "DOB (DD/MM/YYYY)")
+_GENERIC_WORDS = {'no', 'number', 'num', 'card', 'code', 'id', 'details', 'applicant', 'dd', 'mm', 'yy', 'yyyy',
+                  'संख्या', 'नंबर', 'आवेदक'}
+# Trigram similarity at which an unknown word counts as a misspelling of a known one
+_WORD_MATCH = 0.6
+
+
+def normalize_label(label: str) -> str:
+    """Canonical form of a label: NFKC, lower case, punctuation and filler dropped, tokens sorted."""
+    text = unicodedata.normalize('NFKC', label or '').lower().replace('_', ' ')
+    tokens = [t for t in _NON_WORD.sub(' ', text).split() if t not in _STOPWORDS]
+    # "fathers name" -> "father name"
+    tokens = [t[:-1] if t.endswith('s') and t[:-1] in _MARKER_WORDS else t for t in tokens]
+    return " ".join(sorted(tokens))
+
+
+def person_markers(label: str) -> Set[str]:
+    """Marker words in ``label`` naming whose value it asks for (father, nominee, co-applicant, ...)."""
+    return _MARKER_WORDS.intersection(normalize_label(label).split()) - {'name', 'नाम'}
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LabelIndex:
+    """Trigram index over known labels, plus mappings learned from confirmed fills."""
+
+    def __init__(self, db_path: Optional[str] = None, persist: bool = True,
+                 share_min_users: int = LABEL_SHARE_MIN_USERS):
+        self.db_path = db_path
+        self.persist = persist
+        self.share_min_users = max(1, share_min_users)
+        self._labels: Dict[str, str] = {}  # normalised label -> canonical field
+        self._user_labels: Dict[str, Dict[str, str]] = defaultdict(dict)  # user_id -> own confirmed labels
+        self._grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._vocab: Dict[str, Set[str]] = defaultdict(set)  # canonical field -> words its labels use
+        self._lock = threading.Lock()
+        self._seed: Set[str] = set()
+        for canonical, labels in SEED_LABELS.items():
+            for label in labels:
+                self._add(normalize_label(label), canonical)
+        self._seed = set(self._labels)
+        if persist:
+            with db_connection(self.db_path) as conn:
+                self._create_schema(conn)
+                user_rows = conn.execute("SELECT user_id, label, canonical FROM user_label_mappings").fetchall()
+            for row in user_rows:
+                if self._learnable(row['label'], row['canonical']):
+                    self._user_labels[row['user_id']][row['label']] = row['canonical']
+            for norm, canonical in self._shared_mappings().items():
+                self._add(norm, canonical)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS label_mappings (
+            label TEXT PRIMARY KEY,
+            canonical TEXT,
+            confirmations INTEGER,
+            updated_at TEXT
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_label_mappings (
+            user_id TEXT,
+            label TEXT,
+            canonical TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (user_id, label)
+        )
+        """)
+        conn.commit()
+
+    def _learnable(self, norm: str, canonical: str) -> bool:
+        return bool(norm) and canonical in SEED_LABELS and norm not in self._seed
+
+    def _shared_mappings(self) -> Dict[str, str]:
+        """Learned labels confirmed by enough distinct users, with the field most of them chose."""
+        counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        for user_labels in self._user_labels.values():
+            for norm, canonical in user_labels.items():
+                counts[(norm, canonical)] += 1
+        best: Dict[str, Tuple[str, int]] = {}
+        for (norm, canonical), n in counts.items():
+            if n >= self.share_min_users and n > best.get(norm, ('', 0))[1]:
+                best[norm] = (canonical, n)
+        return {norm: canonical for norm, (canonical, _) in best.items()}
+
+    def _add(self, norm: str, canonical: str) -> None:
+        if not norm:
+            return
+        with self._lock:
+            old = self._labels.get(norm)
+            if norm in self._seed:
+                return
+            self._labels[norm] = canonical
+            self._vocab[canonical].update(norm.split())
+            if old is None:
+                grams = trigrams(norm)
+                self._grams[norm] = grams
+                for g in grams:
+                    self._postings[g].add(norm)
+
+    def _covers(self, canonical: str, tokens: List[str]) -> bool:
+        """True if every content word of a label is one the labels of ``canonical`` use (or a misspelling of one)."""
+        vocab = self._vocab[canonical]
+        content = [t for t in tokens if len(t) > 1 and t not in _GENERIC_WORDS]
+        if not content:
+            return False
+        for t in content:
+            if t in vocab:
+                continue
+            grams = trigrams(t)
+            if not any(2.0 * len(grams & trigrams(v)) / (len(grams) + len(trigrams(v))) >= _WORD_MATCH for v in vocab):
+                return False
+        return True
+
+    def resolve(self, label: str, threshold: float = LABEL_MATCH_THRESHOLD,
+                user_id: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """
+        (canonical field, similarity) for ``label``, or None if nothing is similar enough.
+        Labels ``user_id`` confirmed themselves are matched (exactly) before the shared ones.
+        """
+        norm = normalize_label(label)
+        if not norm:
+            return None
+        with self._lock:
+            own = self._user_labels.get(user_id, {}).get(norm) if user_id else None
+            if own is not None:
+                return own, 1.0
+            if norm in self._labels:
+                return self._labels[norm], 1.0
+            grams = trigrams(norm)
+            overlap: Dict[str, int] = defaultdict(int)
+            for g in grams:
+                for candidate in self._postings.get(g, ()):
+                    overlap[candidate] += 1
+            best, best_score = None, 0.0
+            tokens = norm.split()
+            markers = _MARKER_WORDS.intersection(tokens)
+            covered: Dict[str, bool] = {}
+            for candidate, shared in overlap.items():
+                if _MARKER_WORDS.intersection(candidate.split()) != markers:
+                    continue
+                # Dice coefficient over trigram sets
+                score = 2.0 * shared / (len(grams) + len(self._grams[candidate]))
+                if score <= best_score:
+                    continue
+                canonical = self._labels[candidate]
+                if canonical not in covered:
+                    covered[canonical] = self._covers(canonical, tokens)
+                if covered[canonical]:
+                    best, best_score = candidate, score
+            if best is None or best_score < threshold:
+                return None
+            return self._labels[best], round(best_score, 3)
+
+    def learn(self, label: str, canonical: str, user_id: str) -> bool:
+        """
+        Remember that ``label`` means ``canonical`` for ``user_id`` (e.g. after they
+        confirmed a fill). The mapping is shared with everyone once
+        ``share_min_users`` distinct users agree. Unknown fields and built-in labels
+        are refused; returns whether the mapping was recorded.
+        """
+        norm = normalize_label(label)
+        if not user_id or not self._learnable(norm, canonical):
+            return False
+        with self._lock:
+            self._user_labels[user_id][norm] = canonical
+            agreeing = sum(1 for labels in self._user_labels.values() if labels.get(norm) == canonical)
+        if self.persist:
+            with db_connection(self.db_path) as conn, conn:
+                now = datetime.utcnow().isoformat()
+                conn.execute("INSERT OR REPLACE INTO user_label_mappings (user_id, label, canonical, updated_at) "
+                             "VALUES (?, ?, ?, ?)", (user_id, norm, canonical, now))
+                if agreeing >= self.share_min_users:
+                    conn.execute("""
+                        INSERT INTO label_mappings (label, canonical, confirmations, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(label) DO UPDATE SET canonical = excluded.canonical,
+                            confirmations = excluded.confirmations, updated_at = excluded.updated_at
+                    """, (norm, canonical, agreeing, now))
+        if agreeing >= self.share_min_users:
+            self._add(norm, canonical)
+        return True
+
+
+_seed_index: Optional[LabelIndex] = None
+
+
+def seed_label_index() -> LabelIndex:
+    """An in-memory index of the built-in labels only (no database)."""
+    global _seed_index
+    if _seed_index is None:
+        _seed_index = LabelIndex(persist=False)
+    return _seed_index
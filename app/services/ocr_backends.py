@@ -0,0 +1,207 @@
+"""OCR engine backends behind ``ocr_image_with_confidence``.
+
+``pytesseract`` starts a ``tesseract`` process (and reloads the language model)
+for every image. When ``tesserocr`` is installed we instead keep initialised
+Tesseract API instances alive in each process and reuse them, falling back to
+pytesseract when tesserocr is missing or cannot initialise.
+
+``recognize_lines`` keeps Tesseract's layout: one entry per text line, with an
+empty entry between paragraphs, so "Name: ... / Account No: ..." lines reach
+the chunker as separate lines rather than one run of words.
+"""
+
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # optional dependency
+    tesserocr = None
+
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'auto')  # auto | tesserocr | pytesseract
+OCR_TESSDATA = os.getenv('OCR_TESSDATA', '')  # tessdata directory for tesserocr (default: TESSDATA_PREFIX)
+
+Words = Tuple[List[str], List[float]]
+
+
+def _flatten(lines: List[Words]) -> Words:
+    words: List[str] = []
+    confs: List[float] = []
+    for line_words, line_confs in lines:
+        words.extend(line_words)
+        confs.extend(line_confs)
+    return words, confs
+
+
+class PytesseractBackend:
+    name = 'pytesseract'
+
+    def __init__(self):
+        self._languages: Optional[List[str]] = None
+
+    def version(self) -> str:
+        return str(pytesseract.get_tesseract_version())
+
+    def recognize(self, img, lang: str = 'eng') -> Words:
+        return _flatten(self.recognize_lines(img, lang))
+
+    def recognize_lines(self, img, lang: str = 'eng') -> List[Words]:
+        data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+        lines: List[Words] = []
+        current = None
+        for i, w in enumerate(data.get('text', [])):
+            if not (w and w.strip()):
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            if key != current:
+                if current is not None and key[:2] != current[:2]:
+                    lines.append(([], []))  # paragraph break
+                lines.append(([], []))
+                current = key
+            lines[-1][0].append(w)
+            try:
+                lines[-1][1].append(float(data['conf'][i]))
+            except Exception:
+                lines[-1][1].append(0.0)
+        return lines
+
+    def detect_osd(self, img) -> Dict[str, Any]:
+        data = pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT)
+        return {'orient_deg': int(data.get('orientation', 0)), 'orient_conf': float(data.get('orientation_conf', 0)),
+                'script': data.get('script', ''), 'script_conf': float(data.get('script_conf', 0))}
+
+    def available_languages(self) -> List[str]:
+        # Installed packs don't change while running; listing them costs a tesseract process
+        if self._languages is None:
+            self._languages = list(pytesseract.get_languages(config=''))
+        return self._languages
+
+    def warm(self, langs: List[str]) -> None:
+        pass
+
+
+class TesserocrBackend:
+    """Reuses initialised ``PyTessBaseAPI`` instances, one idle pool per language."""
+
+    name = 'tesserocr'
+
+    def __init__(self, tessdata: str = OCR_TESSDATA, max_idle_per_lang: int = 2):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.tessdata = tessdata or None
+        self.max_idle_per_lang = max_idle_per_lang
+        self._idle: Dict[str, "queue.LifoQueue"] = {}
+        self._lock = threading.Lock()
+        self._languages: Optional[List[str]] = None
+
+    def version(self) -> str:
+        return tesserocr.tesseract_version().splitlines()[0].strip()
+
+    def _new_api(self, lang: str):
+        if self.tessdata:
+            return tesserocr.PyTessBaseAPI(path=self.tessdata, lang=lang)
+        return tesserocr.PyTessBaseAPI(lang=lang)
+
+    def _pool(self, lang: str) -> "queue.LifoQueue":
+        with self._lock:
+            return self._idle.setdefault(lang, queue.LifoQueue())
+
+    def _acquire(self, lang: str):
+        try:
+            return self._pool(lang).get_nowait()
+        except queue.Empty:
+            return self._new_api(lang)
+
+    def _release(self, lang: str, api) -> None:
+        pool = self._pool(lang)
+        if pool.qsize() < self.max_idle_per_lang:
+            api.Clear()
+            pool.put(api)
+        else:
+            api.End()
+
+    def recognize(self, img, lang: str = 'eng') -> Words:
+        return _flatten(self.recognize_lines(img, lang))
+
+    def recognize_lines(self, img, lang: str = 'eng') -> List[Words]:
+        api = self._acquire(lang)
+        try:
+            api.SetImage(img)
+            api.Recognize()
+            lines: List[Words] = []
+            it = api.GetIterator()
+            level = tesserocr.RIL.WORD
+            for w in tesserocr.iterate_level(it, level):
+                text = w.GetUTF8Text(level)
+                if not (text and text.strip()):
+                    continue
+                if not lines or w.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    if lines and w.IsAtBeginningOf(tesserocr.RIL.PARA):
+                        lines.append(([], []))  # paragraph break
+                    lines.append(([], []))
+                lines[-1][0].append(text)
+                lines[-1][1].append(float(w.Confidence(level)))
+            return lines
+        finally:
+            self._release(lang, api)
+
+    def detect_osd(self, img) -> Dict[str, Any]:
+        api = self._acquire('osd')
+        try:
+            api.SetPageSegMode(tesserocr.PSM.OSD_ONLY)
+            api.SetImage(img)
+            data = api.DetectOrientationScript() or {}
+        finally:
+            api.SetPageSegMode(tesserocr.PSM.AUTO)
+            self._release('osd', api)
+        return {'orient_deg': int(data.get('orient_deg', 0)), 'orient_conf': float(data.get('orient_conf', 0)),
+                'script': data.get('script_name', ''), 'script_conf': float(data.get('script_conf', 0))}
+
+    def available_languages(self) -> List[str]:
+        if self._languages is None:
+            found = tesserocr.get_languages(self.tessdata) if self.tessdata else tesserocr.get_languages()
+            self._languages = list(found[1])
+        return self._languages
+
+    def warm(self, langs: List[str]) -> None:
+        for lang in langs:
+            self._release(lang, self._acquire(lang))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend():
+    """Return this process's OCR backend, creating it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend(OCR_BACKEND)
+        return _backend
+
+
+def _create_backend(choice: str):
+    if choice in ('auto', 'tesserocr') and tesserocr is not None:
+        try:
+            backend = TesserocrBackend()
+            backend.warm(['eng'])  # fails fast if tessdata is missing
+            return backend
+        except Exception as e:
+            print(f"tesserocr unavailable, falling back to pytesseract: {e}")
+    return PytesseractBackend()
+
+
+def warm_ocr_backend(langs: Optional[List[str]] = None) -> str:
+    """Initialise the backend (and its engines) for ``langs``; used as a worker initializer."""
+    backend = get_ocr_backend()
+    try:
+        # 'osd' last: without osd.traineddata only script routing is lost
+        backend.warm(langs or ['eng', 'osd'])
+    except Exception as e:
+        print(f"Could not pre-warm OCR engines: {e}")
+    return backend.name
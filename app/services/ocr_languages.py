@@ -0,0 +1,94 @@
+"""Route each image to only the Tesseract language packs it needs.
+
+Running ``eng+hin+ben+...`` on every upload multiplies OCR time, while most
+documents are English-only. A cheap Tesseract OSD pass detects the dominant
+script (and page orientation); the image is then recognised with that script's
+language plus English, which Indian IDs and forms almost always also contain.
+Detections are cached by image content so repeated scans skip OSD.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .ocr_backends import get_ocr_backend
+
+OCR_LANG = os.getenv('OCR_LANG', 'auto')  # 'auto' = detect script per image, or a fixed tesseract lang string
+OSD_MIN_SCRIPT_CONF = float(os.getenv('OSD_MIN_SCRIPT_CONF', '1.0'))
+OSD_MIN_ORIENT_CONF = float(os.getenv('OSD_MIN_ORIENT_CONF', '1.5'))
+
+# Tesseract OSD script name -> primary language pack
+SCRIPT_LANGS = {
+    'Latin': 'eng',
+    'Devanagari': 'hin',
+    'Bengali': 'ben',
+    'Gujarati': 'guj',
+    'Gurmukhi': 'pan',
+    'Kannada': 'kan',
+    'Malayalam': 'mal',
+    'Oriya': 'ori',
+    'Tamil': 'tam',
+    'Telugu': 'tel',
+    'Arabic': 'urd',
+}
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 512
+
+
+def image_digest(img) -> str:
+    return hashlib.sha256(f"{img.mode}{img.size}".encode('utf-8') + img.tobytes()).hexdigest()
+
+
+def lang_for_script(script: str, available) -> str:
+    """Tesseract lang string for ``script``, restricted to installed packs."""
+    primary = SCRIPT_LANGS.get(script, 'eng')
+    if primary == 'eng' or primary not in available:
+        return 'eng'
+    return f"{primary}+eng" if 'eng' in available else primary
+
+
+def detect_route(img) -> Dict[str, Any]:
+    """Return {'lang', 'script', 'rotate'} for ``img``, cached by image content."""
+    key = image_digest(img)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    route = {'lang': 'eng', 'script': '', 'rotate': 0}
+    backend = get_ocr_backend()
+    try:
+        osd = backend.detect_osd(img)
+        available = set(backend.available_languages())
+        if osd['script_conf'] >= OSD_MIN_SCRIPT_CONF:
+            route['script'] = osd['script']
+            route['lang'] = lang_for_script(osd['script'], available)
+        if osd['orient_deg'] and osd['orient_conf'] >= OSD_MIN_ORIENT_CONF:
+            route['rotate'] = osd['orient_deg']
+    except Exception as e:
+        # Too little text for OSD, or no osd.traineddata installed: plain English
+        print(f"Script detection skipped: {e}")
+
+    with _cache_lock:
+        _cache[key] = route
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return route
+
+
+def resolve_language(img, lang: Optional[str] = None) -> Tuple[Any, str, str]:
+    """
+    Decide how to OCR ``img``. Returns (image, lang, script): with lang 'auto'
+    the image may come back rotated upright and lang is the detected route.
+    """
+    lang = lang or OCR_LANG
+    if lang != 'auto':
+        return img, lang, ''
+    route = detect_route(img)
+    if route['rotate']:
+        img = img.rotate(route['rotate'], expand=True, fillcolor=255 if img.mode == 'L' else None)
+    return img, route['lang'], route['script']
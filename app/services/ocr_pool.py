@@ -0,0 +1,122 @@
+"""Process-pool OCR engine so multi-file uploads are extracted in parallel."""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .extraction import extract_text_from_file
+from .ocr_backends import warm_ocr_backend
+
+
+# A file path, or (name, bytes) for a document held in memory
+ExtractItem = Union[str, Tuple[str, bytes]]
+
+
+def _extract(func: Callable[..., Dict[str, Any]], item: ExtractItem) -> Dict[str, Any]:
+    return func(*item) if isinstance(item, tuple) else func(item)
+
+
+def _empty_result(error: str) -> Dict[str, Any]:
+    return {'text': '', 'source': 'unknown', 'avg_conf': None, 'error': error}
+
+
+class OCREngine:
+    """Fans text extraction out to a pool of worker processes.
+
+    The pool is created lazily on first use and sized to the number of CPU
+    cores unless ``max_workers`` is given. With ``max_workers=1`` extraction
+    runs inline in the calling thread and no processes are started. Each
+    worker initialises its OCR engine once and keeps it for its lifetime.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 60.0,
+                 func: Callable[..., Dict[str, Any]] = extract_text_from_file):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.func = func
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     initializer=warm_ocr_backend)
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def extract_many(self, filepaths: List[ExtractItem]) -> List[Dict[str, Any]]:
+        """Extract every file concurrently; results keep the input order.
+
+        Items are paths or ``(name, bytes)`` pairs for uploads held in memory.
+
+        Each file gets ``timeout`` seconds measured from submission, so the
+        whole call returns after roughly the slowest document. A file that
+        times out or crashes its worker yields an empty result with an
+        ``error`` key instead of failing the batch.
+        """
+        if not filepaths:
+            return []
+        if self.max_workers <= 1:
+            return [_extract(self.func, item) for item in filepaths]
+
+        try:
+            executor = self._get_executor()
+            futures: List[Future] = [executor.submit(_extract, self.func, item) for item in filepaths]
+        except (BrokenProcessPool, RuntimeError) as e:
+            print(f"OCR pool unavailable, extracting inline: {e}")
+            self._reset_executor()
+            return [_extract(self.func, item) for item in filepaths]
+
+        deadline = time.monotonic() + self.timeout
+        results: List[Dict[str, Any]] = []
+        for item, future in zip(filepaths, futures):
+            fp = item[0] if isinstance(item, tuple) else item
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                future.cancel()
+                print(f"OCR timed out after {self.timeout}s for {fp}")
+                results.append(_empty_result('timeout'))
+            except BrokenProcessPool as e:
+                print(f"OCR worker crashed while processing {fp}: {e}")
+                self._reset_executor()
+                results.append(_empty_result('worker_crashed'))
+            except Exception as e:
+                print(f"OCR failed for {fp}: {e}")
+                results.append(_empty_result(str(e)))
+        return results
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Run ``fn(*args)`` on the pool (inline when single-worker) and return its future."""
+        if self.max_workers > 1:
+            try:
+                return self._get_executor().submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"OCR pool unavailable, running inline: {e}")
+                self._reset_executor()
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def warm(self) -> List[str]:
+        """Start every worker and load its OCR engine now rather than on the first upload."""
+        if self.max_workers <= 1:
+            return [warm_ocr_backend()]
+        futures = [self.submit(warm_ocr_backend) for _ in range(self.max_workers)]
+        return [f.result(timeout=self.timeout) for f in futures]
+
+    def shutdown(self) -> None:
+        self._reset_executor()
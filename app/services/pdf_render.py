@@ -0,0 +1,211 @@
+"""DOCX -> PDF conversion for filled forms, done locally and cached.
+
+Two converters are available:
+
+* ``libreoffice`` runs ``soffice --headless --convert-to pdf``. Each pool
+  slot has its own LibreOffice user profile, created once by ``warm()``, so
+  conversions run concurrently and skip the multi-second first-start cost.
+* ``reportlab`` draws the document's paragraphs and tables with ReportLab
+  (the approach of ``extension/bimaYojna.generate_professional_pdf``). The
+  layout is simpler, but it needs no external program.
+
+``auto`` uses LibreOffice when ``soffice`` is on the PATH and ReportLab
+otherwise. Conversions are queued on a pool of ``PDF_CONVERTER_WORKERS``.
+Rendered PDFs are kept by the caller's generated-file store, keyed by the
+template hash and the filled values, so an identical fill is never rendered
+twice.
+"""
+
+import io
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+PDF_CONVERTER = os.getenv('PDF_CONVERTER', 'auto')  # auto | libreoffice | reportlab
+PDF_CONVERTER_WORKERS = int(os.getenv('PDF_CONVERTER_WORKERS', '2'))
+PDF_CONVERT_TIMEOUT = float(os.getenv('PDF_CONVERT_TIMEOUT', '60'))
+# TrueType font for the ReportLab converter, needed for Devanagari text (Times covers Latin only)
+PDF_FONT_PATH = os.getenv('PDF_FONT_PATH', '')
+
+
+def find_soffice() -> Optional[str]:
+    return shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def _blank_docx() -> bytes:
+    from docx import Document
+    buf = io.BytesIO()
+    Document().save(buf)
+    return buf.getvalue()
+
+
+class LibreOfficeConverter:
+    name = 'libreoffice'
+
+    def __init__(self, soffice: str, slots: int, timeout: float = PDF_CONVERT_TIMEOUT):
+        self.soffice = soffice
+        self.timeout = timeout
+        self._profiles = [os.path.join(tempfile.gettempdir(), f"farmerbuddy-lo-{os.getpid()}-{i}")
+                          for i in range(max(1, slots))]
+        self._free: "queue.Queue[str]" = queue.Queue()
+        for profile in self._profiles:
+            self._free.put(profile)
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        # A LibreOffice profile can't be shared by concurrent processes: hold one per conversion
+        profile = self._free.get()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                src = os.path.join(tmp, 'form.docx')
+                with open(src, 'wb') as f:
+                    f.write(docx_bytes)
+                subprocess.run([self.soffice, f"-env:UserInstallation={Path(profile).as_uri()}", '--headless',
+                                '--norestore', '--nolockcheck', '--convert-to', 'pdf', '--outdir', tmp, src],
+                               check=True, capture_output=True, timeout=self.timeout)
+                with open(os.path.join(tmp, 'form.pdf'), 'rb') as f:
+                    return f.read()
+        finally:
+            self._free.put(profile)
+
+
+class ReportLabConverter:
+    name = 'reportlab'
+
+    def __init__(self, font_path: str = PDF_FONT_PATH):
+        self.font, self.bold_font = 'Times-Roman', 'Times-Bold'
+        if font_path:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            pdfmetrics.registerFont(TTFont('FormFont', font_path))
+            self.font = self.bold_font = 'FormFont'
+
+    def _table(self, table, styles, width: float):
+        from reportlab.lib import colors
+        from reportlab.platypus import Paragraph, Table, TableStyle
+
+        rows: List[List[Any]] = []
+        style: List[Any] = [('GRID', (0, 0), (-1, -1), 0.5, colors.grey), ('VALIGN', (0, 0), (-1, -1), 'TOP')]
+        for r, row in enumerate(table.rows):
+            cells: List[Any] = []
+            prev, start = None, 0
+            for c, cell in enumerate(row.cells):
+                # Merged cells repeat the same <w:tc>: render it once and span the repeats
+                if cell._tc is prev:
+                    cells.append('')
+                    continue
+                if c - start > 1:
+                    style.append(('SPAN', (start, r), (c - 1, r)))
+                prev, start = cell._tc, c
+                cells.append(Paragraph(escape(cell.text).replace('\n', '<br/>'), styles['Form']))
+            if len(cells) - start > 1:
+                style.append(('SPAN', (start, r), (len(cells) - 1, r)))
+            rows.append(cells)
+        ncols = max((len(r) for r in rows), default=0)
+        if not ncols:
+            return None
+        rows = [r + [''] * (ncols - len(r)) for r in rows]
+        return Table(rows, colWidths=[width / ncols] * ncols, style=TableStyle(style))
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        from docx import Document
+        from docx.oxml.ns import qn
+        from docx.table import Table as DocxTable
+        from docx.text.paragraph import Paragraph as DocxParagraph
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+        doc = Document(io.BytesIO(docx_bytes))
+        styles = {
+            'Form': ParagraphStyle(name='Form', fontName=self.font, fontSize=10, leading=12),
+            'Heading': ParagraphStyle(name='Heading', fontName=self.bold_font, fontSize=13, leading=16,
+                                      spaceBefore=8, spaceAfter=4),
+        }
+        buffer = io.BytesIO()
+        pdf = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.75 * inch, leftMargin=0.75 * inch,
+                                topMargin=0.75 * inch, bottomMargin=0.75 * inch)
+        story: List[Any] = []
+        # Body order matters: paragraphs and tables are interleaved
+        for child in doc.element.body.iterchildren():
+            if child.tag == qn('w:p'):
+                para = DocxParagraph(child, doc)
+                text = para.text.strip()
+                if not text:
+                    story.append(Spacer(1, 6))
+                    continue
+                style_name = (para.style.name if para.style is not None else '') or ''
+                heading = style_name.startswith(('Heading', 'Title')) or \
+                    bool(para.runs) and all(run.bold for run in para.runs if run.text.strip())
+                story.append(Paragraph(escape(text), styles['Heading' if heading else 'Form']))
+            elif child.tag == qn('w:tbl'):
+                table = self._table(DocxTable(child, doc), styles, pdf.width)
+                if table is not None:
+                    story.extend([table, Spacer(1, 8)])
+        pdf.build(story or [Spacer(1, 1)])
+        return buffer.getvalue()
+
+
+def make_converter(kind: str = PDF_CONVERTER, workers: int = PDF_CONVERTER_WORKERS):
+    soffice = find_soffice() if kind in ('auto', 'libreoffice') else None
+    if soffice:
+        return LibreOfficeConverter(soffice, workers)
+    if kind == 'libreoffice':
+        print("PDF_CONVERTER=libreoffice but soffice was not found; using ReportLab")
+    return ReportLabConverter()
+
+
+class PdfRenderer:
+    """Queue of DOCX -> PDF conversions on a fixed pool."""
+
+    def __init__(self, converter=None, workers: int = PDF_CONVERTER_WORKERS, timeout: float = PDF_CONVERT_TIMEOUT):
+        self.workers = max(1, workers)
+        self._converter = converter
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pdf-render')
+        self._lock = threading.Lock()
+        self._stats = {'rendered': 0, 'failed': 0}
+
+    @property
+    def converter(self):
+        with self._lock:
+            if self._converter is None:
+                self._converter = make_converter(workers=self.workers)
+            return self._converter
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def render(self, docx_bytes: bytes) -> bytes:
+        """PDF for ``docx_bytes``, converted on the pool within ``timeout`` seconds."""
+        future = self._executor.submit(self.converter.convert, docx_bytes)
+        try:
+            data = future.result(timeout=self.timeout)
+        except Exception:
+            future.cancel()
+            self._count('failed')
+            raise
+        self._count('rendered')
+        return data
+
+    def warm(self) -> str:
+        """Initialise every converter slot (LibreOffice profiles, ReportLab imports) ahead of the first fill."""
+        blank = _blank_docx()
+        futures = [self._executor.submit(self.converter.convert, blank) for _ in range(self.workers)]
+        for f in futures:
+            f.result(timeout=max(self.timeout, 120))
+        return self.converter.name
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats['converter'] = self._converter.name if self._converter is not None else None
+        return stats
@@ -0,0 +1,127 @@
+"""Image clean-up applied before OCR.
+
+Phone photos of ID cards arrive as large colour images with background around
+the card and a slight tilt. Tesseract is both faster and more accurate on a
+right-sized, upright, binarised crop of just the card, so every image goes
+through ``preprocess_for_ocr`` before recognition. Only Pillow is used.
+"""
+
+import os
+from typing import List, Optional
+
+from PIL import Image, ImageChops, ImageOps
+
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', '1') != '0'
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', '300'))
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', '2000'))  # px cap when the image carries no DPI info
+OCR_BINARIZE = os.getenv('OCR_BINARIZE', '1') != '0'
+
+_DESKEW_ANGLES = [a / 2 for a in range(-10, 11)]  # -5 .. +5 degrees in 0.5 steps
+
+
+def flatten_to_grayscale(img: Image.Image) -> Image.Image:
+    """Drop alpha (onto white) and colour."""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    return img.convert('L')
+
+
+def downscale(img: Image.Image, target_dpi: int = OCR_TARGET_DPI, max_side: int = OCR_MAX_SIDE) -> Image.Image:
+    """Shrink to ``target_dpi`` when the DPI is known, else to at most ``max_side`` px."""
+    scale = 1.0
+    dpi = img.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > target_dpi:
+        scale = target_dpi / float(dpi[0])
+    elif max(img.size) > max_side:
+        scale = max_side / float(max(img.size))
+    if scale >= 1.0:
+        return img
+    size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+    return img.resize(size, Image.LANCZOS)
+
+
+def _background_level(gray: Image.Image) -> int:
+    w, h = gray.size
+    corners = [gray.getpixel((0, 0)), gray.getpixel((w - 1, 0)), gray.getpixel((0, h - 1)), gray.getpixel((w - 1, h - 1))]
+    return sorted(corners)[len(corners) // 2]
+
+
+def crop_to_content(gray: Image.Image, tolerance: int = 24, margin: int = 12) -> Image.Image:
+    """Crop away the uniform background surrounding the card / document."""
+    background = Image.new('L', gray.size, _background_level(gray))
+    mask = ImageChops.difference(gray, background).point(lambda p: 255 if p > tolerance else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return gray
+    left, top, right, bottom = bbox
+    # Ignore crops that would keep almost everything; not worth the copy
+    if (right - left) * (bottom - top) > 0.95 * gray.width * gray.height:
+        return gray
+    return gray.crop((max(0, left - margin), max(0, top - margin),
+                      min(gray.width, right + margin), min(gray.height, bottom + margin)))
+
+
+def otsu_threshold(gray: Image.Image) -> int:
+    hist = gray.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg, weight_bg, best, threshold = 0.0, 0, 0.0, 127
+    for i, h in enumerate(hist):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def binarize(gray: Image.Image) -> Image.Image:
+    t = otsu_threshold(gray)
+    return gray.point(lambda p: 255 if p > t else 0)
+
+
+def _row_profile_score(ink: Image.Image) -> float:
+    """Variance of per-row ink density; peaks when text lines are horizontal."""
+    rows: List[int] = list(ink.resize((1, ink.height), Image.BOX).tobytes())
+    mean = sum(rows) / len(rows)
+    return sum((r - mean) ** 2 for r in rows) / len(rows)
+
+
+def estimate_skew(gray: Image.Image, probe_side: int = 600) -> float:
+    """Return the rotation (degrees) that best straightens text lines."""
+    probe = gray.copy()
+    probe.thumbnail((probe_side, probe_side))
+    ink = ImageOps.invert(binarize(probe))
+    best_angle, best_score = 0.0, -1.0
+    for angle in _DESKEW_ANGLES:
+        rotated = ink.rotate(angle, resample=Image.BILINEAR, expand=False, fillcolor=0)
+        score = _row_profile_score(rotated)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def deskew(gray: Image.Image, min_angle: float = 0.5) -> Image.Image:
+    angle = estimate_skew(gray)
+    if abs(angle) < min_angle:
+        return gray
+    return gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=_background_level(gray))
+
+
+def preprocess_for_ocr(img: Image.Image, binarize_output: Optional[bool] = None) -> Image.Image:
+    """Downscale, grayscale, crop to the card region, deskew and binarise."""
+    gray = flatten_to_grayscale(downscale(img))
+    gray = crop_to_content(gray)
+    gray = deskew(gray)
+    if OCR_BINARIZE if binarize_output is None else binarize_output:
+        gray = binarize(gray)
+    return gray
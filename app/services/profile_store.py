@@ -0,0 +1,205 @@
+"""Per-user profile of canonical field values, built incrementally at ingest.
+
+Instead of re-reading every chunk and asking Gemini for the same name, father's
+name, address and bank details on each auto-fill, ingest extracts them once into
+a versioned ``user_profiles`` row: canonical field -> value, confidence and the
+chunk it came from. Auto-fill maps a form's labels onto this profile and only
+falls back to RAG for fields the profile does not know.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from .db import db_connection, init_db, merge_profile_fields
+from .field_extractors import extract_all, extractor_for_field
+from .label_index import SEED_LABELS, LabelIndex, person_markers, seed_label_index
+
+PROFILE_MIN_CONFIDENCE = float(os.getenv('PROFILE_MIN_CONFIDENCE', '0.7'))
+# Confidence given to values Gemini extracted during an auto-fill; kept below values read from documents
+# (LABEL_CONFIDENCE), so a RAG answer never replaces what a document says
+RAG_CONFIDENCE = 0.7
+LABEL_CONFIDENCE = 0.75
+# Confidence of values a user confirmed in a filled form
+CONFIRMED_CONFIDENCE = 0.95
+
+ProfileFields = Dict[str, Dict[str, Any]]
+
+_WORDS = r"(?P<v>[A-Za-z][A-Za-z.']*(?:[ ][A-Za-z][A-Za-z.']*){0,5})"
+# "Label: value" lines found on ID cards, passbooks and land records
+LABELLED_FIELDS: List[Tuple[str, Pattern]] = [
+    ('father_name', re.compile(r"(?:father(?:'s)?\s*(?:/\s*husband(?:'s)?\s*)?name|\b[SDW]/O\b|son\s+of|daughter\s+of)"
+                               r"\s*[:\-]?\s*" + _WORDS, re.IGNORECASE)),
+    ('name', re.compile(r"^\s*(?:applicant(?:'s)?\s+|full\s+|farmer(?:'s)?\s+)?name\s*[:\-]\s*" + _WORDS,
+                        re.IGNORECASE | re.MULTILINE)),
+    ('address', re.compile(r"^\s*(?:permanent\s+)?address\s*[:\-]\s*(?P<v>\S.{4,200}?)\s*$", re.IGNORECASE | re.MULTILINE)),
+    ('gender', re.compile(r"\b(?:gender|sex)\s*[:\-/]?\s*(?P<v>male|female|transgender)\b", re.IGNORECASE)),
+    ('village', re.compile(r"^\s*village\s*[:\-]\s*" + _WORDS, re.IGNORECASE | re.MULTILINE)),
+    ('district', re.compile(r"\bdistrict\s*[:\-]\s*" + _WORDS, re.IGNORECASE)),
+    ('state', re.compile(r"\bstate\s*[:\-]\s*" + _WORDS, re.IGNORECASE)),
+    ('bank_name', re.compile(r"\bbank\s+name\s*[:\-]\s*" + _WORDS, re.IGNORECASE)),
+]
+
+
+def _clean_value(text: str, m: re.Match) -> str:
+    value = m.group('v').strip()
+    # "Name: Ramesh Kumar DOB: ..." -- the last captured word is really the next label
+    if text[m.end():].lstrip(' ').startswith(':') and ' ' in value:
+        value = value.rsplit(' ', 1)[0]
+    return re.split(r"\s{2,}|\t", value)[0].strip(" ,.;")
+
+
+def extract_profile_fields(text: str) -> Dict[str, Tuple[str, float]]:
+    """Canonical field -> (value, confidence) found in one chunk of text."""
+    found = dict(extract_all(text))
+    for canonical, pattern in LABELLED_FIELDS:
+        if canonical in found:
+            continue
+        for m in pattern.finditer(text or ""):
+            value = _clean_value(text, m)
+            if value:
+                found[canonical] = (value, LABEL_CONFIDENCE)
+                break
+    return found
+
+
+def canonical_field(field: Dict[str, Any], index: Optional[LabelIndex] = None,
+                    user_id: Optional[str] = None) -> Optional[str]:
+    """The canonical profile field a form field asks for (as ``user_id`` taught it, if given), if known."""
+    if field.get('canonical'):
+        return field['canonical']
+    index = index or seed_label_index()
+    for raw in (field.get('label'), field.get('field_name')):
+        resolved = index.resolve(raw or '', user_id=user_id)
+        if resolved:
+            return resolved[0]
+    # "Nominee Aadhaar number" names the format but not the applicant's value
+    if any(person_markers(raw or '') for raw in (field.get('label'), field.get('field_name'))):
+        return None
+    extractor = extractor_for_field(field)
+    return extractor.kind if extractor is not None else None
+
+
+def collect_profile_fields(text: str, source: str, into: ProfileFields) -> ProfileFields:
+    """Add the fields found in ``text`` (from chunk ``source``) to ``into``, keeping the most confident."""
+    now = datetime.utcnow().isoformat()
+    merge_profile_fields(into, {name: {'value': value, 'confidence': round(conf, 2), 'source': source, 'updated_at': now}
+                                for name, (value, conf) in extract_profile_fields(text).items()})
+    return into
+
+
+class ProfileStore:
+    def __init__(self, db_path: Optional[str] = None, label_index: Optional[LabelIndex] = None):
+        self.db_path = db_path
+        self.label_index = label_index
+        init_db(self.db_path)  # user_profiles lives in the main schema (merged along with users)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with db_connection(self.db_path) as conn:
+            row = conn.execute("SELECT version, fields, updated_at FROM user_profiles WHERE user_id = ?",
+                               (user_id,)).fetchone()
+        if not row:
+            return None
+        return {'user_id': user_id, 'version': row['version'], 'fields': json.loads(row['fields']),
+                'updated_at': row['updated_at']}
+
+    def update(self, user_id: str, updates: ProfileFields) -> int:
+        """Merge ``updates`` into the user's profile; the version only changes if a field did."""
+        with db_connection(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT version, fields FROM user_profiles WHERE user_id = ?",
+                                   (user_id,)).fetchone()
+                version = row['version'] if row else 0
+                fields = json.loads(row['fields']) if row else {}
+                if merge_profile_fields(fields, updates) or not row:
+                    version += 1
+                    conn.execute("INSERT OR REPLACE INTO user_profiles (user_id, version, fields, updated_at) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 (user_id, version, json.dumps(fields), datetime.utcnow().isoformat()))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return version
+
+    def ingest_chunks(self, user_id: str, records: Iterable[Dict[str, Any]]) -> int:
+        """Update the profile from stored document records (filename, chunk_index, text)."""
+        updates: ProfileFields = {}
+        for r in records:
+            if (r.get('text') or '').strip():
+                collect_profile_fields(r['text'], f"{r.get('filename')}#{r.get('chunk_index', -1)}", updates)
+        return self.update(user_id, updates)
+
+    def lookup(self, profile: Optional[Dict[str, Any]], required_fields: List[Dict[str, Any]],
+               min_confidence: float = PROFILE_MIN_CONFIDENCE) -> Dict[str, Dict[str, Any]]:
+        """{field_name: profile entry} for the required fields the profile can answer."""
+        hits: Dict[str, Dict[str, Any]] = {}
+        if not profile:
+            return hits
+        for f in required_fields:
+            canonical = canonical_field(f, self.label_index, profile.get('user_id'))
+            entry = profile['fields'].get(canonical) if canonical else None
+            if entry and entry.get('value') and entry['confidence'] >= min_confidence:
+                hits[f['field_name']] = dict(entry, canonical=canonical)
+        return hits
+
+    def learn(self, user_id: str, required_fields: List[Dict[str, Any]], values: Dict[str, Any],
+              confidence: float = RAG_CONFIDENCE, source: str = 'rag') -> int:
+        """Store values resolved during an auto-fill under their canonical fields."""
+        now = datetime.utcnow().isoformat()
+        updates: ProfileFields = {}
+        for f in required_fields:
+            value = values.get(f.get('field_name'))
+            canonical = canonical_field(f, self.label_index, user_id)
+            if canonical and value and str(value).strip():
+                updates[canonical] = {'value': str(value).strip(), 'confidence': confidence, 'source': source,
+                                      'updated_at': now}
+        return self.update(user_id, updates) if updates else 0
+
+    def confirm(self, user_id: str, confirmed: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Record a fill the user accepted: [{'label', 'value', optional 'canonical'}].
+        Labels whose canonical field is given, or whose value matches exactly one
+        profile field, are learned by the label index for this user; those values
+        are stored with high confidence. Unknown fields, and built-in labels given
+        a different field, are ignored. Returns {label: canonical} for what was accepted.
+        """
+        profile = self.get(user_id) or {'fields': {}}
+        learned: Dict[str, str] = {}
+        updates: ProfileFields = {}
+        now = datetime.utcnow().isoformat()
+        for item in confirmed:
+            label, value = item.get('label') or '', str(item.get('value') or '').strip()
+            if not label or not value:
+                continue
+            canonical = item.get('canonical')
+            if canonical and (not isinstance(canonical, str) or canonical not in SEED_LABELS):
+                continue
+            if not canonical:
+                matches = [name for name, entry in profile['fields'].items() if _same_value(entry.get('value'), value)]
+                canonical = matches[0] if len(matches) == 1 else None
+            if not canonical:
+                continue
+            builtin = seed_label_index().resolve(label, threshold=1.0)
+            if builtin and builtin[0] != canonical:
+                continue
+            if self.label_index is not None and not builtin:
+                self.label_index.learn(label, canonical, user_id)
+            learned[label] = canonical
+            updates[canonical] = {'value': value, 'confidence': CONFIRMED_CONFIDENCE, 'source': 'confirmed',
+                                  'updated_at': now}
+        if updates:
+            self.update(user_id, updates)
+        return learned
+
+
+def _same_value(a: Any, b: str) -> bool:
+    a = str(a or '').strip()
+    if not a:
+        return False
+    if any(ch.isdigit() for ch in b):
+        return re.sub(r"\W", "", a).lower() == re.sub(r"\W", "", b).lower()
+    return " ".join(a.lower().split()) == " ".join(b.lower().split())
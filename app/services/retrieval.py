@@ -0,0 +1,221 @@
+"""Chunk retrieval for the auto-fill RAG prompt.
+
+Instead of sending every stored chunk to the model, each required field label
+is used as a query against a BM25 index over the user's chunks and only the
+best matches are kept, within a token budget. An optional embedding function
+can be supplied to blend in semantic similarity via reciprocal rank fusion;
+its vectors are cached by text hash so stored chunks are encoded only once.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
+# (queries, k) -> for each query, indices of its best chunks
+LexicalRanker = Callable[[List[str], int], List[List[int]]]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token)."""
+    return max(1, len(text or "") // 4)
+
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory list of texts."""
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_tfs = [Counter(tokenize(t)) for t in texts]
+        self.doc_lens = [sum(tf.values()) for tf in self.doc_tfs]
+        self.avg_len = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+        df: Counter = Counter()
+        for tf in self.doc_tfs:
+            df.update(tf.keys())
+        n = len(texts)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query: str) -> List[float]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        out = []
+        for tf, length in zip(self.doc_tfs, self.doc_lens):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_len) if self.avg_len else self.k1
+            for term in terms:
+                freq = tf.get(term, 0)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            out.append(score)
+        return out
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [i for i in ranked[:k] if scores[i] > 0]
+
+
+def _field_query(field: Dict[str, Any]) -> str:
+    return " ".join(filter(None, [field.get('label') or '', (field.get('field_name') or '').replace('_', ' ')]))
+
+
+def _embedding_ranks(texts: List[str], queries: List[str], embedder: Embedder, k: int) -> List[List[int]]:
+    vectors = embedder(texts + queries)
+    doc_vecs, query_vecs = vectors[:len(texts)], vectors[len(texts):]
+
+    def cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        na = math.sqrt(sum(x * x for x in a))
+        nb = math.sqrt(sum(y * y for y in b))
+        return dot / (na * nb) if na and nb else 0.0
+
+    ranks = []
+    for qv in query_vecs:
+        sims = [cosine(qv, dv) for dv in doc_vecs]
+        ranks.append(sorted(range(len(texts)), key=lambda i: sims[i], reverse=True)[:k])
+    return ranks
+
+
+def select_chunks(chunks: List[Dict[str, Any]], required_fields: List[Dict[str, Any]], top_k: int = 3,
+                  token_budget: int = 3000, embedder: Optional[Embedder] = None,
+                  lexical: Optional[LexicalRanker] = None) -> List[Dict[str, Any]]:
+    """
+    Pick the chunks most relevant to ``required_fields``.
+
+    Chunks are taken round-robin across fields (each field's best match first,
+    then second best, ...) until ``token_budget`` is reached, and returned in
+    their original order. If everything fits in the budget it is all returned.
+    ``lexical`` replaces the in-memory BM25 ranking (e.g. with the FTS5 index).
+    """
+    chunks = [c for c in chunks if (c.get('text') or '').strip()]
+    if sum(estimate_tokens(c['text']) for c in chunks) <= token_budget:
+        return chunks
+
+    texts = [c['text'] for c in chunks]
+    queries = [_field_query(f) for f in required_fields]
+    per_field = None
+    if lexical is not None:
+        try:
+            per_field = lexical(queries, top_k)
+        except Exception as e:
+            print(f"Lexical ranker failed, using in-memory BM25: {e}")
+    if per_field is None:
+        index = BM25Index(texts)
+        per_field = [index.top_k(q, top_k) for q in queries]
+
+    if embedder is not None:
+        try:
+            emb_ranks = _embedding_ranks(texts, queries, embedder, top_k)
+            fused = []
+            for lexical, semantic in zip(per_field, emb_ranks):
+                rrf: Dict[int, float] = {}
+                for ranking in (lexical, semantic):
+                    for rank, idx in enumerate(ranking):
+                        rrf[idx] = rrf.get(idx, 0.0) + 1.0 / (60 + rank)
+                fused.append(sorted(rrf, key=rrf.get, reverse=True)[:top_k])
+            per_field = fused
+        except Exception as e:
+            print(f"Embedding retrieval failed, using BM25 only: {e}")
+
+    selected: List[int] = []
+    used = 0
+    for rank in range(top_k):
+        for ranking in per_field:
+            if rank >= len(ranking) or ranking[rank] in selected:
+                continue
+            cost = estimate_tokens(texts[ranking[rank]])
+            if used + cost > token_budget:
+                continue
+            selected.append(ranking[rank])
+            used += cost
+
+    if not selected:
+        # No lexical overlap at all: fall back to the leading chunks
+        for i, text in enumerate(texts):
+            cost = estimate_tokens(text)
+            if used + cost > token_budget:
+                break
+            selected.append(i)
+            used += cost
+
+    return [chunks[i] for i in sorted(selected)]
+
+
+class CachedEmbedder:
+    """
+    Thread-safe LRU of text hash -> vector in front of an ``Embedder``.
+
+    Chunk texts never change once stored, so keying on their content means each
+    chunk (and each recurring field label) is encoded once per process; only the
+    misses of a call are sent to the model, in a single batch.
+    """
+
+    def __init__(self, embedder: Embedder, max_entries: int = 10000):
+        self.embedder = embedder
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def __call__(self, texts: List[str]) -> List[Sequence[float]]:
+        keys = [self._key(t) for t in texts]
+        vectors: List[Optional[Sequence[float]]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    vectors[i] = vec
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        # Encode each distinct missing text once, even if it repeats in the batch
+        pending: Dict[str, int] = {}
+        for i in missing:
+            pending.setdefault(keys[i], i)
+        if pending:
+            encoded = self.embedder([texts[i] for i in pending.values()])
+            fresh = {key: array('f', vec) for key, vec in zip(pending, encoded)}
+            for i in missing:
+                vectors[i] = fresh[keys[i]]
+            if self.max_entries > 0:
+                with self._lock:
+                    self._entries.update(fresh)
+                    for key in fresh:
+                        self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        with self._lock:
+            self.stats['hits'] += len(texts) - len(missing)
+            self.stats['misses'] += len(pending)
+        return vectors  # type: ignore[return-value]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def load_embedder(model_name: str, cache_size: int = 10000) -> Optional[Embedder]:
+    """Return a cached CPU sentence-transformers embedder, or None if unavailable."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("sentence-transformers not installed — using BM25 retrieval only.")
+        return None
+    try:
+        model = SentenceTransformer(model_name, device='cpu')
+    except Exception as e:
+        print(f"Could not load embedding model {model_name}: {e}")
+        return None
+    return CachedEmbedder(lambda texts: model.encode(texts, normalize_embeddings=True).tolist(), cache_size)
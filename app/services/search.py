@@ -0,0 +1,60 @@
+"""Full-text search over ingested document chunks (SQLite FTS5).
+
+``documents_fts`` (see ``db._create_search_index``) indexes every chunk, so
+lookups such as "which user uploaded khasra 1234/5" or a name search are index
+probes instead of a scan of ``documents.text``. The same index ranks a user's
+chunks for the auto-fill prompt.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from .db import db_connection
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text: str, match_all: bool = True) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression. Each whitespace-separated
+    term becomes a quoted phrase of its word parts (so "1234/5" matches the
+    adjacent tokens 1234 and 5); terms are ANDed, or ORed if not ``match_all``.
+    """
+    phrases = []
+    for term in (text or "").split():
+        parts = _TERM_RE.findall(term)
+        if parts:
+            phrases.append('"' + " ".join(parts) + '"')
+    return (" " if match_all else " OR ").join(phrases)
+
+
+def search_documents(query: str, user_id: Optional[str] = None, scheme_id: Optional[str] = None,
+                     limit: int = 20, match_all: bool = True, db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Best-matching chunks for ``query`` (BM25 order), optionally scoped to a user and/or scheme."""
+    match = fts_query(query, match_all=match_all)
+    if not match:
+        return []
+    sql = """
+        SELECT d.id, d.user_id, d.filename, d.scheme_id, d.doc_type, d.chunk_index,
+               snippet(documents_fts, 0, '[', ']', '...', 12) AS snippet, bm25(documents_fts) AS score
+        FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+        WHERE documents_fts MATCH ?
+    """
+    params: List[Any] = [match]
+    if user_id:
+        sql += " AND d.user_id = ?"
+        params.append(user_id)
+    if scheme_id:
+        sql += " AND d.scheme_id = ?"
+        params.append(scheme_id)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    with db_connection(db_path) as conn:
+        return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def rank_user_chunks(user_id: str, queries: List[str], top_k: int,
+                     db_path: Optional[str] = None) -> List[List[int]]:
+    """For each query, ids of the user's ``top_k`` best chunks (any query term may match)."""
+    return [[r['id'] for r in search_documents(q, user_id=user_id, limit=top_k, match_all=False, db_path=db_path)]
+            for q in queries]
@@ -0,0 +1,104 @@
+"""Uploaded files held in memory for extraction instead of being saved first.
+
+``read_upload`` reads a request's file stream once, hashing it as it goes.
+Files up to ``UPLOAD_SPOOL_MAX_MB`` stay in memory and are handed to the
+extractors as bytes (PyMuPDF, PIL and python-docx all read from buffers);
+larger ones are spooled to a temporary file outside ``uploads/``. The hash
+doubles as the extraction-cache key, so a cached document is never re-read.
+Keeping the original in the file store is optional and done in the
+background once the request no longer needs the bytes.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Iterable, List, Optional, Tuple, Union
+
+UPLOAD_SPOOL_MAX_MB = float(os.getenv('UPLOAD_SPOOL_MAX_MB', '16'))
+PERSIST_UPLOADS = os.getenv('PERSIST_UPLOADS', '1').lower() in ('1', 'true', 'yes')
+
+_READ_BLOCK = 1 << 20
+_persist_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persist-upload')
+
+
+class UploadedFile:
+    """One uploaded document: its bytes in ``data``, or a spooled temp file at ``path``."""
+
+    def __init__(self, filename: str, sha256: str, size: int, data: Optional[bytes] = None,
+                 path: Optional[str] = None):
+        self.filename = filename
+        self.sha256 = sha256
+        self.size = size
+        self.data = data
+        self.path = path
+
+    @property
+    def extract_source(self) -> Union[str, Tuple[str, bytes]]:
+        """What ``OCREngine.extract_many`` takes: the spool path, or (filename, bytes)."""
+        return self.path if self.path else (self.filename, self.data or b'')
+
+    def open(self) -> BinaryIO:
+        return open(self.path, 'rb') if self.path else io.BytesIO(self.data or b'')
+
+    def close(self) -> None:
+        self.data = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def read_upload(stream: BinaryIO, filename: str,
+                max_memory: int = int(UPLOAD_SPOOL_MAX_MB * 1024 * 1024)) -> UploadedFile:
+    """Read an upload stream once; spool to a temp file only past ``max_memory`` bytes."""
+    digest = hashlib.sha256()
+    parts: List[bytes] = []
+    size = 0
+    spool = None
+    try:
+        for block in iter(lambda: stream.read(_READ_BLOCK), b''):
+            digest.update(block)
+            size += len(block)
+            if spool is None and size > max_memory:
+                # Keep the extension: extraction picks the reader by it
+                spool = tempfile.NamedTemporaryFile(prefix='upload-', suffix=os.path.splitext(filename)[1],
+                                                    delete=False)
+                spool.write(b''.join(parts))
+                parts = []
+            if spool is not None:
+                spool.write(block)
+            else:
+                parts.append(block)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+    if spool is not None:
+        spool.close()
+        return UploadedFile(filename, digest.hexdigest(), size, path=spool.name)
+    return UploadedFile(filename, digest.hexdigest(), size, data=b''.join(parts))
+
+
+def _persist(store, uploads: Iterable[UploadedFile]) -> None:
+    for upload in uploads:
+        try:
+            with upload.open() as f:
+                store.save_upload(f, upload.filename)
+        except Exception as e:
+            print(f"Could not persist upload {upload.filename}: {e}")
+        finally:
+            upload.close()
+
+
+def release_uploads(uploads: List[UploadedFile], store=None, persist: bool = PERSIST_UPLOADS) -> Optional[Future]:
+    """Done with ``uploads``: keep the originals in ``store`` in the background if ``persist``, then free them."""
+    if store is not None and persist and uploads:
+        return _persist_pool.submit(_persist, store, list(uploads))
+    for upload in uploads:
+        upload.close()
+    return None
@@ -0,0 +1,68 @@
+"""Benchmark: per-chunk commits vs. the single-transaction bulk writer.
+
+Usage: python benchmarks/bench_db_writes.py [num_chunks]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.db import get_pool, init_db, save_document_records  # noqa: E402
+
+
+def legacy_save(db_path, user_id, records):
+    """Replica of the original helpers: one connection + commit per chunk."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    cur = conn.cursor()
+    cur.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
+    if not cur.fetchone():
+        cur.execute("INSERT INTO users (user_id, aadhaar_hash, created_at) VALUES (?, ?, ?)",
+                    (user_id, None, datetime.utcnow().isoformat()))
+        conn.commit()
+    conn.close()
+    for r in records:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            INSERT INTO documents (user_id, filename, scheme_id, doc_type, text, metadata, chunk_index, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, r['filename'], r['scheme_id'], r['doc_type'], r['text'], json.dumps(r['metadata']),
+              r['chunk_index'], datetime.utcnow().isoformat()))
+        conn.commit()
+        conn.close()
+
+
+def make_records(n):
+    words = " ".join(["khasra"] * 400)
+    return [{'filename': 'land_record.pdf', 'scheme_id': 'pm-kisan', 'text': words, 'doc_type': 'pdf',
+             'metadata': {'ocr_conf': 0}, 'chunk_index': i} for i in range(n)]
+
+
+def run(label, fn, n, rounds=5):
+    elapsed = 0.0
+    for i in range(rounds):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            init_db(db_path)
+            get_pool(db_path).close_all()
+            records = make_records(n)
+            start = time.perf_counter()
+            fn(db_path, f"user-{i}", records)
+            elapsed += time.perf_counter() - start
+            get_pool(db_path).close_all()
+    rate = n * rounds / elapsed
+    print(f"{label:>10}: {rate:10.0f} chunks/sec ({elapsed / rounds * 1000:.1f} ms per {n}-chunk ingest)")
+    return rate
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    before = run('per-chunk', legacy_save, n)
+    after = run('bulk', lambda p, u, r: save_document_records(u, r, db_path=p), n)
+    print(f"speedup: {after / before:.1f}x")
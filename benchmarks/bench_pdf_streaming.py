@@ -0,0 +1,65 @@
+"""Benchmark: peak Python memory of whole-document vs. page-streamed PDF ingest.
+
+Builds a synthetic multi-page PDF, then measures (with tracemalloc) the old
+path -- join every page, then chunk -- against iter_pdf_pages -> iter_structured_chunks.
+
+Usage: python benchmarks/bench_pdf_streaming.py [pages]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.chunking import chunk_text, iter_structured_chunks  # noqa: E402
+from app.services.extraction import iter_pdf_pages  # noqa: E402
+
+
+def make_pdf(path, pages):
+    line = "Khasra 1234/5 Khatauni owner Ramesh Kumar village Rampur area 0.405 hectare " * 2
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 559, 806), line * 30, fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def whole_document(path):
+    with fitz.open(path) as doc:
+        pages_text = [page.get_text() for page in doc]
+    text = "\n\n".join(pages_text)
+    return len(chunk_text(text))
+
+
+def streamed(path):
+    count = 0
+    for _ in iter_structured_chunks(iter_pdf_pages(path, max_pages=None, max_bytes=None)):
+        count += 1  # each chunk would be written to the DB and dropped here
+    return count
+
+
+def measure(label, fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>15}: peak {peak / 1024:9.1f} KiB, {elapsed * 1000:7.1f} ms, {chunks} chunks")
+    return peak
+
+
+if __name__ == '__main__':
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bundle.pdf')
+        make_pdf(path, pages)
+        before = measure('whole-document', whole_document, path)
+        after = measure('streamed', streamed, path)
+        print(f"peak memory reduced {before / after:.1f}x for a {pages}-page PDF")
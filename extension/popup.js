@@ -217,10 +217,13 @@ function applyFieldsToActiveTab(mapped_fields) {
   });
 }
 
+const JOB_POLL_INTERVAL_MS = 1500;
+const JOB_POLL_TIMEOUT_MS = 120000;
+
 async function requestAutofillFromServer(userId, fields) {
-  // body: user_id, output_type=json, fields[]
+  // body: user_id, output_type=json, fields[]; queued as a background job and polled
   const body = { user_id: userId, output_type: 'json', fields: fields || [] };
-  const res = await fetch(`${BACKEND_URL}/auto_fill_user`, {
+  const res = await fetch(`${BACKEND_URL}/auto_fill_user?async=1`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body)
@@ -230,7 +233,26 @@ async function requestAutofillFromServer(userId, fields) {
     throw new Error(`Server ${res.status}: ${txt}`);
   }
   const j = await res.json();
-  return j;
+  if (!j.job_id) return j;
+  return pollJob(j.job_id);
+}
+
+async function pollJob(jobId) {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    await new Promise((r) => setTimeout(r, JOB_POLL_INTERVAL_MS));
+    const res = await fetch(`${BACKEND_URL}/jobs/${encodeURIComponent(jobId)}`);
+    if (!res.ok) {
+      const txt = await res.text();
+      throw new Error(`Server ${res.status}: ${txt}`);
+    }
+    const job = await res.json();
+    if (job.status === 'done') return job.result;
+    if (job.status === 'failed') {
+      return job.result || { success: false, error: job.error || 'Autofill job failed' };
+    }
+  }
+  throw new Error('Timed out waiting for autofill job');
 }
 
 autofillPageBtn.addEventListener('click', async (e) => {
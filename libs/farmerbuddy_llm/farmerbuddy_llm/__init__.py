@@ -0,0 +1 @@
+"""LLM client shared by the form-filling app and the Krishi Mitra chatbot."""
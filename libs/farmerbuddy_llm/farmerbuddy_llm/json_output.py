@@ -0,0 +1,109 @@
+"""Tolerant parsing of JSON returned by an LLM.
+
+Even in JSON mode a model reply can arrive wrapped in a Markdown fence, preceded
+by prose ("Here is the JSON:"), carry trailing commas, or be cut off at the
+output-token limit. ``extract_json`` recovers the JSON value from all of these;
+for a truncated object or array it keeps every member that arrived complete,
+so the caller only has to re-ask for what is missing. ``parse_json`` also
+reports whether the value was salvaged from a truncated reply, so callers can
+avoid persisting a partial result.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_FENCE = re.compile(r"```(?:json|JSON)?")
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def object_schema(keys: Iterable[str], value_type: str = 'STRING') -> Dict[str, Any]:
+    """Response schema for a flat JSON object with string values under ``keys``."""
+    keys = list(keys)
+    return {'type': 'OBJECT', 'properties': {k: {'type': value_type} for k in keys}, 'required': keys}
+
+
+def _starts(text: str) -> Iterator[int]:
+    for i, ch in enumerate(text):
+        if ch in _CLOSERS:
+            yield i
+
+
+def _salvage(text: str, start: int) -> Optional[Any]:
+    """
+    Parse a truncated JSON value starting at ``text[start]``: scan to the last
+    top-level member that ended cleanly, drop the rest and close the brackets.
+    """
+    stack: List[str] = []
+    in_string = escaped = False
+    cut = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in '}]':
+            if not stack or stack.pop() != ch:
+                break
+            if not stack:
+                return None  # complete value; it failed to parse for another reason
+            if len(stack) == 1:
+                cut = i + 1
+        elif ch == ',' and len(stack) == 1:
+            cut = i
+    if not stack:
+        return None
+    if not in_string:
+        # Cut off right after a complete value: closing the brackets may be enough
+        try:
+            return json.loads(text[start:].rstrip().rstrip(',') + "".join(reversed(stack)))
+        except json.JSONDecodeError:
+            pass
+    body = text[start:cut] if cut is not None else text[start:start + 1]
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", body.rstrip().rstrip(',')) + stack[0])
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_json(text: str, expect: Optional[type] = None) -> Tuple[Any, bool]:
+    """
+    (value, salvaged) for the JSON value in an LLM reply; ``salvaged`` is True
+    when the reply was truncated and only its complete members were kept.
+    ``expect`` (dict or list) skips values of another type, e.g. a bracketed
+    aside in leading prose. Raises ValueError if no JSON can be recovered.
+    """
+    text = _FENCE.sub("", text or "").strip()
+    decoder = json.JSONDecoder()
+    for start in _starts(text):
+        if expect is not None and text[start] != ('{' if expect is dict else '['):
+            continue
+        for candidate in (text[start:], _TRAILING_COMMA.sub(r"\1", text[start:])):
+            try:
+                value, _ = decoder.raw_decode(candidate)
+            except json.JSONDecodeError:
+                continue
+            if expect is None or isinstance(value, expect):
+                return value, False
+            break
+        else:
+            # Unparseable from here: a truncated value (salvaged) or stray brackets in prose
+            value = _salvage(text, start)
+            if value is not None:
+                return value, True
+    raise ValueError(f"no JSON value in model output: {text[:80]!r}")
+
+
+def extract_json(text: str, expect: Optional[type] = None) -> Any:
+    """The JSON value in an LLM reply (see ``parse_json``). Raises ValueError if there is none."""
+    return parse_json(text, expect)[0]
@@ -0,0 +1,289 @@
+"""Shared LLM client: timeouts, retries, a concurrency limit and a response cache.
+
+All Gemini calls (form-field analysis, structured extraction, the Krishi Mitra
+chatbot) go through ``LLMClient`` instead of calling ``generate_content``
+directly. The client bounds how many requests are in flight, retries rate
+limits and server errors with exponential backoff, serves repeated prompts
+from a TTL/LRU cache and keeps latency and token metrics. Backends are
+pluggable; ``FakeBackend`` is used by tests. ``generate_json`` asks for
+schema-constrained JSON, parses the reply tolerantly and re-asks only for the
+keys that did not come back.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from .json_output import extract_json, object_schema, parse_json
+
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '1.0'))  # seconds; doubles per attempt
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '512'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '3600'))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """A failed LLM call; ``status`` is the HTTP-like status when known."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class LLMResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    """HTTP status of an exception from any backend (google.api_core errors carry ``code``)."""
+    for attr in ('status', 'code', 'status_code'):
+        value = getattr(exc, attr, None)
+        value = value() if callable(value) else value
+        value = getattr(value, 'value', value)  # grpc StatusCode enums
+        if isinstance(value, int):
+            return value
+    name = type(exc).__name__
+    if name in ('ResourceExhausted', 'TooManyRequests'):
+        return 429
+    if name in ('ServiceUnavailable', 'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout'):
+        return 503
+    if isinstance(exc, TimeoutError):
+        return 504
+    return None
+
+
+class GeminiBackend:
+    """google-generativeai ``GenerativeModel`` behind the backend interface."""
+
+    def __init__(self, model_name: str, api_key: str):
+        import google.generativeai as genai  # only needed when Gemini is configured
+        genai.configure(api_key=api_key)
+        self.name = model_name
+        self._model = genai.GenerativeModel(model_name)
+        self.supports_schema = True
+
+    def generate(self, prompt: str, timeout: float, json_schema: Optional[Dict[str, Any]] = None,
+                 **kwargs: Any) -> LLMResponse:
+        options = {'timeout': timeout}
+        if json_schema is None:
+            response = self._model.generate_content(prompt, request_options=options, **kwargs)
+        else:
+            config = dict(kwargs.pop('generation_config', None) or {}, response_mime_type='application/json')
+            response = None
+            if self.supports_schema:
+                try:
+                    response = self._model.generate_content(
+                        prompt, request_options=options,
+                        generation_config=dict(config, response_schema=json_schema), **kwargs)
+                except (TypeError, ValueError, KeyError) as e:
+                    # Older google-generativeai releases reject response_schema; JSON mode still helps
+                    print(f"Response schema not supported by {self.name}, using plain JSON mode: {e}")
+                    self.supports_schema = False
+            if response is None:
+                response = self._model.generate_content(prompt, request_options=options, generation_config=config,
+                                                        **kwargs)
+        usage = getattr(response, 'usage_metadata', None)
+        return LLMResponse(response.text,
+                           prompt_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+                           output_tokens=getattr(usage, 'candidates_token_count', 0) or 0)
+
+
+FakeReply = Union[str, BaseException, Callable[[str], str]]
+
+
+class FakeBackend:
+    """
+    Scripted backend for tests: replies are consumed in order (a string is
+    returned, an exception raised, a callable called with the prompt); the
+    last reply repeats. Every prompt received is kept in ``prompts``.
+    """
+
+    name = 'fake'
+
+    def __init__(self, replies: Optional[List[FakeReply]] = None):
+        self.replies: List[FakeReply] = list(replies or ['{}'])
+        self.prompts: List[str] = []
+        self.kwargs: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, timeout: float, **kwargs: Any) -> LLMResponse:
+        with self._lock:
+            self.prompts.append(prompt)
+            self.kwargs.append(kwargs)
+            reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, BaseException):
+            raise reply
+        text = reply(prompt) if callable(reply) else reply
+        return LLMResponse(text, prompt_tokens=max(1, len(prompt) // 4), output_tokens=max(1, len(text) // 4))
+
+
+class ResponseCache:
+    """Thread-safe LRU of prompt hash -> text, entries expiring after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, text: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LLMClient:
+    def __init__(self, backend, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 cache: Optional[ResponseCache] = None, sleep: Callable[[float], None] = time.sleep):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.cache = cache if cache is not None else ResponseCache()
+        self._sleep = sleep
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._counters = {'calls': 0, 'cache_hits': 0, 'retries': 0, 'errors': 0, 'reasks': 0, 'salvaged': 0,
+                          'prompt_tokens': 0, 'output_tokens': 0}
+
+    def _cache_key(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        payload = json.dumps([getattr(self.backend, 'name', ''), prompt, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counters[name] += delta
+
+    def generate(self, prompt: str, cache: bool = True, **kwargs: Any) -> str:
+        """
+        Return the model's text for ``prompt``. Extra keyword arguments go to the
+        backend (e.g. ``generation_config``). Raises ``LLMError`` once retries
+        are exhausted or for a non-retryable failure.
+        """
+        key = self._cache_key(prompt, kwargs) if cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count(cache_hits=1)
+                return cached
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                with self._semaphore:
+                    response = self.backend.generate(prompt, timeout=self.timeout, **kwargs)
+            except Exception as e:
+                status = _status_of(e)
+                if status in RETRYABLE_STATUS and attempt < self.max_retries:
+                    delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random() / 2)
+                    attempt += 1
+                    self._count(retries=1)
+                    print(f"LLM call failed ({status}), retry {attempt}/{self.max_retries} in {delay:.1f}s: {e}")
+                    self._sleep(delay)
+                    continue
+                self._count(errors=1)
+                raise LLMError(str(e), status) from e
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+            self._count(calls=1, prompt_tokens=response.prompt_tokens, output_tokens=response.output_tokens)
+            if key and response.text:
+                self.cache.put(key, response.text)
+            return response.text
+
+    def generate_json(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                      required_keys: Optional[List[str]] = None,
+                      reask: Optional[Callable[[List[str]], str]] = None, with_status: bool = False,
+                      **kwargs: Any) -> Any:
+        """
+        Parsed JSON for ``prompt``, requested as schema-constrained output. With
+        ``required_keys`` the reply must be an object (``schema`` defaults to
+        string values under those keys); keys missing from a partial reply are
+        asked for once more with the prompt ``reask(missing)`` and merged in.
+        With ``with_status`` returns (value, complete): False when the value was
+        salvaged from a truncated reply and not completed by a re-ask. A
+        truncated reply, or one without JSON, is never kept in the response cache.
+        Raises ``LLMError`` on call failure and ValueError if no JSON came back.
+        """
+        if schema is None and required_keys:
+            schema = object_schema(required_keys)
+        expect = dict if required_keys else None
+        text = self.generate(prompt, json_schema=schema, **kwargs)
+        key = self._cache_key(prompt, dict(kwargs, json_schema=schema))
+        try:
+            value, salvaged = parse_json(text, expect=expect)
+        except ValueError:
+            # A reply without usable JSON must not be replayed from the cache on retry
+            self.cache.discard(key)
+            if not (required_keys and reask):
+                raise
+            value, salvaged = {}, True
+        if salvaged:
+            self._count(salvaged=1)
+            self.cache.discard(key)
+        if not (required_keys and reask):
+            return (value, not salvaged) if with_status else value
+        missing = [k for k in required_keys if k not in value]
+        if missing:
+            self._count(reasks=1)
+            try:
+                extra = extract_json(self.generate(reask(missing), json_schema=object_schema(missing), **kwargs),
+                                     expect=dict)
+            except ValueError as e:
+                print(f"Re-ask for {len(missing)} missing keys returned no JSON: {e}")
+                extra = {}
+            value.update({k: extra[k] for k in missing if k in extra})
+        if with_status:
+            return value, all(k in value for k in required_keys)
+        return value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            latencies = sorted(self._latencies)
+        stats['backend'] = getattr(self.backend, 'name', type(self.backend).__name__)
+        stats['cache_entries'] = len(self.cache)
+        if latencies:
+            stats['latency_ms'] = {
+                'avg': round(sum(latencies) / len(latencies) * 1000, 1),
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            }
+        return stats
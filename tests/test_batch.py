@@ -0,0 +1,66 @@
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+
+from app.services.batch import iter_completed, parse_batch_targets, stream_zip
+
+
+def test_stream_zip_yields_each_entry_as_it_is_added():
+    produced = []
+
+    def entries():
+        for name in ("pm-kisan_u1.docx", "pm-kisan_u2.docx"):
+            produced.append(name)
+            yield name, name.encode() * 100
+
+    pieces = []
+    for piece in stream_zip(entries()):
+        pieces.append((len(produced), piece))
+
+    # The first entry is sent before the second one is even produced
+    assert pieces[0][0] == 1
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(p for _, p in pieces)))
+    assert archive.namelist() == ["pm-kisan_u1.docx", "pm-kisan_u2.docx"]
+    assert archive.read("pm-kisan_u2.docx") == b"pm-kisan_u2.docx" * 100
+    assert archive.testzip() is None
+
+
+def test_iter_completed_bounds_workers_and_reports_errors():
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def work(n):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        if n == 3:
+            raise ValueError("no documents")
+        return n * 10
+
+    results = {item: (result, error) for item, result, error in iter_completed(work, range(6), max_workers=2)}
+
+    assert peak[0] == 2
+    assert results[2] == (20, None)
+    assert results[3][0] is None and isinstance(results[3][1], ValueError)
+
+
+def test_batch_targets_accept_lists_strings_and_csv_only():
+    assert parse_batch_targets("u1, u2,") == [{'user_id': 'u1'}, {'user_id': 'u2'}]
+    assert parse_batch_targets(["u1", 7]) == [{'user_id': 'u1'}, {'user_id': '7'}]
+    assert parse_batch_targets(None, b"user_id,aadhaar\nu1,\n,234567890124\n") == [
+        {'user_id': 'u1'}, {'aadhaar': '234567890124'}]
+    assert parse_batch_targets(None, b"u1\nu2\n") == [{'user_id': 'u1'}, {'user_id': 'u2'}]
+
+    for bad in ({'a': 1}, [["u1"]], 5):
+        with pytest.raises(ValueError):
+            parse_batch_targets(bad)
+    with pytest.raises(ValueError):
+        parse_batch_targets(None, "user_id\nRāmu".encode('utf-16'))
+    with pytest.raises(ValueError):
+        parse_batch_targets([f"u{i}" for i in range(3)], b"u9\n", max_targets=3)
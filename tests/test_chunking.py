@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+
+from app.services import extraction
+from app.services.chunking import PAGE_SEPARATOR, chunk_text, iter_structured_chunks
+from app.services.extraction import iter_pdf_pages
+
+
+def test_chunks_never_split_a_line_and_record_offsets():
+    text = "\n".join(f"Account No: 1234 5678 {i:02d}" for i in range(40))  # ~7 tokens per line
+    chunks = chunk_text(text, max_tokens=40, overlap_tokens=8)
+
+    lines = set(text.split("\n"))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert all(line in lines for line in chunk['text'].split("\n"))
+        assert text[chunk['char_start']:chunk['char_end']] == chunk['text']
+    # overlap: each chunk repeats the last line of the previous one
+    assert all(a['text'].split("\n")[-1] == b['text'].split("\n")[0] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_streamed_chunks_prefer_paragraph_breaks_and_track_pages():
+    pages = ["Name: Ramesh Kumar\nFather: Suresh Kumar\n\nBank: SBI\nIFSC: SBIN0001234",
+             "Khasra number 1234/5\tarea 0.405 ha\nVillage Rampur"]
+    chunks = list(iter_structured_chunks(pages, max_tokens=12, overlap_tokens=0))
+    joined = PAGE_SEPARATOR.join(pages)
+
+    assert chunks[0]['text'] == "Name: Ramesh Kumar\nFather: Suresh Kumar"
+    assert chunks[1]['text'].startswith("Bank: SBI")
+    assert (chunks[0]['page_start'], chunks[-1]['page_end']) == (1, 2)
+    assert chunks[-1]['page_start'] == 2
+    assert joined[chunks[-1]['char_start']:chunks[-1]['char_end']] == pages[1]
+
+
+def test_iter_pdf_pages_stops_at_caps(tmp_path):
+    path = str(tmp_path / "bundle.pdf")
+    doc = fitz.open()
+    for i in range(5):
+        doc.new_page().insert_text((72, 72), f"Khasra number 1234/{i} of village Rampur")
+    doc.save(path)
+    doc.close()
+
+    report = {}
+    assert len(list(iter_pdf_pages(path, max_pages=None, max_bytes=None, report=report))) == 5
+    assert report == {'complete': True}
+    assert len(list(iter_pdf_pages(path, max_pages=2, max_bytes=None, report=report))) == 2
+    assert report == {'complete': False}
+    assert "".join(iter_pdf_pages(path, max_pages=None, max_bytes=50)) == "Khasra number 1234/0 of village Rampur\nKhasra numb"
+
+
+def test_iter_pdf_pages_ocrs_scanned_pages_in_order(tmp_path, monkeypatch):
+    path = str(tmp_path / "scanned.pdf")
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Khasra number 1234/1 of village Rampur")
+    doc.new_page()  # no text layer, like a scanned page
+    doc.new_page().insert_text((72, 72), "Khatauni owner Ramesh Kumar, Rampur")
+    doc.save(path)
+    doc.close()
+
+    seen = []
+
+    def fake_ocr(img, lang='eng'):
+        seen.append((img.mode, img.size))
+        return {'text': 'OCR TEXT', 'avg_confidence': 90.0, 'words': [], 'confs': []}
+
+    monkeypatch.setattr(extraction, "ocr_image_with_confidence", fake_ocr)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pages = list(iter_pdf_pages(path, max_pages=None, max_bytes=None, ocr_submit=pool.submit))
+
+    assert [p.strip() for p in pages] == [
+        "Khasra number 1234/1 of village Rampur", "OCR TEXT", "Khatauni owner Ramesh Kumar, Rampur"]
+    assert seen == [('L', (1653, 2339))]
+
+
+def test_failed_page_ocr_marks_the_read_incomplete(tmp_path, monkeypatch):
+    path = str(tmp_path / "scanned.pdf")
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Khasra number 1234/1 of village Rampur")
+    doc.new_page()
+    doc.save(path)
+    doc.close()
+
+    def failing_ocr(img, lang='eng'):
+        return {'text': '', 'avg_confidence': 0.0, 'words': [], 'confs': [], 'error': 'tesseract crashed'}
+
+    monkeypatch.setattr(extraction, "ocr_image_with_confidence", failing_ocr)
+    report = {}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pages = list(iter_pdf_pages(path, max_pages=None, max_bytes=None, ocr_submit=pool.submit, report=report))
+    assert pages[1] == "" and report == {'complete': False}
+    assert extraction.extract_text_from_file(path)['complete'] is False
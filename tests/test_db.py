@@ -0,0 +1,112 @@
+from flask import Flask
+
+from app.services import db
+from app.services.db import (
+    ConnectionPool, claim_user, db_connection, find_user_by_aadhaar_hash, get_db_conn, get_documents_by_user,
+    get_pool, init_db, save_document_records, save_user_if_new,
+)
+
+
+def test_save_document_records_writes_user_and_chunks(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    init_db(db_path)
+    records = [{'filename': 'pan.png', 'scheme_id': 'kcc', 'text': f"chunk {i}", 'doc_type': 'image',
+                'metadata': {'ocr_conf': 88}, 'chunk_index': i} for i in range(3)]
+
+    assert save_document_records("u1", records, aadhaar_hash="h1", db_path=db_path) == 3
+
+    docs = get_documents_by_user("u1", db_path=db_path)
+    assert [d['chunk_index'] for d in docs] == [0, 1, 2]
+    assert find_user_by_aadhaar_hash("h1", db_path=db_path) == "u1"
+    assert get_db_conn(db_path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_save_user_if_new_only_fills_missing_aadhaar_hash(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    init_db(db_path)
+    save_user_if_new("u1", db_path=db_path)
+    save_user_if_new("u1", aadhaar_hash="first", db_path=db_path)
+    save_user_if_new("u1", aadhaar_hash="second", db_path=db_path)
+
+    assert find_user_by_aadhaar_hash("first", db_path=db_path) == "u1"
+    assert find_user_by_aadhaar_hash("second", db_path=db_path) is None
+
+
+def test_connection_pool_reuses_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_idle=1)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        with pool.connection() as extra:
+            assert extra is not second
+        assert pool.stats()['in_use'] == 1
+    assert second is first
+
+    stats = pool.stats()
+    assert (stats['created'], stats['reused'], stats['idle'], stats['in_use']) == (2, 1, 1, 0)
+
+
+def test_request_shares_one_connection(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "data.db")
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    flask_app = Flask(__name__)
+    db.init_app(flask_app)
+    init_db()
+
+    with flask_app.app_context():
+        with db_connection() as a:
+            pass
+        with db_connection() as b:
+            pass
+        assert a is b
+        assert get_pool(db_path).stats()['in_use'] == 1
+    assert get_pool(db_path).stats()['in_use'] == 0
+
+
+def test_claim_user_resolves_existing_owner_and_merges(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    init_db(db_path)
+    save_document_records("owner", [{'filename': 'aadhaar.png', 'text': 'a'}], aadhaar_hash="h1", db_path=db_path)
+    save_document_records("fresh", [{'filename': 'pan.pdf', 'text': 'b'}], db_path=db_path)
+    save_document_records("other", [{'filename': 'x.png', 'text': 'c'}], aadhaar_hash="h2", db_path=db_path)
+
+    assert claim_user("fresh", "h1", db_path=db_path) == "owner"
+    assert [d['text'] for d in get_documents_by_user("owner", db_path=db_path)] == ['a', 'b']
+    assert claim_user("other", "h1", db_path=db_path) == "other"  # has its own Aadhaar: never merged
+    assert claim_user("new", "h3", db_path=db_path) == "new"
+    assert find_user_by_aadhaar_hash("h3", db_path=db_path) == "new"
+
+
+def test_claim_user_without_merge_keeps_the_named_user(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    init_db(db_path)
+    save_document_records("owner", [{'filename': 'aadhaar.png', 'text': 'a'}], aadhaar_hash="h1", db_path=db_path)
+    save_document_records("spouse", [{'filename': 'land.pdf', 'text': 'b'}], db_path=db_path)
+
+    # The spouse's land record carries the owner's Aadhaar: reported, not merged
+    assert claim_user("spouse", "h1", merge=False, db_path=db_path) == "owner"
+    assert [d['text'] for d in get_documents_by_user("spouse", db_path=db_path)] == ['b']
+    assert [d['text'] for d in get_documents_by_user("owner", db_path=db_path)] == ['a']
+    assert claim_user("spouse", "h2", merge=False, db_path=db_path) == "spouse"
+    assert find_user_by_aadhaar_hash("h2", db_path=db_path) == "spouse"
+
+
+def test_init_db_merges_duplicate_aadhaar_users(tmp_path):
+    db_path = str(tmp_path / "old.db")
+    with db_connection(db_path) as conn, conn:  # pre-index data.db with the same Aadhaar under two users
+        conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, aadhaar_hash TEXT, created_at TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                         [("u1", "h1", "2024-01-01"), ("u2", "h1", "2024-02-01"), ("u3", "", "2024-03-01"),
+                          ("u4", "", "2024-03-02")])
+        conn.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, filename TEXT, "
+                     "scheme_id TEXT, doc_type TEXT, text TEXT, metadata TEXT, chunk_index INTEGER, created_at TEXT)")
+        conn.execute("INSERT INTO documents (user_id, text) VALUES ('u2', 'ration card')")
+    init_db(db_path)
+
+    with db_connection(db_path) as conn:
+        users = [r[0] for r in conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+        plan = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT user_id FROM users WHERE aadhaar_hash = ?", ("h1",)))
+    assert users == ["u1", "u3", "u4"]
+    assert [d['text'] for d in get_documents_by_user("u1", db_path=db_path)] == ['ration card']
+    assert "idx_users_aadhaar_hash" in plan
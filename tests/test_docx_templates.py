@@ -0,0 +1,58 @@
+import io
+import os
+
+from docx import Document
+
+from app.services.docx_templates import CompiledTemplate, TemplateCache
+
+
+def _template(path):
+    doc = Document()
+    doc.add_paragraph("Application for Kisan Credit Card")
+    doc.add_paragraph("Applicant Name:")
+    table = doc.add_table(rows=2, cols=2)
+    table.rows[0].cells[0].text = "Aadhaar No:"
+    table.rows[1].cells[0].text = "IFSC:"
+    doc.save(path)
+    return path
+
+
+def test_fill_writes_slots_and_leaves_template_untouched(tmp_path):
+    compiled = CompiledTemplate(_template(str(tmp_path / "kcc.docx")))
+    assert {"para_1", "table_0_row_0_cell_1", "table_0_row_1_cell_1"} <= set(compiled.slots)
+
+    data, count = compiled.fill({"para_1": "Ramesh Kumar", "table_0_row_0_cell_1": "234123412346",
+                                 "table_0_row_1_cell_1": "", "table_9_row_0_cell_0": "ignored"})
+    assert count == 2
+    doc = Document(io.BytesIO(data))
+    assert doc.paragraphs[1].text == "Applicant Name: Ramesh Kumar"
+    assert doc.tables[0].rows[0].cells[1].text == "234123412346"
+    assert doc.tables[0].rows[1].cells[1].text == ""
+
+    # Each fill starts from the pristine tree
+    data, _ = compiled.fill({"table_0_row_1_cell_1": "SBIN0001234"})
+    doc = Document(io.BytesIO(data))
+    assert doc.paragraphs[1].text == "Applicant Name:"
+    assert doc.tables[0].rows[0].cells[1].text == ""
+    assert doc.tables[0].rows[1].cells[1].text == "SBIN0001234"
+
+
+def test_cache_compiles_once_per_content(tmp_path):
+    path = _template(str(tmp_path / "kcc.docx"))
+    cache = TemplateCache(max_entries=2)
+    first = cache.get(path)
+    assert cache.get(path) is first
+
+    doc = Document(path)
+    doc.add_paragraph("Village:")
+    doc.save(path)
+    os.utime(path, ns=(0, 1))  # a different mtime even on coarse-grained filesystems
+    changed = cache.get(path)
+    assert changed is not first and "para_2" in changed.slots and len(cache) == 2
+
+
+def test_identical_fills_produce_identical_bytes(tmp_path):
+    compiled = CompiledTemplate(_template(str(tmp_path / "kcc.docx")))
+    form_data = {"para_1": "Ramesh Kumar"}
+    assert compiled.fill(form_data)[0] == compiled.fill(dict(form_data))[0]
+    assert compiled.fill_key(form_data) == compiled.fill_key({"para_1": "Ramesh Kumar", "para_0": ""})
@@ -0,0 +1,47 @@
+import fitz
+
+from app.services.extraction import extract_text_from_file, pdf_pages, pdf_result
+from app.services.extraction_cache import ExtractionCache
+
+
+def test_cache_key_is_content_addressed(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"))
+    a = tmp_path / "a.png"
+    b = tmp_path / "b.png"
+    a.write_bytes(b"same scan")
+    b.write_bytes(b"same scan")
+
+    assert cache.key_for(str(a)) == cache.key_for(str(b))
+    assert cache.key_for(str(a), lang='hin') != cache.key_for(str(a))
+
+    cache.put(cache.key_for(str(a)), {'text': 'Ramesh', 'source': 'image', 'avg_conf': 91.0})
+    assert cache.get(cache.key_for(str(b)))['text'] == 'Ramesh'
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"), max_bytes=150)
+    cache.put("old", {'text': 'x' * 40})
+    cache.put("new", {'text': 'y' * 40})
+    cache.get("old")  # touch so "new" becomes the LRU entry
+    cache.put("newest", {'text': 'z' * 40})
+
+    assert cache.get("new") is None
+    assert cache.get("old") is not None
+    assert cache.get("newest") is not None
+    assert cache.stats()['bytes'] <= 150
+
+
+def test_pdf_results_keep_their_pages(tmp_path):
+    with fitz.open() as doc:
+        for text in ("Khasra No 42, Tehsil Sadar\n\nOwner: Ramesh Kumar", "Village Rampur, District Sitapur"):
+            doc.new_page().insert_text((72, 72), text)
+        data = doc.tobytes()
+
+    result = extract_text_from_file("bundle.pdf", data=data)
+    cache = ExtractionCache(str(tmp_path / "cache.db"))
+    cache.put("k", result)
+
+    pages = pdf_pages(cache.get("k"))
+    assert len(pages) == 2 and "Owner: Ramesh Kumar" in pages[0] and "Rampur" in pages[1]
+    assert pdf_result(pages) == result
+    assert pdf_pages({'text': "old entry", 'source': 'pdf', 'avg_conf': None}) is None
@@ -0,0 +1,42 @@
+import importlib.util
+import json
+import os
+
+from docx import Document
+
+from app.services.field_schema_cache import FieldSchemaCache
+from farmerbuddy_llm.llm_client import FakeBackend, LLMClient
+
+APP_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _load_app_module():
+    # app.py shares its name with the app package, so it is loaded from its path
+    spec = importlib.util.spec_from_file_location("farmerbuddy_app", APP_PY)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_form_fields_are_analysed_once_per_template(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # app.py creates its databases relative to the working directory
+    main = _load_app_module()
+    template = str(tmp_path / "kcc.docx")
+    doc = Document()
+    doc.add_paragraph("Applicant Name: ")
+    doc.add_paragraph("Aadhaar Number: ")
+    doc.save(template)
+
+    reply = [{"field_id": "para_0", "field_name": "applicant_name", "label": "Applicant Name",
+              "field_type": "text", "priority": 10},
+             {"field_id": "para_1", "field_name": "aadhaar_number", "label": "Aadhaar Number",
+              "field_type": "text", "priority": 9}]
+    backend = FakeBackend([json.dumps(reply)])
+    main.llm = LLMClient(backend)
+    main.field_schema_cache = FieldSchemaCache(main.FIELD_PROMPT_VERSION, db_path=str(tmp_path / "schema.db"))
+
+    assert main.analyze_form_fields_with_rag(template) == reply
+    assert main.analyze_form_fields_with_rag(template) == reply
+    assert len(backend.prompts) == 1
+    # The literal example object in the prompt survives formatting
+    assert '"field_id": "table_0_row_1_cell_1"' in backend.prompts[0]
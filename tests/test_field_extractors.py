@@ -0,0 +1,61 @@
+from app.services.field_extractors import extract_fields, extractor_for_field, find_aadhaar, verhoeff_valid
+
+DOC = """Name: Ramesh Kumar
+Aadhaar No: 2345 6789 0124
+DOB: 05/08/1980
+PAN ABCPK1234F  Mobile: +91 98765 43210
+Bank A/c No: 012345678901  IFSC Code: SBIN0001234
+Village Rampur PIN: 221 005"""
+
+
+def _fields(*names):
+    return [{'field_name': n, 'label': n.replace('_', ' ').title()} for n in names]
+
+
+def test_verhoeff_check():
+    assert verhoeff_valid("234567890124")
+    assert not verhoeff_valid("234567890123")
+    assert find_aadhaar("UID 2345 6789 0123 and 2345-6789-0124") == "234567890124"
+
+
+def test_extract_fields_fills_fixed_formats_only():
+    hits = extract_fields(DOC, _fields('aadhaar_number', 'pan_number', 'ifsc_code', 'mobile_number', 'date_of_birth',
+                                       'pincode', 'bank_account_number', 'applicant_name', 'name_as_per_aadhaar'))
+
+    assert {k: v['value'] for k, v in hits.items()} == {
+        'aadhaar_number': '234567890124', 'pan_number': 'ABCPK1234F', 'ifsc_code': 'SBIN0001234',
+        'mobile_number': '9876543210', 'date_of_birth': '1980-08-05', 'pincode': '221005',
+        'bank_account_number': '012345678901'}
+    assert hits['aadhaar_number']['confidence'] == 0.99
+
+
+def test_unlabelled_ambiguous_numbers_are_left_to_the_llm():
+    hits = extract_fields("Receipt 2345 6789 0124 paid 123456789 on 01/02/2020", _fields(
+        'aadhaar_number', 'bank_account_number', 'date_of_birth'))
+    assert list(hits) == ['aadhaar_number']
+
+
+def test_account_numbers_are_not_read_as_mobile_numbers():
+    assert extract_fields("A/C No: 7012345678", _fields('mobile_number')) == {}
+    assert extract_fields("Receipt 7012345678 issued", _fields('mobile_number')) == {}
+    hits = extract_fields("A/C No: 7012345678  Mob: 9876543210", _fields('mobile_number', 'bank_account_number'))
+    assert {k: v['value'] for k, v in hits.items()} == {'mobile_number': '9876543210',
+                                                        'bank_account_number': '7012345678'}
+
+
+def test_labels_resolve_to_their_head_noun_not_a_qualifier():
+    def kind(label):
+        extractor = extractor_for_field({'field_name': 'f', 'label': label})
+        return extractor.kind if extractor else None
+
+    assert kind("Mobile number linked with Aadhaar") == 'mobile'
+    assert kind("Aadhaar seeded bank account number") == 'account_number'
+    assert kind("Date of birth as per Aadhaar") == 'dob'
+    assert kind("Aadhaar / Mobile number") is None
+
+    hits = extract_fields(DOC, [{'field_name': 'mobile', 'label': "Mobile number linked with Aadhaar"},
+                                {'field_name': 'account', 'label': "Aadhaar seeded bank account number"},
+                                {'field_name': 'dob', 'label': "Date of birth as per Aadhaar"}])
+    assert {k: v['kind'] for k, v in hits.items()} == {'mobile': 'mobile', 'account': 'account_number',
+                                                        'dob': 'dob'}
+    assert hits['mobile']['value'] == '9876543210' and hits['dob']['value'] == '1980-08-05'
@@ -0,0 +1,17 @@
+from app.services.field_schema_cache import FieldSchemaCache
+
+
+def test_field_schema_cache_persists_by_content_and_prompt_version(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    template = tmp_path / "form.docx"
+    template.write_bytes(b"template bytes")
+    fields = [{'field_id': 'para_1', 'field_name': 'applicant_name', 'label': 'Applicant Name'}]
+
+    cache = FieldSchemaCache("1", db_path=db_path)
+    key = cache.key_for(str(template))
+    cache.put(key, fields)
+    cache.get(key)[0]['pre_filled_value'] = 'mutated'
+
+    reopened = FieldSchemaCache("1", db_path=db_path)
+    assert reopened.get(key) == fields
+    assert FieldSchemaCache("2", db_path=db_path).key_for(str(template)) != key
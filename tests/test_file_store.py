@@ -0,0 +1,59 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+from app.services.file_store import FileStore
+
+
+def _store(tmp_path, **kwargs):
+    return FileStore(str(tmp_path / "files"), 'generated', db_path=str(tmp_path / "store.db"), **kwargs)
+
+
+def _age(path, seconds):
+    past = datetime.now().timestamp() - seconds
+    os.utime(path, (past, past))
+
+
+def test_identical_content_is_stored_once_and_names_do_not_collide(tmp_path):
+    store = _store(tmp_path)
+    first = store.put(b"form for ramesh", "kcc_u1-filled.docx", source_key="tpl-abc.docx")
+    again = store.put(b"form for ramesh", "kcc_u2-filled.docx")
+    other = store.save_upload(io.BytesIO(b"a different aadhaar scan"), "aadhaar.pdf")
+    same_name = store.save_upload(io.BytesIO(b"another farmer's aadhaar"), "aadhaar.pdf")
+
+    assert first['path'] == again['path'] and first['name'] != again['name']
+    assert first['name'].startswith("kcc_u1-filled-") and first['name'].endswith(".docx")
+    assert other['name'] != same_name['name'] and other['path'].endswith(".pdf")
+    assert store.get(first['name'])['sha256'] == first['sha256']
+    assert store.find("tpl-abc.docx")['name'] == first['name']
+    assert store.find("tpl-missing.docx") is None and store.get("nope.docx") is None
+
+
+def test_gc_expires_entries_then_sweeps_orphaned_blobs(tmp_path):
+    store = _store(tmp_path, ttl_hours=1)
+    old = store.put(b"old form", "old.docx")
+    fresh = store.put(b"fresh form", "fresh.docx")
+    store.get(fresh['name'])
+
+    stats = store.gc(now=datetime.utcnow() + timedelta(minutes=90))
+    assert stats['removed_entries'] == 2 and stats['removed_blobs'] == 0  # blobs are within the grace period
+
+    store = _store(tmp_path, ttl_hours=1)
+    kept = store.put(b"fresh form", "fresh.docx")
+    _age(old['path'], 3600)
+    _age(kept['path'], 3600)
+    stats = store.gc()
+    assert stats['removed_blobs'] == 1 and stats['bytes_freed'] == len(b"old form")
+    assert not os.path.exists(old['path']) and store.get(kept['name']) is not None
+
+
+def test_gc_trims_least_recently_used_past_size_cap(tmp_path):
+    store = _store(tmp_path, max_bytes=25)
+    a = store.put(b"a" * 10, "a.docx")
+    b = store.put(b"b" * 10, "b.docx")
+    c = store.put(b"c" * 10, "c.docx")
+    store.get(a['name'])  # a is now the most recently used
+
+    store.gc()
+    assert store.get(b['name']) is None
+    assert store.get(a['name']) is not None and store.get(c['name']) is not None
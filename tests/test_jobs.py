@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import jobs
+from app.services.db import db_connection
+from app.services.jobs import JobQueue, validate_callback_url
+
+
+def _wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_job_runs_and_records_result(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), max_workers=1)
+    queue.register('double', lambda payload: {"success": True, "value": payload['n'] * 2})
+    queue.register('reject', lambda payload: {"success": False, "error": "no documents"})
+    try:
+        done = _wait_for(queue, queue.submit('double', {'n': 21}))
+        failed = _wait_for(queue, queue.submit('reject', {}))
+    finally:
+        queue.shutdown()
+
+    assert done['status'] == 'done' and done['result']['value'] == 42
+    assert failed['status'] == 'failed' and failed['error'] == "no documents"
+    assert queue.get("missing") is None
+
+
+def test_callback_urls_must_be_public_https():
+    for url in ("http://93.184.216.34/hook", "https://127.0.0.1/hook", "https://10.0.0.5/hook",
+                "https://169.254.169.254/latest/meta-data", "https://[::1]/hook", "https://user:pw@93.184.216.34/"):
+        with pytest.raises(ValueError):
+            validate_callback_url(url)
+    assert validate_callback_url("https://93.184.216.34/hook") == "https://93.184.216.34/hook"
+    with pytest.raises(ValueError):
+        validate_callback_url("https://93.184.216.34/hook", allowed_hosts=frozenset({"hooks.example.org"}))
+
+
+def test_webhook_posts_only_signed_status(tmp_path, monkeypatch):
+    sent = []
+    monkeypatch.setattr(jobs.requests, 'post', lambda url, **kwargs: sent.append((url, kwargs)))
+    unsigned = JobQueue(db_path=str(tmp_path / "jobs.db"), max_workers=1, webhook_secret='')
+    unsigned.register('fill', lambda payload: {"success": True})
+    with pytest.raises(ValueError):
+        unsigned.submit('fill', {}, callback_url="https://93.184.216.34/hook")
+    unsigned.shutdown()
+
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), max_workers=1, webhook_secret='s3cret')
+    queue.register('fill', lambda payload: {"success": True, "aadhaar": "234567890124", "ifsc": "SBIN0001234"})
+    try:
+        job_id = queue.submit('fill', {}, callback_url="https://93.184.216.34/hook")
+        _wait_for(queue, job_id)
+    finally:
+        queue.shutdown()
+
+    (url, kwargs), = sent
+    assert json.loads(kwargs['data']) == {'job_id': job_id, 'status': 'done'}
+    assert b"234567890124" not in kwargs['data'] and not kwargs['allow_redirects']
+    expected = hmac.new(b's3cret', kwargs['data'], hashlib.sha256).hexdigest()
+    assert kwargs['headers'][jobs.SIGNATURE_HEADER] == 'sha256=' + expected
+
+
+def test_pending_jobs_are_claimed_once_across_processes(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    runs = []
+    queues = [JobQueue(db_path=db_path, max_workers=2) for _ in range(2)]
+    for q in queues:
+        q.register('fill', lambda payload: runs.append(payload['n']) or {"success": True})
+    now = datetime.utcnow()
+    with db_connection(db_path) as conn, conn:
+        for job_id, status, updated in (("queued", 'queued', now), ("stale", 'running', now - timedelta(hours=1)),
+                                        ("live", 'running', now)):
+            conn.execute("INSERT INTO jobs (job_id, kind, status, payload, created_at, updated_at) "
+                         "VALUES (?, 'fill', ?, ?, ?, ?)", (job_id, status, json.dumps({'n': job_id}),
+                                                            updated.isoformat(), updated.isoformat()))
+    try:
+        for q in queues:
+            q.resume_pending()
+    finally:
+        for q in queues:
+            q.shutdown()
+
+    assert sorted(runs) == ["queued", "stale"]
+    assert queues[0].get("live")['status'] == 'running'
@@ -0,0 +1,34 @@
+import pytest
+
+from farmerbuddy_llm.json_output import extract_json, object_schema, parse_json
+
+
+def test_fenced_reply_with_prose_and_trailing_commas():
+    reply = 'Sure! Here is the data:\n```json\n{"name": "Ramesh", "crops": ["wheat", "rice",],}\n```\nLet me know.'
+    assert extract_json(reply) == {"name": "Ramesh", "crops": ["wheat", "rice"]}
+
+
+def test_expected_type_skips_bracketed_prose():
+    assert extract_json('Fields [see note]: {"pan": "ABCPK1234F"}', expect=dict) == {"pan": "ABCPK1234F"}
+    assert extract_json('Note {x} then [1, 2]', expect=list) == [1, 2]
+
+
+def test_truncated_replies_keep_complete_members():
+    assert extract_json('{"name": "Ramesh", "father_name": "Sures') == {"name": "Ramesh"}
+    assert extract_json('{"name": "Ramesh", "village": "Rampur"') == {"name": "Ramesh", "village": "Rampur"}
+    fields = extract_json('[{"field_id": "para_1", "field_name": "name"}, {"field_id": "para_2", "field_na')
+    assert fields == [{"field_id": "para_1", "field_name": "name"}]
+    assert parse_json('[{"field_id": "para_1"}, {"field_id": "para_2"}, {"field_id": "pa') == (
+        [{"field_id": "para_1"}, {"field_id": "para_2"}], True)
+    assert parse_json('[{"field_id": "para_1"}]') == ([{"field_id": "para_1"}], False)
+
+
+def test_no_json_raises():
+    with pytest.raises(ValueError):
+        extract_json("I could not find any of these fields.")
+
+
+def test_object_schema():
+    schema = object_schema(["name", "dob"])
+    assert schema['type'] == 'OBJECT' and schema['required'] == ["name", "dob"]
+    assert schema['properties']['dob'] == {'type': 'STRING'}
@@ -0,0 +1,80 @@
+from app.services.label_index import LabelIndex, normalize_label
+from app.services.profile_store import ProfileStore, canonical_field
+
+
+def test_labels_resolve_across_wording_and_language(tmp_path):
+    index = LabelIndex(str(tmp_path / "data.db"))
+    assert normalize_label("Name of the Farmer:") == normalize_label("Farmer's name") == "farmer name"
+    for label in ("Applicant Name", "Name of Farmer", "किसान का नाम", "Applicant's Full Name"):
+        assert index.resolve(label)[0] == 'name'
+    assert index.resolve("Father's / Husband's Name")[0] == 'father_name'
+    assert index.resolve("Aadhar Card No")[0] == 'aadhaar'
+    # Fuzzy matches never cross to another person's field or to a different kind of value
+    assert index.resolve("Mother's Name") is None
+    assert index.resolve("Name as per Aadhaar") is None
+    assert index.resolve("Crop sown this season") is None
+
+
+def test_fuzzy_matches_never_add_unknown_content_words(tmp_path):
+    index = LabelIndex(str(tmp_path / "data.db"))
+    for label in ("Survey number", "Branch address", "Bank branch name", "Mobile number linked with Aadhaar",
+                  "State Name"):
+        assert index.resolve(label) is None, label
+    assert index.resolve("Adhaar Number")[0] == 'aadhaar'
+    assert index.resolve("Date of Birth (DD/MM/YYYY)")[0] == 'dob'
+
+    # The fixed-format fallback respects whose value a label asks for too
+    assert canonical_field({'field_name': 'f', 'label': "Mobile number linked with Aadhaar"}, index) == 'mobile'
+    assert canonical_field({'field_name': 'f', 'label': "Nominee Aadhaar number"}, index) is None
+    assert canonical_field({'field_name': 'f', 'label': "Co-applicant Aadhaar"}, index) is None
+
+
+def test_learned_mappings_persist_per_user_until_shared(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    index = LabelIndex(db_path, share_min_users=2)
+    assert index.resolve("Khasra holder") is None
+    assert index.learn("Khasra holder", 'name', "u1")
+    assert index.learn("Khasra holder", 'name', "u1")
+
+    reloaded = LabelIndex(db_path, share_min_users=2)
+    assert reloaded.resolve("khasra  HOLDER", user_id="u1")[0] == 'name'
+    assert reloaded.resolve("khasra  HOLDER") is None and reloaded.resolve("Khasra holder", user_id="u2") is None
+
+    reloaded.learn("Khasra holder", 'name', "u2")
+    assert reloaded.resolve("Khasra holder")[0] == 'name'
+    assert LabelIndex(db_path, share_min_users=2).resolve("Khasra holder", user_id="u3")[0] == 'name'
+
+
+def test_confirmations_cannot_redefine_builtin_labels_or_invent_fields(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    index = LabelIndex(db_path, share_min_users=1)
+    store = ProfileStore(db_path, label_index=index)
+
+    learned = store.confirm("u1", [{'label': "Applicant Name", 'value': "Suresh", 'canonical': 'father_name'},
+                                   {'label': "Name", 'value': "x", 'canonical': 'totally_made_up'},
+                                   {'label': "Patta", 'value': "x", 'canonical': ['name']}])
+
+    assert learned == {}
+    assert not index.learn("Applicant Name", 'father_name', "u1")
+    reloaded = LabelIndex(db_path, share_min_users=1)
+    assert reloaded.resolve("Applicant Name") == ('name', 1.0)
+    assert reloaded.resolve("Applicant Name", user_id="u1") == ('name', 1.0)
+    assert reloaded.resolve("Name") == ('name', 1.0)
+    assert store.get("u1") is None
+
+
+def test_confirmed_fill_teaches_labels_and_profile(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    index = LabelIndex(db_path)
+    store = ProfileStore(db_path, label_index=index)
+    store.ingest_chunks("u1", [{'filename': 'passbook.pdf', 'chunk_index': 0,
+                                'text': "Name: Ramesh Kumar\nA/c No: 012345678901"}])
+
+    learned = store.confirm("u1", [{'label': "Khatedar", 'value': "ramesh  kumar"},
+                                   {'label': "SB A/c", 'value': "0123 4567 8901"},
+                                   {'label': "Crop", 'value': "Wheat"}])
+
+    assert learned == {'Khatedar': 'name', 'SB A/c': 'account_number'}
+    assert canonical_field({'field_name': 'khatedar', 'label': 'Khatedar'}, index, "u1") == 'name'
+    assert canonical_field({'field_name': 'khatedar', 'label': 'Khatedar'}, index) is None
+    assert store.get("u1")['fields']['name']['source'] == 'confirmed'
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from farmerbuddy_llm.llm_client import FakeBackend, LLMClient, LLMError, ResponseCache
+
+
+def _client(backend, **kwargs):
+    sleeps = []
+    client = LLMClient(backend, sleep=sleeps.append, **kwargs)
+    return client, sleeps
+
+
+def test_retries_rate_limits_with_backoff():
+    backend = FakeBackend([LLMError("quota", status=429), LLMError("unavailable", status=503), '{"name": "Ramesh"}'])
+    client, sleeps = _client(backend, backoff_base=1.0)
+
+    assert client.generate("prompt") == '{"name": "Ramesh"}'
+    assert len(backend.prompts) == 3
+    # Exponential backoff with jitter: [0.5, 1] then [1, 2] seconds
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+    stats = client.metrics()
+    assert stats['retries'] == 2 and stats['calls'] == 1 and stats['errors'] == 0
+
+
+def test_non_retryable_and_exhausted_errors_raise():
+    client, sleeps = _client(FakeBackend([LLMError("bad request", status=400)]))
+    with pytest.raises(LLMError) as info:
+        client.generate("prompt")
+    assert info.value.status == 400 and sleeps == []
+
+    client, sleeps = _client(FakeBackend([LLMError("quota", status=429)]), max_retries=2)
+    with pytest.raises(LLMError):
+        client.generate("prompt")
+    assert len(sleeps) == 2 and client.metrics()['errors'] == 1
+
+
+def test_identical_prompts_are_served_from_cache():
+    backend = FakeBackend([lambda prompt: prompt.upper()])
+    client, _ = _client(backend)
+
+    assert client.generate("fill form") == "FILL FORM"
+    assert client.generate("fill form") == "FILL FORM"
+    assert client.generate("fill form", generation_config={'temperature': 0.2}) == "FILL FORM"
+    assert client.generate("fill form", cache=False) == "FILL FORM"
+
+    # Different kwargs are a different cache entry; cache=False always calls the backend
+    assert len(backend.prompts) == 3
+    stats = client.metrics()
+    assert stats['cache_hits'] == 1 and stats['cache_entries'] == 2
+    assert stats['prompt_tokens'] > 0 and 'p95' in stats['latency_ms']
+
+
+def test_cache_evicts_and_expires():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.get("a") is None and cache.get("c") == "c" and len(cache) == 2
+
+    expired = ResponseCache(max_entries=2, ttl=-1)
+    expired.put("a", "a")
+    assert expired.get("a") is None
+
+
+def test_concurrency_is_bounded():
+    lock = threading.Lock()
+    active, peak = [0], [0]
+    release = threading.Event()
+
+    def slow(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        release.wait(0.2)
+        with lock:
+            active[0] -= 1
+        return prompt
+
+    client, _ = _client(FakeBackend([slow]), max_concurrency=2)
+    threads = [threading.Thread(target=client.generate, args=(f"p{i}",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+
+
+def test_generate_json_reasks_only_for_missing_keys():
+    backend = FakeBackend(['```json\n{"name": "Ramesh", "pan": "ABCPK1234F", "dob', '{"dob": "1980-01-15"}'])
+    client, _ = _client(backend)
+
+    value = client.generate_json("extract all", required_keys=["name", "pan", "dob"],
+                                 reask=lambda missing: "extract " + ",".join(missing))
+
+    assert value == {"name": "Ramesh", "pan": "ABCPK1234F", "dob": "1980-01-15"}
+    assert backend.prompts == ["extract all", "extract dob"]
+    # Both calls request schema-constrained output; the re-ask schema covers only the missing key
+    assert backend.kwargs[0]['json_schema']['required'] == ["name", "pan", "dob"]
+    assert list(backend.kwargs[1]['json_schema']['properties']) == ["dob"]
+    assert client.metrics()['reasks'] == 1
+
+
+def test_generate_json_without_required_keys_raises_on_prose():
+    backend = FakeBackend(["Sorry, I cannot help with that.", "Sorry, I cannot help with that."])
+    client, _ = _client(backend)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            client.generate_json("list fields")
+    # The failed reply was not cached, so the retry reached the model again
+    assert len(backend.prompts) == 2 and len(client.cache) == 0
+
+
+def test_truncated_reply_is_reported_and_not_cached():
+    backend = FakeBackend(['[{"field_id": "para_1"}, {"field_id": "para_2"}, {"field_id": "pa',
+                           '[{"field_id": "para_1"}, {"field_id": "para_2"}, {"field_id": "para_3"}]'])
+    client, _ = _client(backend)
+
+    assert client.generate_json("list fields", with_status=True) == (
+        [{"field_id": "para_1"}, {"field_id": "para_2"}], False)
+    value, complete = client.generate_json("list fields", with_status=True)
+    assert complete and len(value) == 3
+    assert client.metrics()['salvaged'] == 1 and len(backend.prompts) == 2
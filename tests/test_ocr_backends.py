@@ -0,0 +1,58 @@
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services import extraction, ocr_backends
+from app.services.ocr_backends import PytesseractBackend, TesserocrBackend
+
+
+def test_falls_back_to_pytesseract_without_tesserocr(monkeypatch):
+    monkeypatch.setattr(ocr_backends, "tesserocr", None)
+    assert isinstance(ocr_backends._create_backend('auto'), PytesseractBackend)
+    assert isinstance(ocr_backends._create_backend('pytesseract'), PytesseractBackend)
+
+
+def test_tesserocr_backend_reuses_engines():
+    try:
+        backend = TesserocrBackend()
+        backend.warm(['eng'])
+    except Exception as e:
+        pytest.skip(f"tesserocr with eng data not available: {e}")
+
+    img = Image.new('L', (600, 120), 255)
+    ImageDraw.Draw(img).text((20, 30), "PAN ABCDE1234F", fill=0, font=ImageFont.load_default(size=48))
+    words, confs = backend.recognize(img)
+    api = backend._pool('eng').queue[-1]
+    backend.recognize(img)
+
+    assert "ABCDE1234F" in words and len(confs) == len(words)
+    assert backend._pool('eng').queue[-1] is api
+
+
+def test_recognized_text_keeps_lines_and_paragraphs(monkeypatch):
+    data = {'text': ["Name:", "Ramesh", "Kumar", "", "Account", "No:", "0123", "IFSC", "SBIN0001234"],
+            'conf': [90, 91, 92, -1, 88, 87, 86, 85, 84],
+            'block_num': [1, 1, 1, 1, 1, 1, 1, 2, 2], 'par_num': [1, 1, 1, 1, 1, 1, 1, 1, 1],
+            'line_num': [1, 1, 1, 2, 2, 2, 2, 1, 1]}
+    monkeypatch.setattr(ocr_backends.pytesseract, 'image_to_data', lambda img, lang, output_type: data)
+    backend = PytesseractBackend()
+
+    lines = backend.recognize_lines(None)
+    assert [" ".join(words) for words, _ in lines] == ["Name: Ramesh Kumar", "Account No: 0123", "", "IFSC SBIN0001234"]
+    assert backend.recognize(None) == ([w for w in data['text'] if w], [90.0, 91.0, 92.0, 88.0, 87.0, 86.0, 85.0, 84.0])
+
+    monkeypatch.setattr(extraction, 'get_ocr_backend', lambda: backend)
+    monkeypatch.setattr(extraction, 'resolve_language', lambda img, lang: (img, 'eng', ''))
+    res = extraction.ocr_image_with_confidence(Image.new('L', (10, 10), 255), preprocess=False)
+    assert res['text'] == "Name: Ramesh Kumar\nAccount No: 0123\n\nIFSC SBIN0001234"
+    assert len(res['words']) == len(res['confs']) == 8
+
+
+def test_available_languages_are_listed_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ocr_backends.pytesseract, 'get_languages',
+                        lambda config: calls.append(config) or ['eng', 'hin', 'osd'])
+    backend = PytesseractBackend()
+
+    assert backend.available_languages() == ['eng', 'hin', 'osd']
+    assert backend.available_languages() == ['eng', 'hin', 'osd']
+    assert len(calls) == 1
@@ -0,0 +1,38 @@
+from PIL import Image
+
+from app.services import ocr_languages
+from app.services.ocr_languages import lang_for_script, resolve_language
+
+
+class FakeBackend:
+    def __init__(self, osd):
+        self.osd = osd
+        self.calls = 0
+
+    def detect_osd(self, img):
+        self.calls += 1
+        return self.osd
+
+    def available_languages(self):
+        return ['eng', 'hin', 'osd']
+
+
+def test_lang_for_script_limits_to_installed_packs():
+    assert lang_for_script('Latin', {'eng', 'hin'}) == 'eng'
+    assert lang_for_script('Devanagari', {'eng', 'hin'}) == 'hin+eng'
+    assert lang_for_script('Tamil', {'eng', 'hin'}) == 'eng'
+
+
+def test_resolve_language_routes_rotates_and_caches(monkeypatch):
+    backend = FakeBackend({'orient_deg': 90, 'orient_conf': 5.0, 'script': 'Devanagari', 'script_conf': 3.0})
+    monkeypatch.setattr(ocr_languages, "get_ocr_backend", lambda: backend)
+    monkeypatch.setattr(ocr_languages, "_cache", ocr_languages.OrderedDict())
+    img = Image.new('L', (300, 100), 255)
+
+    rotated, lang, script = resolve_language(img, 'auto')
+    resolve_language(img, 'auto')
+
+    assert (lang, script) == ('hin+eng', 'Devanagari')
+    assert rotated.size == (100, 300)
+    assert backend.calls == 1
+    assert resolve_language(img, 'eng') == (img, 'eng', '')
@@ -0,0 +1,42 @@
+import time
+
+from docx import Document
+
+from app.services.ocr_pool import OCREngine
+
+
+def _slow_extract(filepath):
+    time.sleep(5)
+    return {'text': filepath, 'source': 'test', 'avg_conf': None}
+
+
+def _make_docx(path, text):
+    doc = Document()
+    doc.add_paragraph(text)
+    doc.save(str(path))
+    return str(path)
+
+
+def test_extract_many_keeps_input_order(tmp_path):
+    paths = [_make_docx(tmp_path / f"doc{i}.docx", f"Farmer {i}") for i in range(3)]
+    engine = OCREngine(max_workers=2, timeout=30)
+    try:
+        results = engine.extract_many(paths)
+    finally:
+        engine.shutdown()
+
+    assert [r['text'] for r in results] == ["Farmer 0", "Farmer 1", "Farmer 2"]
+    assert all(r['source'] == 'docx' for r in results)
+
+
+def test_extract_many_times_out_per_file():
+    engine = OCREngine(max_workers=2, timeout=0.5, func=_slow_extract)
+    try:
+        start = time.monotonic()
+        results = engine.extract_many(["a.png", "b.png"])
+        elapsed = time.monotonic() - start
+    finally:
+        engine.shutdown()
+
+    assert elapsed < 4
+    assert [r.get('error') for r in results] == ['timeout', 'timeout']
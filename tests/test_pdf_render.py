@@ -0,0 +1,66 @@
+import pytest
+from docx import Document
+
+from app.services.docx_templates import CompiledTemplate
+from app.services.pdf_render import LibreOfficeConverter, PdfRenderer, find_soffice
+
+
+class CountingConverter:
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def convert(self, docx_bytes):
+        self.calls += 1
+        return b"%PDF-" + docx_bytes[:8]
+
+
+def _filled_docx(tmp_path):
+    doc = Document()
+    doc.add_heading("Kisan Credit Card Application", level=1)
+    doc.add_paragraph("Applicant Name:")
+    table = doc.add_table(rows=2, cols=3)
+    table.rows[0].cells[0].merge(table.rows[0].cells[2]).text = "Bank Details"
+    table.rows[1].cells[0].text = "IFSC:"
+    path = str(tmp_path / "kcc.docx")
+    doc.save(path)
+    compiled = CompiledTemplate(path)
+    form_data = {"para_1": "Ramesh <Kumar> & Sons", "table_0_row_1_cell_1": "SBIN0001234"}
+    return compiled, form_data
+
+
+def test_reportlab_renders_paragraphs_and_merged_tables(tmp_path):
+    pytest.importorskip("reportlab")
+    fitz = pytest.importorskip("fitz")
+    from app.services.pdf_render import ReportLabConverter
+
+    compiled, form_data = _filled_docx(tmp_path)
+    docx_bytes, _ = compiled.fill(form_data)
+    pdf = ReportLabConverter().convert(docx_bytes)
+
+    text = fitz.open(stream=pdf, filetype="pdf")[0].get_text()
+    assert "Applicant Name: Ramesh <Kumar> & Sons" in text
+    assert "SBIN0001234" in text and text.count("Bank Details") == 1
+
+
+def test_renderer_converts_on_the_pool_and_fill_keys_follow_content(tmp_path):
+    compiled, form_data = _filled_docx(tmp_path)
+    converter = CountingConverter()
+    renderer = PdfRenderer(converter=converter, workers=2)
+
+    assert renderer.render(compiled.fill(form_data)[0]).startswith(b"%PDF-")
+    key = compiled.fill_key(form_data)
+    assert compiled.fill_key(dict(form_data, table_0_row_1_cell_1="HDFC0000001")) != key
+    # Empty and unknown fields don't change what is rendered, so they share the key
+    assert compiled.fill_key(dict(form_data, para_0="", table_7_row_0_cell_0="x")) == key
+
+    assert converter.calls == 1
+    assert renderer.stats() == {'rendered': 1, 'failed': 0, 'converter': 'counting'}
+
+
+@pytest.mark.skipif(not find_soffice(), reason="LibreOffice is not installed")
+def test_libreoffice_converter(tmp_path):
+    compiled, form_data = _filled_docx(tmp_path)
+    pdf = LibreOfficeConverter(find_soffice(), slots=1).convert(compiled.fill(form_data)[0])
+    assert pdf.startswith(b"%PDF")
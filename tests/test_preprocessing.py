@@ -0,0 +1,33 @@
+from PIL import Image, ImageDraw
+
+from app.services.preprocessing import crop_to_content, downscale, estimate_skew, preprocess_for_ocr
+
+
+def _card(size=(800, 500)):
+    img = Image.new('L', size, 255)
+    draw = ImageDraw.Draw(img)
+    for y in range(60, size[1] - 60, 40):
+        draw.rectangle((60, y, size[0] - 60, y + 12), fill=0)  # text-like lines
+    return img
+
+
+def test_downscale_respects_dpi_and_max_side():
+    photo = Image.new('RGB', (4000, 3000))
+    assert downscale(photo, max_side=2000).size == (2000, 1500)
+
+    scan = Image.new('RGB', (2400, 1200))
+    scan.info['dpi'] = (600, 600)
+    assert downscale(scan, target_dpi=300).size == (1200, 600)
+
+
+def test_crop_to_content_removes_background():
+    table = Image.new('L', (1200, 900), 120)
+    table.paste(_card(), (200, 150))
+    cropped = crop_to_content(table, margin=0)
+    assert cropped.size == (800, 500)
+
+
+def test_deskew_detects_tilt():
+    tilted = _card().rotate(-3, expand=True, fillcolor=255)
+    assert abs(estimate_skew(tilted) - 3) <= 0.5
+    assert preprocess_for_ocr(Image.new('RGBA', (50, 40))).mode == 'L'
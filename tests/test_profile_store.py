@@ -0,0 +1,56 @@
+from app.services.db import claim_user, init_db, save_document_records
+from app.services.profile_store import ProfileStore, canonical_field, extract_profile_fields
+
+CARD = """Name: Ramesh Kumar DOB: 05/08/1980
+S/O: Suresh Kumar
+Address: House 12, Rampur, Varanasi
+Aadhaar No: 2345 6789 0124"""
+
+
+def test_extract_profile_fields_and_label_mapping():
+    found = extract_profile_fields(CARD)
+    assert found['name'][0] == "Ramesh Kumar"
+    assert found['father_name'][0] == "Suresh Kumar"
+    assert found['aadhaar'] == ("234567890124", 0.99)
+    assert canonical_field({'field_name': 'applicant_name', 'label': 'Name of the Applicant'}) == 'name'
+    assert canonical_field({'field_name': 'aadhar_no', 'label': 'Aadhar No.'}) == 'aadhaar'
+    assert canonical_field({'field_name': 'crop_sown', 'label': 'Crop sown'}) is None
+
+
+def test_profile_is_versioned_and_answers_form_fields(tmp_path):
+    store = ProfileStore(str(tmp_path / "data.db"))
+    assert store.ingest_chunks("u1", [{'filename': 'aadhaar.png', 'chunk_index': 0, 'text': CARD}]) == 1
+    assert store.ingest_chunks("u1", [{'filename': 'aadhaar.png', 'chunk_index': 0, 'text': CARD}]) == 1
+    assert store.learn("u1", [{'field_name': 'bank', 'label': 'Bank Name'}], {'bank': 'SBI'}) == 2
+
+    profile = store.get("u1")
+    hits = store.lookup(profile, [{'field_name': 'full_name', 'label': 'Full Name'},
+                                  {'field_name': 'bank', 'label': 'Bank'},
+                                  {'field_name': 'crop', 'label': 'Crop'}])
+    assert {k: v['value'] for k, v in hits.items()} == {'full_name': 'Ramesh Kumar', 'bank': 'SBI'}
+    assert hits['full_name']['source'] == 'aadhaar.png#0'
+
+
+def test_profiles_follow_user_merges(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    init_db(db_path)
+    store = ProfileStore(db_path)
+    save_document_records("owner", [{'filename': 'a.png', 'text': 'a'}], aadhaar_hash="h1", db_path=db_path)
+    store.learn("owner", [{'field_name': 'name', 'label': 'Name'}], {'name': 'Ramesh Kumar'})
+    store.ingest_chunks("dup", [{'filename': 'pan.png', 'chunk_index': 0, 'text': "PAN: ABCPK1234F"}])
+
+    assert claim_user("dup", "h1", db_path=db_path) == "owner"
+    assert store.get("dup") is None
+    assert set(store.get("owner")['fields']) == {'name', 'pan'}
+
+
+def test_profile_values_are_only_replaced_by_more_confident_ones(tmp_path):
+    store = ProfileStore(str(tmp_path / "data.db"))
+    store.ingest_chunks("u1", [{'filename': 'aadhaar.png', 'chunk_index': 0, 'text': CARD}])
+    store.ingest_chunks("u1", [{'filename': 'land.pdf', 'chunk_index': 0, 'text': "Name: Mohan Lal\nKhasra 42"}])
+    store.learn("u1", [{'field_name': 'nominee', 'label': 'Name'}], {'nominee': 'Sita Devi'})
+    assert store.get("u1")['fields']['name']['value'] == "Ramesh Kumar"
+
+    store.confirm("u1", [{'label': 'Name', 'value': 'Ramesh K.', 'canonical': 'name'}])
+    store.confirm("u1", [{'label': 'Name', 'value': 'Ramesh Kumar Singh', 'canonical': 'name'}])
+    assert store.get("u1")['fields']['name']['value'] == "Ramesh Kumar Singh"
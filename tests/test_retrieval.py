@@ -0,0 +1,55 @@
+from app.services.retrieval import BM25Index, CachedEmbedder, select_chunks
+
+
+def _chunk(i, text):
+    return {'chunk_index': i, 'text': text}
+
+
+def test_bm25_ranks_matching_chunk_first():
+    index = BM25Index([
+        "crop sown wheat rabi season",
+        "bank account number 12345678 ifsc SBIN0001234",
+        "father name Ramesh Kumar",
+    ])
+    assert index.top_k("IFSC code", 2) == [1]
+
+
+def test_select_chunks_respects_budget_and_order():
+    filler = " ".join(["survey"] * 200)
+    chunks = [
+        _chunk(0, "Name of farmer: Sita Devi " + filler),
+        _chunk(1, filler),
+        _chunk(2, "Bank account number 998877 " + filler),
+        _chunk(3, filler),
+    ]
+    fields = [{'field_name': 'farmer_name', 'label': 'Name of farmer'},
+              {'field_name': 'account_number', 'label': 'Bank account number'}]
+
+    selected = select_chunks(chunks, fields, top_k=1, token_budget=800)
+    assert [c['chunk_index'] for c in selected] == [0, 2]
+
+    assert select_chunks(chunks, fields, top_k=1, token_budget=400) == [chunks[0]]
+
+
+def test_select_chunks_returns_everything_when_it_fits():
+    chunks = [_chunk(0, "short"), _chunk(1, ""), _chunk(2, "text")]
+    assert select_chunks(chunks, [{'field_name': 'x', 'label': 'x'}]) == [chunks[0], chunks[2]]
+
+
+def test_cached_embedder_encodes_each_chunk_once():
+    encoded = []
+
+    def embed(texts):
+        encoded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    embedder = CachedEmbedder(embed, max_entries=100)
+    filler = " ".join(["survey"] * 200)
+    chunks = [_chunk(i, f"record {i} " + filler) for i in range(4)]
+    fields = [{'field_name': 'farmer_name', 'label': 'Name of farmer'}]
+
+    select_chunks(chunks, fields, top_k=1, token_budget=400, embedder=embedder)
+    assert len(encoded) == 5
+    select_chunks(chunks + [_chunk(4, "new record " + filler)], fields, top_k=1, token_budget=400, embedder=embedder)
+    assert encoded[5:] == ["new record " + filler]
+    assert embedder.stats == {'hits': 5, 'misses': 6}
@@ -0,0 +1,46 @@
+from app.services.db import db_connection, init_db, save_document_records
+from app.services.search import fts_query, rank_user_chunks, search_documents
+
+
+def _records(texts, scheme_id='kcc'):
+    return [{'filename': 'khatauni.pdf', 'scheme_id': scheme_id, 'text': t, 'doc_type': 'pdf',
+             'metadata': {}, 'chunk_index': i} for i, t in enumerate(texts)]
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query('khasra 1234/5 "OR"') == '"khasra" "1234 5" "OR"'
+    assert fts_query('Ramesh Kumar', match_all=False) == '"Ramesh" OR "Kumar"'
+    assert fts_query('  ::  ') == ''
+
+
+def test_search_is_kept_in_sync_and_scoped(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    init_db(db_path)
+    save_document_records("u1", _records(["Khasra number 1234/5 village Rampur", "Owner Ramesh Kumar"]),
+                          db_path=db_path)
+    save_document_records("u2", _records(["Khasra number 999/1 village Sitapur"], scheme_id='pmkisan'),
+                          db_path=db_path)
+
+    hits = search_documents("khasra 1234/5", db_path=db_path)
+    assert [h['user_id'] for h in hits] == ["u1"] and "[1234/5]" in hits[0]['snippet']
+    assert [h['user_id'] for h in search_documents("khasra", scheme_id='pmkisan', db_path=db_path)] == ["u2"]
+    assert search_documents("ramesh", user_id="u2", db_path=db_path) == []
+
+    owner_id = search_documents("ramesh", db_path=db_path)[0]['id']
+    assert rank_user_chunks("u1", ["owner name", "village"], 3, db_path=db_path)[0] == [owner_id]
+
+    with db_connection(db_path) as conn, conn:
+        conn.execute("DELETE FROM documents WHERE user_id = 'u2'")
+    assert search_documents("sitapur", db_path=db_path) == []
+
+
+def test_existing_rows_are_backfilled(tmp_path):
+    db_path = str(tmp_path / "old.db")
+    init_db(db_path)
+    save_document_records("u1", _records(["Bank IFSC SBIN0001234"]), db_path=db_path)
+    with db_connection(db_path) as conn, conn:
+        conn.execute("DROP TABLE documents_fts")  # simulate a data.db from before the index existed
+        conn.execute("DROP TRIGGER documents_fts_ai")
+
+    init_db(db_path)
+    assert [h['user_id'] for h in search_documents("sbin0001234", db_path=db_path)] == ["u1"]
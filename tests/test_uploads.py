@@ -0,0 +1,68 @@
+import hashlib
+import io
+import os
+
+import fitz
+from docx import Document
+
+from app.services.db import db_connection
+from app.services.extraction import extract_text_from_file, iter_pdf_pages
+from app.services.file_store import FileStore
+from app.services.uploads import read_upload, release_uploads
+
+
+def _docx_bytes(text):
+    buf = io.BytesIO()
+    doc = Document()
+    doc.add_paragraph(text)
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _pdf_bytes(*pages):
+    with fitz.open() as doc:
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+def test_small_uploads_stay_in_memory_and_large_ones_spool(tmp_path):
+    payload = b"land record " * 1000
+    small = read_upload(io.BytesIO(payload), "record.txt")
+    assert small.data == payload and small.path is None
+    assert small.sha256 == hashlib.sha256(payload).hexdigest() and small.size == len(payload)
+
+    large = read_upload(io.BytesIO(payload), "record.pdf", max_memory=100)
+    assert large.data is None and large.path.endswith(".pdf")
+    assert not large.path.startswith(os.path.abspath("uploads"))
+    with large.open() as f:
+        assert f.read() == payload
+    assert large.sha256 == small.sha256 and large.extract_source == large.path
+
+    path = large.path
+    large.close()
+    assert not os.path.exists(path)
+
+
+def test_documents_are_extracted_from_memory():
+    res = extract_text_from_file("passbook.docx", data=_docx_bytes("Account No: 1234567890"))
+    assert "1234567890" in res['text'] and res['source'] == 'docx'
+
+    pages = list(iter_pdf_pages("bundle.pdf", data=_pdf_bytes("Khasra No 42, Tehsil Sadar", "Village Rampur, District Sitapur")))
+    assert "Khasra" in pages[0] and "Rampur" in pages[1]
+
+
+def test_release_persists_originals_in_the_background(tmp_path):
+    store = FileStore(str(tmp_path / "uploads"), 'upload', db_path=str(tmp_path / "store.db"))
+    uploads = [read_upload(io.BytesIO(b"aadhaar scan"), "aadhaar.pdf"),
+               read_upload(io.BytesIO(b"big land record"), "land.pdf", max_memory=4)]
+    spooled = uploads[1].path
+
+    release_uploads(uploads, store, persist=True).result()
+
+    with db_connection(store.db_path) as conn:
+        names = [r['name'] for r in conn.execute("SELECT name FROM stored_files WHERE kind = 'upload'")]
+    assert len(names) == 2 and all(n.endswith(".pdf") for n in names)
+    assert not os.path.exists(spooled) and all(u.data is None for u in uploads)
+    assert release_uploads([read_upload(io.BytesIO(b"x"), "x.pdf")], store, persist=False) is None
+